@@ -1,15 +1,27 @@
 from __future__ import annotations
 
-from flask import Flask, jsonify, request
-from flask_cors import CORS
+from quart import Quart, Response, jsonify, request
+from quart_cors import cors
+import asyncio
+import json
+import math
 import os
+import random
 import sys
 import time
-import requests
-from typing import Any, Dict, Optional, Tuple
-
-app = Flask(__name__)
-CORS(app)
+import aiohttp
+from urllib.parse import urlencode
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+import compression
+import gateway_metrics as gm
+from resilience import CircuitBreaker, CircuitOpenError, RetryBudget
+from response_cache import ResponseCache
+from shared_stream import SharedStream
+from singleflight import SingleFlight
+
+app = Quart(__name__)
+app = cors(app, allow_origin="*")
 #blabla testddddddd
 # ----------------------------
 # Configuration
@@ -26,7 +38,7 @@ BUILD_TIME_UTC = os.getenv("BUILD_TIME_UTC", "unknown")
 SERVICE_NAME = os.getenv("SERVICE_NAME", "backend")
 
 @app.get("/version")
-def version():
+async def version():
     return jsonify({
         "service": SERVICE_NAME,
         "build_sha": BUILD_SHA,
@@ -40,7 +52,7 @@ FRONTENDSHA = os.getenv("FRONTENDSHA", "unknown")  # [file:1]
 FRONTENDBUILDTIMEUTC = os.getenv("FRONTENDBUILDTIMEUTC", "unknown")  # [file:1]
 
 @app.get("/frontend-version")
-def frontend_version():
+async def frontend_version():
     return jsonify(
         service="frontend",
         buildsha=FRONTENDSHA,
@@ -48,7 +60,7 @@ def frontend_version():
     ), 200
 
 @app.get("/devops")
-def devops():
+async def devops():
     return jsonify({
         "devops_sha": DEVOPS_SHA,
         "applied_at_utc": DEVOPS_APPLY_TIME_UTC
@@ -63,7 +75,93 @@ UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "10"))
 UPSTREAM_RETRY_ATTEMPTS = int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "3"))
 UPSTREAM_RETRY_BASE_SLEEP = float(os.getenv("UPSTREAM_RETRY_BASE_SLEEP", "0.2"))
 
-_session = requests.Session()
+# Per-upstream circuit breaker: fail fast with 503 while an upstream is down.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT_SECONDS = float(os.getenv("BREAKER_RESET_TIMEOUT_SECONDS", "10"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+
+# Global retry budget: retries may add at most RATIO of the traffic seen in the window.
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1"))
+RETRY_BUDGET_WINDOW_SECONDS = float(os.getenv("RETRY_BUDGET_WINDOW_SECONDS", "10"))
+
+# Connection pool limits, applied to each upstream separately.
+# Requests beyond UPSTREAM_POOL_MAX_CONNECTIONS wait up to UPSTREAM_POOL_TIMEOUT_SECONDS for a free slot.
+UPSTREAM_POOL_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_POOL_MAX_CONNECTIONS", "200"))
+UPSTREAM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY_SECONDS", "30"))
+UPSTREAM_POOL_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_POOL_TIMEOUT_SECONDS", str(UPSTREAM_TIMEOUT_SECONDS)))
+
+# Read-through cache for GET routes; mutation routes invalidate their upstream's entries.
+# RESPONSE_CACHE_TTL_SECONDS=0 disables caching.
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "5"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+
+# Reads whose upstream body is at least this big (or has no Content-Length) are streamed
+# through to the client instead of being buffered and cached; concurrent identical reads
+# share the one upstream transfer (see shared_stream.SharedStream).
+PASSTHROUGH_STREAM_MIN_BYTES = int(os.getenv("PASSTHROUGH_STREAM_MIN_BYTES", str(1024 * 1024)))
+# A shared stream holds at most about SHARED_STREAM_WINDOW_BYTES of a body that not every
+# reader has relayed yet, and reads no further until it has less; a transfer held up that way
+# for SHARED_STREAM_STALL_SECONDS (a reader stopped reading) is abandoned.
+SHARED_STREAM_WINDOW_BYTES = int(os.getenv("SHARED_STREAM_WINDOW_BYTES", str(1024 * 1024)))
+SHARED_STREAM_STALL_SECONDS = float(os.getenv("SHARED_STREAM_STALL_SECONDS", "30"))
+
+# How long /graph/import waits for the graph service to finish loading an upload.
+GRAPH_IMPORT_TIMEOUT_SECONDS = float(os.getenv("GRAPH_IMPORT_TIMEOUT_SECONDS", "300"))
+
+# Relayed text/JSON bodies of at least COMPRESS_MIN_BYTES are gzip/brotli-compressed for clients
+# that accept it (streamed reads always are). COMPRESS_MIN_BYTES<0 disables compression; bodies
+# an upstream already compressed are still passed through, or decoded for clients that can't take them.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+# Compressed cached reads are memoized up to this many bytes (see compression.Compressor), and
+# bodies of at least COMPRESS_THREAD_MIN_BYTES are compressed off the event loop.
+COMPRESS_MEMO_MAX_BYTES = int(os.getenv("COMPRESS_MEMO_MAX_BYTES", str(16 * 1024 * 1024)))
+COMPRESS_THREAD_MIN_BYTES = int(os.getenv("COMPRESS_THREAD_MIN_BYTES", str(128 * 1024)))
+
+# name -> (base url, label used in error messages)
+UPSTREAMS: Dict[str, Tuple[str, str]] = {
+    "stack": (STACK_URL, "Stack service"),
+    "linkedlist": (LINKEDLIST_URL, "LinkedList service"),
+    "graph": (GRAPH_URL, "Graph service"),
+}
+
+# One pooled keep-alive client per upstream; created when the server starts serving.
+_clients: Dict[str, aiohttp.ClientSession] = {}
+
+# upstream -> (read path, response field) for writes that echo the full structure back,
+# e.g. graph mutations return {"graph": <same body as GET /data>}.
+_WRITE_ECHOES_READ: Dict[str, Tuple[str, str]] = {
+    "graph": ("/data", "graph"),
+}
+
+_breakers: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(
+        name,
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=BREAKER_RESET_TIMEOUT_SECONDS,
+        half_open_probes=BREAKER_HALF_OPEN_PROBES,
+    )
+    for name in UPSTREAMS
+}
+_retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SECOND, RETRY_BUDGET_WINDOW_SECONDS)
+
+_cache = ResponseCache(RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES)
+
+# Identical concurrent GETs to the same upstream share one in-flight call.
+_read_flights = SingleFlight()
+
+# (path, query string, Accept sent upstream) identifying one cacheable read; see _cache_key.
+CacheKey = Tuple[str, str, str]
+
+# Read flight key -> the streamed response still being transferred for it, so identical reads
+# arriving after its headers (when the SingleFlight call is over) join the same transfer.
+_read_streams: Dict[Hashable, "UpstreamResponse"] = {}
+
+_compressor = compression.Compressor(
+    COMPRESS_GZIP_LEVEL, COMPRESS_BROTLI_QUALITY, COMPRESS_MEMO_MAX_BYTES, COMPRESS_THREAD_MIN_BYTES
+)
 
 print("--- Configuration Loaded ---", file=sys.stderr)
 print(f"STACK_URL={STACK_URL}", file=sys.stderr)
@@ -73,6 +171,84 @@ print(
     f"TIMEOUT={UPSTREAM_TIMEOUT_SECONDS}s RETRIES={UPSTREAM_RETRY_ATTEMPTS} BACKOFF={UPSTREAM_RETRY_BASE_SLEEP}s",
     file=sys.stderr,
 )
+print(
+    f"POOL max={UPSTREAM_POOL_MAX_CONNECTIONS} "
+    f"expiry={UPSTREAM_KEEPALIVE_EXPIRY_SECONDS}s wait={UPSTREAM_POOL_TIMEOUT_SECONDS}s",
+    file=sys.stderr,
+)
+print(
+    f"BREAKER threshold={BREAKER_FAILURE_THRESHOLD} reset={BREAKER_RESET_TIMEOUT_SECONDS}s "
+    f"probes={BREAKER_HALF_OPEN_PROBES} RETRY_BUDGET ratio={RETRY_BUDGET_RATIO} "
+    f"min={RETRY_BUDGET_MIN_PER_SECOND}/s window={RETRY_BUDGET_WINDOW_SECONDS}s",
+    file=sys.stderr,
+)
+print(
+    f"CACHE ttl={RESPONSE_CACHE_TTL_SECONDS}s max_entries={RESPONSE_CACHE_MAX_ENTRIES} "
+    f"STREAM min_bytes={PASSTHROUGH_STREAM_MIN_BYTES}",
+    file=sys.stderr,
+)
+print(
+    f"COMPRESS min_bytes={COMPRESS_MIN_BYTES} codings={','.join(compression.supported())} "
+    f"gzip_level={COMPRESS_GZIP_LEVEL} brotli_quality={COMPRESS_BROTLI_QUALITY} "
+    f"memo_max_bytes={COMPRESS_MEMO_MAX_BYTES} thread_min_bytes={COMPRESS_THREAD_MIN_BYTES}",
+    file=sys.stderr,
+)
+
+
+@app.before_serving
+async def _open_upstream_clients():
+    # total=None: streamed reads may legitimately take longer than one timeout overall, so the
+    # deadline applies per socket operation instead. `connect` also bounds the wait for a pooled
+    # connection.
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        connect=UPSTREAM_POOL_TIMEOUT_SECONDS,
+        sock_connect=UPSTREAM_TIMEOUT_SECONDS,
+        sock_read=UPSTREAM_TIMEOUT_SECONDS,
+    )
+    for name, (base_url, _) in UPSTREAMS.items():
+        connector = aiohttp.TCPConnector(
+            limit=UPSTREAM_POOL_MAX_CONNECTIONS,
+            keepalive_timeout=UPSTREAM_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        # Bodies are relayed in whatever coding the upstream chose; see _negotiate_encoding.
+        _clients[name] = aiohttp.ClientSession(
+            base_url=base_url, connector=connector, timeout=timeout, auto_decompress=False
+        )
+
+
+@app.after_serving
+async def _close_upstream_clients():
+    for client in _clients.values():
+        await client.close()
+    _clients.clear()
+
+
+# ----------------------------
+# Request metrics
+# ----------------------------
+@app.before_request
+async def _start_request_timer():
+    gm.REQUESTS_IN_FLIGHT.inc()
+    request._started_at = time.perf_counter()
+
+
+@app.after_request
+async def _observe_request(response):
+    started = getattr(request, "_started_at", None)
+    if started is not None:
+        # Label by route template, not the raw path, to keep cardinality bounded.
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        gm.REQUEST_LATENCY.labels(route, request.method, str(response.status_code)).observe(
+            time.perf_counter() - started
+        )
+    return response
+
+
+@app.teardown_request
+async def _end_request(exc):
+    if getattr(request, "_started_at", None) is not None:
+        gm.REQUESTS_IN_FLIGHT.dec()
 
 
 # ----------------------------
@@ -84,28 +260,160 @@ def _json_error(message: str, status: int, **extra: Any):
     return jsonify(payload), status
 
 
-def _get_json_silent() -> Dict[str, Any]:
-    return request.get_json(silent=True) or {}
+async def _get_json_silent() -> Dict[str, Any]:
+    return await request.get_json(silent=True) or {}
+
+
+# Query params forwarded on the /data reads; upstreams page with keyset cursors when present.
+_PAGE_PARAMS = ("limit", "cursor")
+
+
+def _page_params(args: Any) -> Dict[str, str]:
+    return {k: str(args[k]) for k in _PAGE_PARAMS if k in args}
+
 
+# Query params forwarded on writes: ?response=delta asks the graph service for only what
+# changed plus the new graph version instead of the whole graph.
+_WRITE_PARAMS = ("response",)
+
+
+def _write_params(args: Any) -> Dict[str, str]:
+    return {k: str(args[k]) for k in _WRITE_PARAMS if k in args}
+
+
+class UpstreamError(Exception):
+    """
+    Transport-level failure talking to an upstream. `kind` is "timeout", "connect" or
+    "transport"; `sent` is False when the request never reached the upstream, which makes it
+    safe to retry even for non-idempotent calls.
+    """
 
-def _with_retry(fn, *args, **kwargs) -> requests.Response:
-    last_exc: Optional[Exception] = None
-    for attempt in range(1, UPSTREAM_RETRY_ATTEMPTS + 1):
+    def __init__(self, kind: str, sent: bool, cause: BaseException):
+        super().__init__(str(cause) or cause.__class__.__name__)
+        self.kind = kind
+        self.sent = sent
+
+
+class UpstreamResponse:
+    """
+    The parts of an upstream response the gateway relays. `content` holds the body once read,
+    still in its Content-Encoding (`encoding`, "" for identity); it is None while the response
+    is still streaming (see aiter_bytes/aclose). text/json() decode it.
+    """
+
+    def __init__(self, raw: aiohttp.ClientResponse, content: Optional[bytes]):
+        self.raw = raw
+        self.status_code = raw.status
+        self.headers = raw.headers
+        self.content = content
+        self.shared: Optional[SharedStream] = None  # set for reads relayed as a shared stream
+        encoding = raw.headers.get("Content-Encoding", "").strip().lower()
+        self.encoding = "" if encoding == "identity" else encoding
+
+    def decoded(self) -> bytes:
+        if not self.encoding:
+            return self.content or b""
+        return compression.decompress(self.content or b"", self.encoding)
+
+    @property
+    def text(self) -> str:
         try:
-            return fn(*args, **kwargs)
-        except requests.RequestException as e:
-            last_exc = e
-            sleep_s = UPSTREAM_RETRY_BASE_SLEEP * (2 ** (attempt - 1))
+            return self.decoded().decode("utf-8", errors="replace")
+        except ValueError:
+            return ""
+
+    def json(self) -> Any:
+        return json.loads(self.decoded())
+
+    async def aiter_bytes(self) -> AsyncIterator[bytes]:
+        async for chunk in self.raw.content.iter_any():
+            yield chunk
+
+    async def aclose(self) -> None:
+        # Returns the connection to the pool if the body was fully read, otherwise closes it.
+        self.raw.release()
+
+
+# aiohttp >= 3.10 distinguishes connect (and pool wait) timeouts from read timeouts.
+_CONNECT_TIMEOUT_ERRORS = getattr(aiohttp, "ConnectionTimeoutError", ())
+
+
+async def _with_retry(upstream: str, idempotent: bool, method: str, path: str, **kwargs: Any) -> UpstreamResponse:
+    """
+    Send `method path` to `upstream` (see _send) behind its circuit breaker.
+
+    Idempotent calls are retried on any transport error; non-idempotent ones (e.g. /stack/push)
+    only when the request was never sent. Every retry must also fit in the global retry
+    budget. Backoff is exponential with full jitter and never blocks the event loop.
+    Raises CircuitOpenError without sending anything while the breaker is open.
+    """
+    breaker = _breakers[upstream]
+    _retry_budget.record_request()
+    attempt = 0
+    while True:
+        attempt += 1
+        if not breaker.allow():
+            gm.UPSTREAM_ERRORS.labels(upstream, "circuit_open").inc()
+            raise CircuitOpenError(upstream, breaker.retry_after())
+        started = time.perf_counter()
+        in_flight = gm.UPSTREAM_IN_FLIGHT.labels(upstream)
+        in_flight.inc()
+        try:
+            resp = await _send(upstream, method, path, **kwargs)
+        except UpstreamError as e:
+            gm.UPSTREAM_LATENCY.labels(upstream, method, e.kind).observe(time.perf_counter() - started)
+            gm.UPSTREAM_ERRORS.labels(upstream, e.kind).inc()
+            breaker.on_failure()
+            retryable = idempotent or not e.sent
+            if (
+                attempt >= UPSTREAM_RETRY_ATTEMPTS
+                or not retryable
+                or breaker.state != CircuitBreaker.CLOSED
+                or not _retry_budget.try_spend()
+            ):
+                raise
+            gm.UPSTREAM_RETRIES.labels(upstream).inc()
+            sleep_s = random.uniform(0, UPSTREAM_RETRY_BASE_SLEEP * (2 ** (attempt - 1)))
             print(
-                f"[WARN] upstream attempt {attempt}/{UPSTREAM_RETRY_ATTEMPTS} failed: {e}. sleep={sleep_s:.2f}s",
+                f"[WARN] {upstream} attempt {attempt}/{UPSTREAM_RETRY_ATTEMPTS} failed: {e!r}. sleep={sleep_s:.2f}s",
                 file=sys.stderr,
             )
-            time.sleep(sleep_s)
-    assert last_exc is not None
-    raise last_exc
+            await asyncio.sleep(sleep_s)
+            continue
+        except BaseException:
+            breaker.on_abandon()
+            raise
+        finally:
+            in_flight.dec()
+
+        gm.UPSTREAM_LATENCY.labels(upstream, method, f"{resp.status_code // 100}xx").observe(
+            time.perf_counter() - started
+        )
+        if resp.status_code >= 500:
+            gm.UPSTREAM_ERRORS.labels(upstream, "http_5xx").inc()
+            breaker.on_failure()
+        else:
+            breaker.on_success()
+        return resp
+
+
+# (body, status, headers) handed back to the client as-is. body is the upstream's raw bytes,
+# or an async iterator of bytes when the read is streamed through; headers carry the upstream's
+# Content-Encoding when it compressed the body.
+Relayed = Tuple[Union[bytes, AsyncIterator[bytes]], int, Dict[str, str]]
+
+
+def _json_bytes(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def _error_relay(message: str, status: int, headers: Optional[Dict[str, str]] = None, **extra: Any) -> Relayed:
+    payload: Dict[str, Any] = {"error": message}
+    payload.update(extra)
+    return _json_bytes(payload), status, {"Content-Type": "application/json", **(headers or {})}
 
 
-def _upstream_json_or_text(resp: requests.Response) -> Tuple[Dict[str, Any], bool]:
+def _upstream_json_or_text(resp: UpstreamResponse) -> Tuple[Dict[str, Any], bool]:
     """
     Returns (payload, is_json). If upstream returned invalid JSON, payload contains upstream_raw.
     """
@@ -115,103 +423,449 @@ def _upstream_json_or_text(resp: requests.Response) -> Tuple[Dict[str, Any], boo
         return {"upstream_raw": resp.text}, False
 
 
-def _proxy_upstream_error_if_any(resp: requests.Response) -> Optional[Tuple[Any, int]]:
+def _proxy_upstream_error_if_any(resp: UpstreamResponse) -> Optional[Relayed]:
     """
-    If upstream status is >= 400, return a Flask response tuple immediately (proxy error through).
+    If upstream status is >= 400, return the error to relay immediately (proxy error through).
+    Only error bodies are parsed: non-JSON ones are wrapped as {"upstream_raw": ...}.
     Otherwise return None.
     """
     if resp.status_code >= 400:
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
+        body, is_json = _upstream_json_or_text(resp)
+        if is_json:
+            return resp.decoded(), resp.status_code, {"Content-Type": "application/json"}
+        return _json_bytes(body), resp.status_code, {"Content-Type": "application/json"}
     return None
 
 
+def _decode_relayed(body: bytes, headers: Dict[str, str]) -> Any:
+    """Parse a buffered relayed body for callers that need the value (e.g. /batch)."""
+    try:
+        if headers.get("Content-Encoding"):
+            body = compression.decompress(body, headers["Content-Encoding"])
+        return json.loads(body)
+    except ValueError:
+        return {"upstream_raw": body.decode("utf-8", errors="replace")}
+
+
+def _cache_key(path: str, params: Any = None, accept: Optional[str] = None) -> CacheKey:
+    return path, urlencode(sorted((params or {}).items()), doseq=True), accept or ""
+
+
+async def _send(upstream: str, method: str, path: str, stream: bool = False, **kwargs: Any) -> UpstreamResponse:
+    """
+    Send one request on the upstream's pooled client. With `stream`, the response is returned
+    as soon as its headers arrive and the caller must read and close it; otherwise (and for
+    error statuses, which are always small) the body is read into memory first.
+    Transport failures are raised as UpstreamError.
+    """
+    try:
+        raw = await _clients[upstream].request(method, path, **kwargs)
+        if stream and raw.status < 400:
+            return UpstreamResponse(raw, None)
+        try:
+            return UpstreamResponse(raw, await raw.read())
+        finally:
+            raw.release()
+    except aiohttp.ClientConnectorError as e:
+        raise UpstreamError("connect", False, e) from e
+    except _CONNECT_TIMEOUT_ERRORS as e:
+        raise UpstreamError("timeout", False, e) from e
+    except asyncio.TimeoutError as e:
+        raise UpstreamError("timeout", True, e) from e
+    except aiohttp.ClientError as e:
+        raise UpstreamError("transport", True, e) from e
+
+
+def _relay_headers(resp: UpstreamResponse, **extra: str) -> Dict[str, str]:
+    headers = {"Content-Type": resp.headers.get("Content-Type", "application/json")}
+    if resp.encoding:
+        headers["Content-Encoding"] = resp.encoding
+    for name in ("ETag", "Vary"):
+        if name in resp.headers:
+            headers[name] = resp.headers[name]
+    headers.update(extra)
+    return headers
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match uses: a W/ prefix on either side is ignored."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
+
+def _not_modified(etag: Optional[str], cache_state: str) -> Relayed:
+    headers = {"X-Cache": cache_state}
+    if etag:
+        headers["ETag"] = etag
+    return b"", 304, headers
+
+
+def _conditional(relayed: Relayed, if_none_match: Optional[str], cache_state: str) -> Relayed:
+    """A 200 read for the client, or 304 Not Modified if its If-None-Match names the ETag."""
+    body, status, headers = relayed
+    etag = headers.get("ETag")
+    if status == 200 and etag and _etag_matches(if_none_match, etag):
+        return _not_modified(etag, cache_state)
+    return body, status, {**headers, "X-Cache": cache_state}
+
+
+def _is_large(resp: UpstreamResponse) -> bool:
+    length = resp.headers.get("Content-Length", "")
+    return not length.isdigit() or int(length) >= PASSTHROUGH_STREAM_MIN_BYTES
+
+
+async def _read(
+    upstream: str, idempotent: bool, path: str, flight: Hashable, allow_stream: bool, **kwargs: Any
+) -> UpstreamResponse:
+    """
+    GET `path` for one read flight. The body is read into memory unless `allow_stream` and
+    the headers show a large 200 (see _is_large): that one is left streaming and relayed
+    through resp.shared, which every read joining the flight reads from, whether it joined
+    before the headers arrived (through _read_flights) or after (through _read_streams).
+    """
+    resp = await _with_retry(upstream, idempotent, "GET", path, stream=allow_stream, **kwargs)
+    if resp.content is not None:
+        return resp
+    if resp.status_code == 200 and _is_large(resp):
+        def forget() -> None:
+            if _read_streams.get(flight) is resp:
+                del _read_streams[flight]
+
+        resp.shared = SharedStream(
+            resp.aiter_bytes(), resp.aclose, on_done=forget,
+            window_bytes=SHARED_STREAM_WINDOW_BYTES, stall_seconds=SHARED_STREAM_STALL_SECONDS,
+        )
+        _read_streams[flight] = resp
+        return resp
+    try:
+        resp.content = await resp.raw.read()
+    except asyncio.TimeoutError as e:
+        raise UpstreamError("timeout", True, e) from e
+    except aiohttp.ClientError as e:
+        raise UpstreamError("transport", True, e) from e
+    finally:
+        resp.raw.release()
+    return resp
+
+
+async def _call_upstream(
+    upstream: str,
+    method: str,
+    path: str,
+    idempotent: Optional[bool] = None,
+    allow_stream: bool = False,
+    if_none_match: Optional[str] = None,
+    accept: Optional[str] = None,
+    **kwargs: Any,
+) -> Relayed:
+    """
+    Shared proxy path: call `path` on the named upstream through its pooled client and return
+    the upstream body, status and content type to relay unchanged, mapping transport failures
+    to 504/503 error bodies. Successful bodies are never parsed or re-encoded.
+
+    GET responses are served from / stored in the read-through cache, and cache misses for
+    the same request are coalesced into one upstream call. With `allow_stream`, a response of
+    at least PASSTHROUGH_STREAM_MIN_BYTES is not buffered or cached but streamed through as
+    it arrives, and identical reads made while it is still streaming share it (see _read).
+    Any other method invalidates the upstream's cached reads, whether or not the write
+    succeeded.
+
+    Reads are conditional: upstream ETags are relayed, `if_none_match` (the client's header)
+    turns a read whose ETag it names into a bodyless 304, and an expired cache entry with an
+    ETag is revalidated with the upstream (If-None-Match) rather than fetched again.
+    `accept` is sent upstream as the Accept header; each value is cached separately.
+
+    `idempotent` defaults to True for GET only; see _with_retry for how it affects retries.
+    """
+    label = UPSTREAMS[upstream][1]
+    is_read = method == "GET"
+    if idempotent is None:
+        idempotent = is_read
+    key = _cache_key(path, kwargs.get("params"), accept)
+    if accept:
+        kwargs["headers"] = {**kwargs.get("headers", {}), "Accept": accept}
+
+    if is_read:
+        cached = _cache.get(upstream, key)
+        if cached is not None:
+            return _conditional(cached, if_none_match, "HIT")
+
+    generation = _cache.generation(upstream)
+    refreshed = False
+    try:
+        if is_read:
+            # Revalidate our expired copy if it has a validator, else pass on the client's.
+            stale = _cache.stale(upstream, key)
+            validator = stale[2].get("ETag") if stale else None
+            tag = validator or if_none_match
+            if tag:
+                kwargs["headers"] = {**kwargs.get("headers", {}), "If-None-Match": tag}
+            # The generation is part of the key so reads arriving after a write never join
+            # a call that started before it.
+            flight = (upstream, key, generation, tag)
+            resp = _read_streams.get(flight)
+            if resp is None or not resp.shared.joinable:
+                resp = await _read_flights.do(
+                    flight, lambda: _read(upstream, idempotent, path, flight, allow_stream, **kwargs)
+                )
+            stream = resp.shared.reader() if resp.shared is not None else None
+            if resp.shared is not None and stream is None:
+                # Joined too late: the start of the shared body has been relayed and dropped,
+                # so this read gets a transfer of its own.
+                resp = await _read(upstream, idempotent, path, flight, allow_stream, **kwargs)
+                stream = resp.shared.reader() if resp.shared is not None else None
+            if resp.status_code == 304:
+                if validator:
+                    _cache.refresh(upstream, key, generation)
+                    return _conditional(stale, if_none_match, "REVALIDATED")
+                return _not_modified(resp.headers.get("ETag", tag), "MISS")
+        else:
+            resp = await _with_retry(upstream, idempotent, method, path, **kwargs)
+        maybe_err = _proxy_upstream_error_if_any(resp)
+        if maybe_err:
+            return maybe_err
+
+        headers = _relay_headers(resp)
+        if is_read:
+            if stream is not None:
+                return stream, resp.status_code, {**headers, "X-Cache": "BYPASS"}
+            _cache.put(upstream, key, (resp.content, resp.status_code, headers), generation=generation)
+            return _conditional((resp.content, resp.status_code, headers), if_none_match, "MISS")
+
+        # Only echo if no other write to this upstream finished while ours was in flight:
+        # their responses can arrive in any order, so the echo might be the older graph.
+        echo = _WRITE_ECHOES_READ.get(upstream)
+        if echo and _cache.enabled and _cache.generation(upstream) == generation:
+            body, is_json = _upstream_json_or_text(resp)
+            if is_json and isinstance(body, dict) and echo[1] in body:
+                _cache.invalidate(upstream)
+                echoed = _json_bytes(body[echo[1]])
+                echo_headers = {"Content-Type": "application/json"}
+                # The upstream tags the echo as the read would be tagged (ETag, Vary), so
+                # conditional reads after the write can still get 304s.
+                echo_headers.update((name, resp.headers[name]) for name in ("ETag", "Vary") if name in resp.headers)
+                _cache.put(
+                    upstream, _cache_key(echo[0]), (echoed, 200, echo_headers),
+                    generation=_cache.generation(upstream),
+                )
+                refreshed = True
+        return resp.content, resp.status_code, headers
+
+    except CircuitOpenError as e:
+        retry_after = str(max(1, math.ceil(e.retry_after)))
+        return _error_relay(f"{label} unavailable", 503, {"Retry-After": retry_after}, details="circuit open")
+    except UpstreamError as e:
+        if e.kind == "timeout":
+            return _error_relay(f"{label} timeout", 504)
+        return _error_relay(f"{label} unavailable", 503, details=str(e))
+    finally:
+        if not is_read and not refreshed:
+            _cache.invalidate(upstream)
+
+
+def _vary_accept_encoding(headers: Dict[str, str]) -> Dict[str, str]:
+    """headers with Accept-Encoding added to Vary (after any upstream Vary, e.g. Accept)."""
+    vary = headers.get("Vary")
+    return {**headers, "Vary": f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"}
+
+
+async def _negotiate_encoding(
+    body: Union[bytes, AsyncIterator[bytes]], headers: Dict[str, str], memo_key: Optional[Hashable] = None
+) -> Tuple[Union[bytes, AsyncIterator[bytes]], Dict[str, str]]:
+    """
+    Fit a relayed body to the client's Accept-Encoding. A body the upstream already compressed
+    goes out untouched if the client accepts its coding and is decoded otherwise; an identity
+    text/JSON body is compressed (brotli preferred over gzip) when it is at least
+    COMPRESS_MIN_BYTES, or streamed. `memo_key` names a cached body so its compressed form
+    can be reused (see compression.Compressor). Raises ValueError for an undecodable upstream
+    body.
+    """
+    headers = _vary_accept_encoding(headers)
+    accepted = compression.accepted_encodings(request.headers.get("Accept-Encoding"))
+    streamed = not isinstance(body, bytes)
+    coding = headers.get("Content-Encoding", "")
+    if coding:
+        if coding in accepted:
+            return body, headers
+        del headers["Content-Encoding"]
+        memo_key = None  # the decoded body is a new object every time
+        if streamed:
+            body = compression.decompress_stream(body, coding)
+        else:
+            body = compression.decompress(body, coding)
+
+    target = compression.choose(accepted)
+    if (
+        target is None
+        or COMPRESS_MIN_BYTES < 0
+        or not compression.is_compressible(headers.get("Content-Type", ""))
+        or (not streamed and len(body) < COMPRESS_MIN_BYTES)
+    ):
+        return body, headers
+    headers["Content-Encoding"] = target
+    if streamed:
+        return _compressor.compress_stream(body, target), headers
+    return await _compressor.compress(body, target, memo_key), headers
+
+
+async def _respond(
+    body: Union[bytes, AsyncIterator[bytes]], status: int, headers: Dict[str, str], memo_key: Optional[Hashable] = None
+) -> Response:
+    if status == 304:
+        # Nothing to encode; the (weak) ETag stands for every coding of the body.
+        return Response(b"", status=304, headers=_vary_accept_encoding(headers))
+    try:
+        body, headers = await _negotiate_encoding(body, headers, memo_key)
+    except ValueError as e:
+        body, status, headers = _error_relay("Undecodable upstream body", 502, details=str(e))
+    return Response(body, status=status, headers=headers)
+
+
+async def _proxy(upstream: str, method: str, path: str, idempotent: Optional[bool] = None, **kwargs: Any):
+    """Route-facing wrapper around _call_upstream that builds the HTTP response."""
+    if_none_match = request.headers.get("If-None-Match") if method == "GET" else None
+    body, status, headers = await _call_upstream(
+        upstream, method, path, idempotent=idempotent, allow_stream=True, if_none_match=if_none_match, **kwargs
+    )
+    # A cached read hands back the same body object until its entry is replaced, so its
+    # compressed form is memoized under the entry's key and current generation.
+    memo_key = None
+    if method == "GET" and status == 200 and isinstance(body, bytes):
+        cache_key = _cache_key(path, kwargs.get("params"), kwargs.get("accept"))
+        memo_key = (upstream, cache_key, _cache.generation(upstream))
+    return await _respond(body, status, headers, memo_key)
+
+
 # ----------------------------
 # Health
 # ----------------------------
 @app.get("/health")
-def health():
+async def health():
     return jsonify({"status": "ok"}), 200
 
 
+@app.get("/metrics")
+async def metrics():
+    body, content_type = gm.render()
+    return Response(body, status=200, headers={"Content-Type": content_type})
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    stats = _cache.stats()
+    stats["coalesced_reads"] = {**_read_flights.stats(), "shared_streams": len(_read_streams)}
+    return jsonify(stats), 200
+
+
+@app.get("/upstreams/status")
+async def upstreams_status():
+    return jsonify({
+        "breakers": {name: b.stats() for name, b in _breakers.items()},
+        "retry_budget": _retry_budget.stats(),
+    }), 200
+
+
 # =========================================================
 # Stack APIs
 # (UI calls /api/stack/... ; Ingress rewrites /api -> / ; Backend routes are /stack/...)
 # =========================================================
 
 @app.get("/stack/data")
-def get_stack_data():
-    try:
-        resp = _with_retry(
-            _session.get,
-            f"{STACK_URL}/stack",
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
+async def get_stack_data():
+    return await _proxy("stack", "GET", "/stack", params=_page_params(request.args))
 
-        data, _ = _upstream_json_or_text(resp)
-        return jsonify(data), resp.status_code
 
-    except requests.Timeout:
-        return _json_error("Stack service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("Stack service unavailable", 503, details=str(e))
+def _stack_push_body(data: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Validate a /stack/push body. Returns (upstream body, None) or (None, error message)."""
+    if "value" not in data:
+        return None, "Invalid request: provide JSON body with integer field 'value'"
+
+    try:
+        return {"value": int(data["value"])}, None
+    except (TypeError, ValueError):
+        return None, "Invalid request: 'value' must be an integer"
 
 
 @app.post("/stack/push")
-def push_stack_item():
-    data = _get_json_silent()
-    if "value" not in data:
-        return _json_error("Invalid request: provide JSON body with integer field 'value'", 400)
+async def push_stack_item():
+    body, err = _stack_push_body(await _get_json_silent())
+    if err:
+        return _json_error(err, 400)
+
+    return await _proxy("stack", "POST", "/push", json=body)
+
+
+@app.post("/stack/pop")
+async def pop_stack_item():
+    # Use an empty JSON object (or no body) consistently.
+    # Some proxies/servers behave better when Content-Type isn't set for empty body.
+    return await _proxy("stack", "POST", "/pop")
+
+
+# Most values one /stack/push-many or /stack/pop-n call may move (the stack service's own cap).
+# The stack service accepts bodies of up to 16 bytes per value at that cap, so any int32 list
+# of this length in compact or ", "-separated JSON fits.
+STACK_BULK_MAX = int(os.getenv("STACK_BULK_MAX", "10000"))
+
+_INT32_MIN, _INT32_MAX = -(2 ** 31), 2 ** 31 - 1
+
+
+def _stack_push_many_body(data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Validate a /stack/push-many body. Returns (upstream body, None) or (None, error message)."""
+    values = data.get("values") if isinstance(data, dict) else None
+    if not isinstance(values, list):
+        return None, "Invalid request: provide JSON body with integer list 'values'"
+    if len(values) > STACK_BULK_MAX:
+        return None, f"Invalid request: at most {STACK_BULK_MAX} values per push"
 
     try:
-        val = int(data["value"])
+        ints = [int(v) for v in values]
     except (TypeError, ValueError):
-        return _json_error("Invalid request: 'value' must be an integer", 400)
+        return None, "Invalid request: 'values' must be integers"
+    if any(not _INT32_MIN <= v <= _INT32_MAX for v in ints):
+        return None, "Invalid request: 'values' must fit in 32 bits"
+    return {"values": ints}, None
+
 
+def _stack_pop_n_body(data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Validate a /stack/pop-n body. Returns (upstream body, None) or (None, error message)."""
+    if not isinstance(data, dict):
+        return None, "Invalid request: provide JSON body with integer field 'count'"
     try:
-        resp = _with_retry(
-            _session.post,
-            f"{STACK_URL}/push",
-            json={"value": val},
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
+        count = int(data["count"])
+    except (KeyError, TypeError, ValueError):
+        return None, "Invalid request: provide JSON body with integer field 'count'"
+    if not 1 <= count <= STACK_BULK_MAX:
+        return None, f"Invalid request: 'count' must be between 1 and {STACK_BULK_MAX}"
+    return {"count": count}, None
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
 
-    except requests.Timeout:
-        return _json_error("Stack service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("Stack service unavailable", 503, details=str(e))
+@app.post("/stack/push-many")
+async def push_many_stack_items():
+    """Push {"values": [v1, v2, ...]} in order (the last one ends up on top) in one upstream call."""
+    body, err = _stack_push_many_body(await _get_json_silent())
+    if err:
+        return _json_error(err, 400)
 
+    return await _proxy("stack", "POST", "/push-many", json=body)
 
-@app.post("/stack/pop")
-def pop_stack_item():
-    try:
-        # Use an empty JSON object (or no body) consistently.
-        # Some proxies/servers behave better when Content-Type isn't set for empty body.
-        resp = _with_retry(
-            _session.post,
-            f"{STACK_URL}/pop",
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
+@app.post("/stack/pop-n")
+async def pop_n_stack_items():
+    """Pop up to {"count": N} values at once; the response lists them top first."""
+    body, err = _stack_pop_n_body(await _get_json_silent())
+    if err:
+        return _json_error(err, 400)
 
-    except requests.Timeout:
-        return _json_error("Stack service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("Stack service unavailable", 503, details=str(e))
+    return await _proxy("stack", "POST", "/pop-n", json=body)
 
 
 # =========================================================
@@ -219,203 +873,231 @@ def pop_stack_item():
 # =========================================================
 
 @app.get("/list/data")
-def get_list_data():
-    try:
-        resp = _with_retry(
-            _session.get,
-            f"{LINKEDLIST_URL}/list",
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
+async def get_list_data():
+    return await _proxy("linkedlist", "GET", "/list", params=_page_params(request.args))
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
 
-    except requests.Timeout:
-        return _json_error("LinkedList service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("LinkedList service unavailable", 503, details=str(e))
+@app.post("/list/add")
+async def add_list_item():
+    return await _proxy("linkedlist", "POST", "/add", json=await _get_json_silent())
 
 
-@app.post("/list/add")
-def add_list_item():
-    try:
-        resp = _with_retry(
-            _session.post,
-            f"{LINKEDLIST_URL}/add",
-            json=_get_json_silent(),
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
+@app.post("/list/delete")
+async def delete_list_item():
+    return await _proxy("linkedlist", "POST", "/delete", json=await _get_json_silent())
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
 
-    except requests.Timeout:
-        return _json_error("LinkedList service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("LinkedList service unavailable", 503, details=str(e))
+@app.post("/list/remove-head")
+async def remove_head():
+    return await _proxy("linkedlist", "POST", "/remove-head")
 
 
-@app.post("/list/delete")
-def delete_list_item():
-    try:
-        resp = _with_retry(
-            _session.post,
-            f"{LINKEDLIST_URL}/delete",
-            json=_get_json_silent(),
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
+# =========================================================
+# Graph APIs
+# (graph writes are idempotent upstream - ON CONFLICT DO NOTHING / plain deletes - so they retry like reads)
+# =========================================================
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
+# Clients that prefer it get whole-graph reads as the graph service's binary snapshot (see
+# graph/graph_snapshot.py), relayed byte for byte; pages are always JSON.
+GRAPH_SNAPSHOT_TYPE = "application/msgpack"
 
-    except requests.Timeout:
-        return _json_error("LinkedList service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("LinkedList service unavailable", 503, details=str(e))
 
+@app.get("/graph/data")
+async def get_graph_data():
+    params = _page_params(request.args)
+    accept = None
+    preferred = request.accept_mimetypes.best_match(("application/json", GRAPH_SNAPSHOT_TYPE))
+    if not params and preferred == GRAPH_SNAPSHOT_TYPE:
+        accept = GRAPH_SNAPSHOT_TYPE
+    return await _proxy("graph", "GET", "/data", params=params, accept=accept)
 
-@app.post("/list/remove-head")
-def remove_head():
-    try:
-        resp = _with_retry(
-            _session.post,
-            f"{LINKEDLIST_URL}/remove-head",
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
+# Graph service algorithm endpoints and the query params each one takes.
+_GRAPH_ALGORITHMS: Dict[str, Tuple[str, ...]] = {
+    "shortest-path": ("from", "to", "direction"),
+    "reachable": ("from", "to", "direction", "limit"),
+    "components": ("kind", "limit"),
+    "topological-sort": ("limit",),
+    "degrees": ("top",),
+}
 
-    except requests.Timeout:
-        return _json_error("LinkedList service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("LinkedList service unavailable", 503, details=str(e))
 
+@app.get("/graph/algorithms/<name>")
+async def graph_algorithm(name: str):
+    if name not in _GRAPH_ALGORITHMS:
+        return _json_error(f"Unknown graph algorithm '{name}'", 404)
+    params = {k: str(request.args[k]) for k in _GRAPH_ALGORITHMS[name] if k in request.args}
+    return await _proxy("graph", "GET", f"/algorithms/{name}", params=params)
 
-# =========================================================
-# Graph APIs
-# =========================================================
 
-@app.get("/graph/data")
-def get_graph_data():
-    try:
-        resp = _with_retry(
-            _session.get,
-            f"{GRAPH_URL}/data",
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
+# Scalar query params of the graph service's /neighborhood; "seed" may repeat.
+_NEIGHBORHOOD_PARAMS = ("hops", "direction", "max_nodes", "max_edges")
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
 
-    except requests.Timeout:
-        return _json_error("Graph service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("Graph service unavailable", 503, details=str(e))
+@app.get("/graph/neighborhood")
+async def graph_neighborhood():
+    params: Dict[str, Any] = {k: str(request.args[k]) for k in _NEIGHBORHOOD_PARAMS if k in request.args}
+    params["seed"] = request.args.getlist("seed")
+    return await _proxy("graph", "GET", "/neighborhood", params=params)
 
 
-@app.post("/graph/add-node")
-def add_graph_node():
-    try:
-        resp = _with_retry(
-            _session.post,
-            f"{GRAPH_URL}/add-node",
-            json=_get_json_silent(),
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
+@app.get("/graph/export")
+async def export_graph():
+    params = {"format": str(request.args["format"])} if "format" in request.args else {}
+    return await _proxy("graph", "GET", "/export", params=params)
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
 
-    except requests.Timeout:
-        return _json_error("Graph service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("Graph service unavailable", 503, details=str(e))
+@app.post("/graph/import")
+async def import_graph():
+    # Edge lists can be far larger than MAX_CONTENT_LENGTH; stream the upload through as it
+    # arrives. Never retried once sent: the body can only be read once.
+    request.max_content_length = None
+    params = {"format": str(request.args["format"])} if "format" in request.args else {}
+    headers = {"Content-Type": request.headers.get("Content-Type", "text/csv")}
 
+    async def body() -> AsyncIterator[bytes]:
+        async for chunk in request.body:
+            yield chunk
 
-@app.post("/graph/add-edge")
-def add_edge():
-    try:
-        resp = _with_retry(
-            _session.post,
-            f"{GRAPH_URL}/add-edge",
-            json=_get_json_silent(),
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
+    # The graph service answers only after loading everything, which can take a while.
+    timeout = aiohttp.ClientTimeout(
+        total=None, sock_connect=UPSTREAM_TIMEOUT_SECONDS, sock_read=GRAPH_IMPORT_TIMEOUT_SECONDS
+    )
+    return await _proxy(
+        "graph", "POST", "/import", params=params, headers=headers, data=body(), timeout=timeout
+    )
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
 
-    except requests.Timeout:
-        return _json_error("Graph service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("Graph service unavailable", 503, details=str(e))
+@app.post("/graph/add-node")
+async def add_graph_node():
+    return await _proxy(
+        "graph", "POST", "/add-node", idempotent=True,
+        params=_write_params(request.args), json=await _get_json_silent()
+    )
 
 
-@app.post("/graph/delete-node")
-def delete_graph_node():
-    try:
-        resp = _with_retry(
-            _session.post,
-            f"{GRAPH_URL}/delete-node",
-            json=_get_json_silent(),
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
+@app.post("/graph/add-edge")
+async def add_edge():
+    return await _proxy(
+        "graph", "POST", "/add-edge", idempotent=True,
+        params=_write_params(request.args), json=await _get_json_silent()
+    )
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
 
-    except requests.Timeout:
-        return _json_error("Graph service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("Graph service unavailable", 503, details=str(e))
+@app.post("/graph/delete-node")
+async def delete_graph_node():
+    return await _proxy(
+        "graph", "POST", "/delete-node", idempotent=True,
+        params=_write_params(request.args), json=await _get_json_silent()
+    )
 
 
 @app.post("/graph/delete-edge")
-def delete_graph_edge():
-    try:
-        resp = _with_retry(
-            _session.post,
-            f"{GRAPH_URL}/delete-edge",
-            json=_get_json_silent(),
-            timeout=UPSTREAM_TIMEOUT_SECONDS,
-        )
-        maybe_err = _proxy_upstream_error_if_any(resp)
-        if maybe_err:
-            return maybe_err
+async def delete_graph_edge():
+    return await _proxy(
+        "graph", "POST", "/delete-edge", idempotent=True,
+        params=_write_params(request.args), json=await _get_json_silent()
+    )
+
 
-        body, _ = _upstream_json_or_text(resp)
-        return jsonify(body), resp.status_code
+# =========================================================
+# Batch API
+# =========================================================
 
-    except requests.Timeout:
-        return _json_error("Graph service timeout", 504)
-    except requests.RequestException as e:
-        return _json_error("Graph service unavailable", 503, details=str(e))
+# Backend route -> (upstream, method, upstream path, idempotent, forwards JSON body)
+_BATCH_ROUTES: Dict[str, Tuple[str, str, str, bool, bool]] = {
+    "/stack/data": ("stack", "GET", "/stack", True, False),
+    "/stack/push": ("stack", "POST", "/push", False, True),
+    "/stack/pop": ("stack", "POST", "/pop", False, False),
+    "/stack/push-many": ("stack", "POST", "/push-many", False, True),
+    "/stack/pop-n": ("stack", "POST", "/pop-n", False, True),
+    "/list/data": ("linkedlist", "GET", "/list", True, False),
+    "/list/add": ("linkedlist", "POST", "/add", False, True),
+    "/list/delete": ("linkedlist", "POST", "/delete", False, True),
+    "/list/remove-head": ("linkedlist", "POST", "/remove-head", False, False),
+    "/graph/data": ("graph", "GET", "/data", True, False),
+    "/graph/add-node": ("graph", "POST", "/add-node", True, True),
+    "/graph/add-edge": ("graph", "POST", "/add-edge", True, True),
+    "/graph/delete-node": ("graph", "POST", "/delete-node", True, True),
+    "/graph/delete-edge": ("graph", "POST", "/delete-edge", True, True),
+}
+
+# Backend route -> body validator, for routes that check their body before calling upstream
+_BodyValidator = Callable[[Dict[str, Any]], Tuple[Optional[Dict[str, Any]], Optional[str]]]
+_BATCH_BODY_VALIDATORS: Dict[str, _BodyValidator] = {
+    "/stack/push": _stack_push_body,
+    "/stack/push-many": _stack_push_many_body,
+    "/stack/pop-n": _stack_pop_n_body,
+}
+
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "1000"))
+
+
+async def _run_batch_op(op: Dict[str, Any]) -> Tuple[Any, int]:
+    upstream, method, path, idempotent, with_body = _BATCH_ROUTES[op["path"]]
+    kwargs: Dict[str, Any] = {}
+    if isinstance(op.get("params"), dict):
+        kwargs["params"] = (_page_params if method == "GET" else _write_params)(op["params"])
+    if with_body:
+        body = op.get("body") or {}
+        validate = _BATCH_BODY_VALIDATORS.get(op["path"])
+        if validate:
+            body, err = validate(body)
+            if err:
+                return {"error": err}, 400
+        kwargs["json"] = body
+    body, status, headers = await _call_upstream(upstream, method, path, idempotent=idempotent, **kwargs)
+    return _decode_relayed(body, headers), status
+
+
+async def _run_batch_lane(
+    ops: List[Tuple[int, Dict[str, Any]]], results: List[Any], stop_on_error: bool
+) -> None:
+    """Run one upstream's operations sequentially, in request order."""
+    failed = False
+    for index, op in ops:
+        if failed:
+            results[index] = {"index": index, "status": 424, "body": {"error": "Skipped after earlier failure"}}
+            continue
+        body, status = await _run_batch_op(op)
+        results[index] = {"index": index, "status": status, "body": body}
+        failed = stop_on_error and status >= 400
+
+
+@app.post("/batch")
+async def batch():
+    """
+    Run many route calls in one request:
+        {"operations": [{"path": "/stack/push", "body": {"value": 1}}, ...], "stop_on_error": false}
+    Reads may carry "params": {"limit": N, "cursor": C} to fetch a single page, and graph
+    writes "params": {"response": "delta"} to get back only what changed.
+
+    Operations against the same upstream run one after another in the given order (so a push
+    followed by a pop behaves as if sent separately); different upstreams run concurrently.
+    With stop_on_error, a failed operation skips the remaining ones for its upstream (424).
+    Returns 200 with one {"index", "status", "body"} result per operation, in request order.
+    """
+    data = await _get_json_silent()
+    ops = data.get("operations") if isinstance(data, dict) else None
+    if not isinstance(ops, list) or not ops:
+        return _json_error("Invalid request: 'operations' must be a non-empty list", 400)
+    if len(ops) > BATCH_MAX_OPERATIONS:
+        return _json_error(f"Invalid request: at most {BATCH_MAX_OPERATIONS} operations per batch", 400)
+
+    lanes: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for index, op in enumerate(ops):
+        if not isinstance(op, dict) or op.get("path") not in _BATCH_ROUTES:
+            return _json_error(f"Invalid operation at index {index}: unknown or missing 'path'", 400, index=index)
+        if op.get("body") is not None and not isinstance(op["body"], dict):
+            return _json_error(f"Invalid operation at index {index}: 'body' must be an object", 400, index=index)
+        lanes.setdefault(_BATCH_ROUTES[op["path"]][0], []).append((index, op))
+
+    results: List[Any] = [None] * len(ops)
+    stop_on_error = bool(data.get("stop_on_error", False))
+    await asyncio.gather(*(_run_batch_lane(lane, results, stop_on_error) for lane in lanes.values()))
+    return await _respond(_json_bytes({"results": results}), 200, {"Content-Type": "application/json"})
 
 
 if __name__ == "__main__":
+    # Local/dev entrypoint. In the container the app is served by hypercorn (see Dockerfile).
     app.run(host="0.0.0.0", port=5000)
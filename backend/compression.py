@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import zlib
+from collections import OrderedDict
+from typing import AsyncIterator, Hashable, Optional, Set, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+_DECODE_ERRORS = (zlib.error,) if brotli is None else (zlib.error, brotli.error)
+
+# Only bodies that are worth compressing; binary formats are usually compressed already.
+_COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "text/", "application/javascript", "application/xml"
+)
+
+
+def supported() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def accepted_encodings(header: Optional[str]) -> Set[str]:
+    """Parse an Accept-Encoding header into the set of codings with a non-zero q-value."""
+    accepted: Set[str] = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(coding)
+    if "*" in accepted:
+        accepted.update(supported())
+    return accepted
+
+
+def choose(accepted: Set[str]) -> Optional[str]:
+    """The coding to compress with for a client accepting `accepted`, preferring brotli."""
+    for coding in supported():
+        if coding in accepted:
+            return coding
+    return None
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.lower().startswith(_COMPRESSIBLE_TYPES)
+
+
+def _decompressobj(coding: str):
+    if coding == "br":
+        if brotli is None:
+            raise ValueError("brotli-encoded body but brotli is not installed")
+        return brotli.Decompressor()
+    if coding == "gzip":
+        return zlib.decompressobj(31)
+    if coding == "deflate":
+        return zlib.decompressobj()
+    raise ValueError(f"unsupported content coding {coding!r}")
+
+
+def decompress(body: bytes, coding: str) -> bytes:
+    """Decode a whole body; raises ValueError if it is not valid `coding` data."""
+    d = _decompressobj(coding)
+    try:
+        if coding == "br":
+            return d.process(body)
+        return d.decompress(body) + d.flush()
+    except _DECODE_ERRORS as e:
+        raise ValueError(f"undecodable {coding} body: {e}") from e
+
+
+async def decompress_stream(chunks: AsyncIterator[bytes], coding: str) -> AsyncIterator[bytes]:
+    d = _decompressobj(coding)
+    async for chunk in chunks:
+        out = d.process(chunk) if coding == "br" else d.decompress(chunk)
+        if out:
+            yield out
+    if coding != "br":
+        tail = d.flush()
+        if tail:
+            yield tail
+
+
+class Compressor:
+    """
+    Compresses response bodies with gzip or brotli.
+
+    Whole bodies may be memoized under a key chosen by the caller (the gateway uses the
+    response cache entry's (upstream, cache key, generation)), so a hot cached read is
+    compressed once rather than once per request without hashing the body. An entry only
+    counts for the very bytes object it was made from, so a key reused for another body is a
+    miss rather than a wrong answer. The memo is an LRU bounded by the bytes it holds (source
+    plus output); a body bigger than a quarter of that is not memoized.
+
+    Bodies of at least thread_min_bytes are compressed on a worker thread so the event loop
+    keeps serving meanwhile.
+    """
+
+    def __init__(self, gzip_level: int, brotli_quality: int, memo_max_bytes: int = 16 * 1024 * 1024,
+                 thread_min_bytes: int = 128 * 1024):
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.memo_max_bytes = memo_max_bytes
+        self.thread_min_bytes = thread_min_bytes
+        self._memo: "OrderedDict[Tuple[Hashable, str], Tuple[bytes, bytes]]" = OrderedDict()
+        self._memo_bytes = 0
+
+    def _compressobj(self, coding: str):
+        if coding == "br":
+            return brotli.Compressor(quality=self.brotli_quality)
+        return zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+
+    def _compress(self, body: bytes, coding: str) -> bytes:
+        c = self._compressobj(coding)
+        return c.process(body) + c.finish() if coding == "br" else c.compress(body) + c.flush()
+
+    async def compress(self, body: bytes, coding: str, memo_key: Optional[Hashable] = None) -> bytes:
+        key = (memo_key, coding)
+        if memo_key is not None:
+            hit = self._memo.get(key)
+            if hit is not None and hit[0] is body:
+                self._memo.move_to_end(key)
+                return hit[1]
+
+        if len(body) >= self.thread_min_bytes:
+            out = await asyncio.to_thread(self._compress, body, coding)
+        else:
+            out = self._compress(body, coding)
+
+        size = len(body) + len(out)
+        if memo_key is not None and size * 4 <= self.memo_max_bytes:
+            old = self._memo.pop(key, None)
+            if old is not None:
+                self._memo_bytes -= len(old[0]) + len(old[1])
+            self._memo[key] = (body, out)
+            self._memo_bytes += size
+            while self._memo_bytes > self.memo_max_bytes:
+                _, (src, dst) = self._memo.popitem(last=False)
+                self._memo_bytes -= len(src) + len(dst)
+        return out
+
+    async def compress_stream(self, chunks: AsyncIterator[bytes], coding: str) -> AsyncIterator[bytes]:
+        c = self._compressobj(coding)
+        async for chunk in chunks:
+            out = c.process(chunk) if coding == "br" else c.compress(chunk)
+            if out:
+                yield out
+        tail = c.finish() if coding == "br" else c.flush()
+        if tail:
+            yield tail
+
+
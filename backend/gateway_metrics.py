@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Buckets cover sub-millisecond cache hits up to the default 10s upstream timeout.
+_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "backend_request_duration_seconds",
+    "Time to produce a response (headers) for a backend route, including any upstream calls.",
+    ["route", "method", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "backend_requests_in_flight",
+    "Backend requests currently being handled.",
+)
+
+UPSTREAM_LATENCY = Histogram(
+    "backend_upstream_request_duration_seconds",
+    "Duration of a single upstream attempt, until response headers (or the body, when buffered).",
+    ["upstream", "method", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "backend_upstream_requests_in_flight",
+    "Upstream attempts currently waiting on the network.",
+    ["upstream"],
+)
+UPSTREAM_RETRIES = Counter(
+    "backend_upstream_retries_total",
+    "Upstream attempts retried after a transport error.",
+    ["upstream"],
+)
+UPSTREAM_ERRORS = Counter(
+    "backend_upstream_errors_total",
+    "Failed upstream attempts by kind (timeout, connect, transport, circuit_open, http_5xx).",
+    ["upstream", "kind"],
+)
+
+
+def render():
+    """Return (body, content type) for the /metrics endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
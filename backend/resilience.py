@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"circuit open for upstream '{upstream}'")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker.
+
+    closed    -> every call goes through; `failure_threshold` consecutive failures open it.
+    open      -> calls fail fast until `reset_timeout` has passed, then it turns half-open.
+    half_open -> at most `half_open_probes` calls go through concurrently; one success closes
+                 the circuit, one failure re-opens it for another `reset_timeout`.
+
+    Every call admitted by allow() must be settled with exactly one of on_success(),
+    on_failure() or on_abandon() (the call was cancelled and says nothing about health).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, half_open_probes: int):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = max(1, half_open_probes)
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes_in_flight = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+            self._probes_in_flight += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def on_success(self) -> None:
+        self._consecutive_failures = 0
+        if self._state == self.HALF_OPEN:
+            self._state = self.CLOSED
+            self._probes_in_flight = 0
+
+    def on_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self._state == self.HALF_OPEN or (
+            self._state == self.CLOSED and self._consecutive_failures >= self.failure_threshold
+        ):
+            self._trip()
+
+    def on_abandon(self) -> None:
+        if self._state == self.HALF_OPEN and self._probes_in_flight > 0:
+            self._probes_in_flight -= 1
+
+    def _trip(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self.times_opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self._consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_after_seconds": round(self.retry_after(), 3) if state == self.OPEN else 0.0,
+        }
+
+
+class RetryBudget:
+    """
+    Caps retries at `ratio` of the requests seen over a sliding `window` (plus a floor of
+    `min_per_second` so a quiet gateway can still retry), shared by all upstreams.
+    During an outage the extra load the gateway adds is then bounded by the budget instead
+    of multiplying traffic by the attempt count.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, window: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self.exhausted = 0
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window
+        for q in (self._requests, self._retries):
+            while q and q[0] < cutoff:
+                q.popleft()
+
+    def record_request(self) -> None:
+        self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._trim(now)
+        allowed = self.min_per_second * self.window + self.ratio * len(self._requests)
+        if len(self._retries) + 1 > allowed:
+            self.exhausted += 1
+            return False
+        self._retries.append(now)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        return {
+            "ratio": self.ratio,
+            "min_per_second": self.min_per_second,
+            "window_seconds": self.window,
+            "requests_in_window": len(self._requests),
+            "retries_in_window": len(self._retries),
+            "exhausted": self.exhausted,
+        }
+
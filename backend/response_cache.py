@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    In-process TTL + LRU cache for upstream read responses.
+
+    Keys are (upstream, request) tuples so a whole data structure can be invalidated at once.
+    Each upstream also carries a generation number that is bumped on every invalidation;
+    a read that started before a write must pass the generation it saw to put(), so it
+    cannot re-populate the cache with data the write already made stale.
+
+    Expired entries stay (LRU-bounded, dropped on invalidation) so a read can revalidate one
+    with the upstream (see stale/refresh) instead of downloading the body again.
+
+    Only touched from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.revalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def generation(self, upstream: str) -> int:
+        return self._generations.get(upstream, 0)
+
+    def get(self, upstream: str, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        full_key = (upstream, key)
+        entry = self._entries.get(full_key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(full_key)
+        self.hits += 1
+        return value
+
+    def put(self, upstream: str, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        if generation is not None and generation != self.generation(upstream):
+            return
+        full_key = (upstream, key)
+        self._entries[full_key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(full_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stale(self, upstream: str, key: Hashable) -> Optional[Any]:
+        """The entry for key even if it has expired, or None; for conditional revalidation."""
+        if not self.enabled:
+            return None
+        entry = self._entries.get((upstream, key))
+        return None if entry is None else entry[1]
+
+    def refresh(self, upstream: str, key: Hashable, generation: Optional[int] = None) -> None:
+        """Restart an entry's TTL after the upstream confirmed it is still current."""
+        full_key = (upstream, key)
+        if full_key not in self._entries:
+            return
+        if generation is not None and generation != self.generation(upstream):
+            return
+        self._entries[full_key] = (time.monotonic() + self.ttl_seconds, self._entries[full_key][1])
+        self._entries.move_to_end(full_key)
+        self.revalidations += 1
+
+    def invalidate(self, upstream: str) -> None:
+        self._generations[upstream] = self.generation(upstream) + 1
+        for full_key in [k for k in self._entries if k[0] == upstream]:
+            del self._entries[full_key]
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "revalidations": self.revalidations,
+        }
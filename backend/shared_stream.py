@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+
+class SharedStream:
+    """
+    One upstream body, read once and relayed to any number of readers.
+
+    A pump task reads `source` into a window of chunks that each reader walks at its own pace.
+    A chunk is dropped once every reader has moved past it, and the pump stops reading while
+    the window holds `window_bytes` or more, so memory stays flat however big the body is and
+    the transfer runs at the pace of the slowest reader. A reader can only join while the first
+    chunk is still held: after that reader() returns None and the caller has to fetch its own
+    copy. A reader counts once it is first iterated; until then it keeps the first chunk for
+    itself, but only for `join_grace_seconds` of the window being full, and fails when started
+    if the first chunk has been dropped.
+    If the pump waits for room for longer than `stall_seconds`, or every reader that started
+    leaves before the transfer finishes, the pump is cancelled and the stream stops being
+    joinable.
+
+    `close` runs once the pump stops, however it stops; `on_done` (if given) right after.
+    Only touched from the event loop, so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterator[bytes],
+        close: Callable[[], Awaitable[None]],
+        on_done: Optional[Callable[[], None]] = None,
+        window_bytes: int = 1024 * 1024,
+        stall_seconds: float = 30.0,
+        join_grace_seconds: float = 1.0,
+    ):
+        self._chunks: List[bytes] = []
+        self._base = 0  # index in the body of self._chunks[0]
+        self._buffered = 0
+        self._window_bytes = window_bytes
+        self._stall_seconds = stall_seconds
+        self._join_grace_seconds = join_grace_seconds
+        self._done = False
+        self._abandoned = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+        # Readers handed out but not yet iterated (by id) and readers being iterated (id ->
+        # index in the body of the next chunk they need).
+        self._unstarted: Set[int] = set()
+        self._positions: Dict[int, int] = {}
+        self._next_reader = 0
+        self.joined = 0
+        self._task = asyncio.ensure_future(self._pump(source, close, on_done))
+
+    @property
+    def joinable(self) -> bool:
+        return not self._done and not self._abandoned and self._base == 0
+
+    async def _pump(
+        self, source: AsyncIterator[bytes], close: Callable[[], Awaitable[None]], on_done: Optional[Callable[[], None]]
+    ) -> None:
+        try:
+            async for chunk in source:
+                self._chunks.append(chunk)
+                self._buffered += len(chunk)
+                self._wake()
+                if self._buffered >= self._window_bytes:
+                    await self._wait_for_room()
+        except asyncio.CancelledError:
+            self._error = ConnectionAbortedError("shared stream abandoned")
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._wake()
+            try:
+                await close()
+            finally:
+                if on_done:
+                    on_done()
+
+    async def _wait_for_room(self) -> None:
+        loop = asyncio.get_running_loop()
+        full_since = loop.time()
+        while self._buffered >= self._window_bytes:
+            timeout = self._stall_seconds
+            if self._unstarted:
+                grace_left = full_since + self._join_grace_seconds - loop.time()
+                if grace_left <= 0:
+                    # Readers that have not started by now no longer hold up the ones that have.
+                    self._unstarted.clear()
+                    self._trim()
+                    continue
+                timeout = min(timeout, grace_left)
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                if not self._unstarted:
+                    self._abandoned = True
+                    raise ConnectionAbortedError("shared stream stalled") from None
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _trim(self) -> None:
+        # Drop the chunks every reader is past; readers not yet started still need the first.
+        if self._unstarted or not self._positions:
+            return
+        drop = min(self._positions.values()) - self._base
+        if drop <= 0:
+            return
+        self._buffered -= sum(len(c) for c in self._chunks[:drop])
+        del self._chunks[:drop]
+        self._base += drop
+        self._wake()
+
+    def reader(self) -> Optional[AsyncIterator[bytes]]:
+        """A new reader from the start of the body, or None if the start has been dropped."""
+        if self._base:
+            return None
+        reader_id = self._next_reader
+        self._next_reader += 1
+        self._unstarted.add(reader_id)
+        self.joined += 1
+        return self._read(reader_id)
+
+    async def _read(self, reader_id: int) -> AsyncIterator[bytes]:
+        self._unstarted.discard(reader_id)
+        if self._base:
+            raise ConnectionAbortedError("shared stream moved on before this reader started")
+        self._positions[reader_id] = 0
+        try:
+            while True:
+                i = self._positions[reader_id]
+                if i < self._base + len(self._chunks):
+                    chunk = self._chunks[i - self._base]
+                    self._positions[reader_id] = i + 1
+                    self._trim()
+                    yield chunk
+                elif self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            del self._positions[reader_id]
+            if not self._positions and not self._done:
+                self._abandoned = True
+                self._task.cancel()
+            else:
+                self._trim()
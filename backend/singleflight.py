@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for `key` is in flight, later callers
+    wait for that call instead of starting their own, and every caller gets its result
+    (or its exception).
+
+    The shared call runs as its own task and callers await it through asyncio.shield, so a
+    client disconnecting (cancelling its handler) does not cancel the call for the others.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.followers += 1
+            return await asyncio.shield(task)
+
+        self.leaders += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+
+        def _forget(done: "asyncio.Task[Any]") -> None:
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+
+        task.add_done_callback(_forget)
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
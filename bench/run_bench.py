@@ -0,0 +1,282 @@
+"""
+Load/benchmark driver for backend/app.py.
+
+Starts the stub upstreams (stub_upstreams.py) and the backend under hypercorn as child
+processes, with STACK_URL / LINKEDLIST_URL / GRAPH_URL pointed at the stubs, then drives a
+weighted read/write workload from a fixed number of concurrent clients for a fixed time.
+
+Reports RPS, error counts and p50/p95/p99 latency per route, and writes the run (settings
+included) as JSON under bench/results/ so it can be compared against an earlier run:
+
+    python run_bench.py --workload mixed --concurrency 200 --duration 30 --latency-ms 5
+    python run_bench.py --workload mixed --compare results/<earlier>.json
+
+Use --backend-url to benchmark an already running backend instead (no processes started).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(HERE), "backend")
+RESULTS_DIR = os.path.join(HERE, "results")
+
+# name -> (method, backend path, body factory)
+Operation = Tuple[str, str, Optional[Callable[[], Dict[str, Any]]]]
+
+OPERATIONS: Dict[str, Operation] = {
+    "stack.data": ("GET", "/stack/data", None),
+    "stack.push": ("POST", "/stack/push", lambda: {"value": random.randint(0, 1000)}),
+    "stack.pop": ("POST", "/stack/pop", None),
+    "stack.push-many": ("POST", "/stack/push-many", lambda: {"values": [random.randint(0, 1000) for _ in range(100)]}),
+    "stack.pop-n": ("POST", "/stack/pop-n", lambda: {"count": 100}),
+    "list.data": ("GET", "/list/data", None),
+    "list.add": ("POST", "/list/add", lambda: {"value": f"item-{random.randint(0, 1000)}"}),
+    "list.remove-head": ("POST", "/list/remove-head", None),
+    "graph.data": ("GET", "/graph/data", None),
+    "graph.add-edge": ("POST", "/graph/add-edge", lambda: {"from": f"N{random.randint(0, 50)}", "to": f"N{random.randint(0, 50)}"}),
+    "graph.delete-edge": ("POST", "/graph/delete-edge", lambda: {"from": f"N{random.randint(0, 50)}", "to": f"N{random.randint(0, 50)}"}),
+}
+
+# workload -> operation weights
+WORKLOADS: Dict[str, Dict[str, int]] = {
+    "read-heavy": {"stack.data": 30, "list.data": 30, "graph.data": 30, "stack.push": 4, "list.add": 3, "graph.add-edge": 3},
+    "mixed": {
+        "stack.data": 15, "list.data": 15, "graph.data": 20,
+        "stack.push": 10, "stack.pop": 8, "list.add": 10, "list.remove-head": 7,
+        "graph.add-edge": 10, "graph.delete-edge": 5,
+    },
+    "write-heavy": {"stack.push": 30, "stack.pop": 20, "list.add": 20, "graph.add-edge": 20, "graph.data": 10},
+    "stack-bulk": {"stack.push-many": 50, "stack.pop-n": 40, "stack.data": 10},
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_http(url: str, deadline_s: float = 20.0) -> None:
+    end = time.monotonic() + deadline_s
+    while time.monotonic() < end:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {deadline_s}s")
+
+
+def start_processes(args: argparse.Namespace) -> Tuple[str, List[subprocess.Popen]]:
+    ports = [_free_port() for _ in range(4)]
+    stack_port, list_port, graph_port, backend_port = ports
+    procs = [
+        subprocess.Popen([
+            sys.executable, os.path.join(HERE, "stub_upstreams.py"),
+            "--stack-port", str(stack_port), "--list-port", str(list_port), "--graph-port", str(graph_port),
+            "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+            "--error-rate", str(args.error_rate),
+        ], stdout=subprocess.DEVNULL)
+    ]
+    _wait_http(f"http://127.0.0.1:{stack_port}/health")
+
+    env = os.environ.copy()
+    env.update({
+        "STACK_URL": f"http://127.0.0.1:{stack_port}",
+        "LINKEDLIST_URL": f"http://127.0.0.1:{list_port}",
+        "GRAPH_URL": f"http://127.0.0.1:{graph_port}",
+    })
+    procs.append(subprocess.Popen(
+        [sys.executable, "-m", "hypercorn", "app:app", "--bind", f"127.0.0.1:{backend_port}",
+         "--workers", str(args.backend_workers)],
+        cwd=BACKEND_DIR, env=env, stderr=subprocess.DEVNULL,
+    ))
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    _wait_http(f"{backend_url}/health")
+    return backend_url, procs
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class _Connection:
+    """
+    One keep-alive HTTP/1.1 connection owned by a single worker. A pooled client shared by
+    hundreds of workers adds its own queueing, which would be measured as backend latency.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[Dict[str, Any]]) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(payload)}\r\n"
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        try:
+            self.writer.write(head.encode() + b"\r\n" + payload)
+            await self.writer.drain()
+            return await self._read_response()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            raise
+
+    async def _read_response(self) -> int:
+        assert self.reader is not None
+        head = (await self.reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        status = int(head[0].split(" ", 2)[1])
+        headers = {}
+        for line in head[1:]:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip().lower()
+        if headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.readexactly(int(headers.get("content-length", "0")))
+        if headers.get("connection") == "close":
+            self.close()
+        return status
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def drive(backend_url: str, weights: Dict[str, int], concurrency: int, duration: float, warmup: float):
+    url = httpx.URL(backend_url)
+    names = list(weights)
+    cum_weights = list(weights.values())
+    samples: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    async def worker() -> None:
+        conn = _Connection(url.host, url.port or 80)
+        try:
+            while time.perf_counter() < stop_at:
+                name = random.choices(names, cum_weights)[0]
+                method, path, body = OPERATIONS[name]
+                t0 = time.perf_counter()
+                try:
+                    ok = await conn.request(method, path, body() if body else None) < 500
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    ok = False
+                t1 = time.perf_counter()
+                if t0 >= measure_from:
+                    samples[name].append(t1 - t0)
+                    if not ok:
+                        errors[name] += 1
+        finally:
+            conn.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    routes = {}
+    total = 0
+    for name in names:
+        lat = sorted(samples[name])
+        total += len(lat)
+        routes[name] = {
+            "requests": len(lat),
+            "errors": errors[name],
+            "rps": round(len(lat) / duration, 1),
+            "p50_ms": round(_percentile(lat, 50) * 1000, 2),
+            "p95_ms": round(_percentile(lat, 95) * 1000, 2),
+            "p99_ms": round(_percentile(lat, 99) * 1000, 2),
+        }
+    return {"total_requests": total, "total_rps": round(total / duration, 1), "routes": routes}
+
+
+def print_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    base_routes = (baseline or {}).get("routes", {})
+    print(f"\nworkload={result['settings']['workload']} total_rps={result['total_rps']}"
+          + (f" (baseline {baseline['total_rps']})" if baseline else ""))
+    print(f"{'route':<20}{'reqs':>8}{'errs':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, r in result["routes"].items():
+        line = f"{name:<20}{r['requests']:>8}{r['errors']:>6}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+        b = base_routes.get(name)
+        if b and b.get("p99_ms"):
+            line += f"   p99 {100.0 * (r['p99_ms'] - b['p99_ms']) / b['p99_ms']:+.1f}% vs baseline"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark backend/app.py against stub upstreams.")
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before measuring")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="stub upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=1.0, help="extra uniform stub latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub responses that are 500s")
+    parser.add_argument("--backend-workers", type=int, default=1)
+    parser.add_argument("--backend-url", help="benchmark an already running backend instead")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--label", default="", help="free-form tag stored with the results")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    procs: List[subprocess.Popen] = []
+    try:
+        backend_url = args.backend_url
+        if not backend_url:
+            backend_url, procs = start_processes(args)
+        result = asyncio.run(drive(backend_url, WORKLOADS[args.workload], args.concurrency, args.duration, args.warmup))
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait(timeout=10)
+
+    result["settings"] = {k: v for k, v in vars(args).items() if k not in ("compare", "no_save")}
+    result["timestamp_utc"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    result["build_sha"] = os.getenv("BUILD_SHA", "dev")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{args.workload}{'-' + args.label if args.label else ''}.json"
+        path = os.path.join(RESULTS_DIR, name)
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nsaved {path}")
+
+
+if __name__ == "__main__":
+    main()
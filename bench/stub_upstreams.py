@@ -0,0 +1,182 @@
+"""
+In-memory stand-ins for the stack, linked list and graph services, speaking just enough
+HTTP/1.1 (keep-alive, Content-Length bodies) for the backend to proxy to them.
+
+Each stub can add latency (fixed + uniform jitter) and fail a fraction of requests with 500,
+so the backend can be benchmarked without Postgres or the real services.
+
+Run standalone:
+    python stub_upstreams.py --stack-port 7001 --list-port 7002 --graph-port 7003 --latency-ms 5
+"""
+import argparse
+import asyncio
+import json
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class StubUpstream:
+    def __init__(self, kind: str, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.kind = kind
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self.stack: List[int] = []
+        self.items: List[str] = []
+        self.nodes: Dict[str, None] = {}
+        self.edges: Dict[Tuple[str, str], None] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    # ---------------- data structure handlers ---------------- #
+
+    def _graph(self) -> Dict[str, Any]:
+        return {"nodes": list(self.nodes), "edges": [list(e) for e in self.edges]}
+
+    def handle(self, method: str, path: str, body: Dict[str, Any]) -> Tuple[int, Any]:
+        route = (method, path.split("?", 1)[0])
+
+        if route == ("GET", "/health"):
+            return 200, {"status": "ok"}
+
+        if self.kind == "stack":
+            if route == ("GET", "/stack"):
+                return 200, self.stack[::-1]
+            if route == ("POST", "/push"):
+                self.stack.append(int(body.get("value", 0)))
+                return 200, {"status": "pushed"}
+            if route == ("POST", "/pop"):
+                if not self.stack:
+                    return 200, {"status": "stack empty"}
+                return 200, {"status": "popped", "value": self.stack.pop()}
+            if route == ("POST", "/push-many"):
+                values = [int(v) for v in body.get("values", [])]
+                self.stack.extend(values)
+                return 200, {"status": "pushed", "count": len(values)}
+            if route == ("POST", "/pop-n"):
+                n = int(body.get("count", 1))
+                popped = self.stack[:-n - 1:-1]
+                del self.stack[len(self.stack) - len(popped):]
+                return 200, {"status": "popped" if popped else "stack empty", "values": popped}
+
+        if self.kind == "linkedlist":
+            if route == ("GET", "/list"):
+                return 200, self.items
+            if route == ("POST", "/add"):
+                self.items.append(str(body.get("value", "")))
+                return 200, {"status": "added", "value": self.items[-1]}
+            if route in (("POST", "/delete"), ("POST", "/remove-head")):
+                if not self.items:
+                    return 200, {"status": "list empty"}
+                if route[1] == "/delete":
+                    self.items.pop()
+                    return 200, {"status": "removed tail"}
+                self.items.pop(0)
+                return 200, {"status": "removed head"}
+
+        if self.kind == "graph":
+            if route == ("GET", "/data"):
+                return 200, self._graph()
+            label = str(body.get("label", "")).strip().upper()
+            u = str(body.get("from", "")).strip().upper()
+            v = str(body.get("to", "")).strip().upper()
+            if route == ("POST", "/add-node"):
+                self.nodes[label] = None
+                return 200, {"status": "processed", "graph": self._graph()}
+            if route == ("POST", "/add-edge"):
+                self.nodes[u] = None
+                self.nodes[v] = None
+                self.edges[(u, v)] = None
+                return 200, {"status": "processed", "graph": self._graph()}
+            if route == ("POST", "/delete-node"):
+                self.nodes.pop(label, None)
+                self.edges = {e: None for e in self.edges if label not in e}
+                return 200, {"status": "deleted", "graph": self._graph()}
+            if route == ("POST", "/delete-edge"):
+                self.edges.pop((u, v), None)
+                return 200, {"status": "edge_deleted", "graph": self._graph()}
+
+        return 404, {"error": "Route Not Found"}
+
+    # ---------------- HTTP plumbing ---------------- #
+
+    async def _serve_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                raw = await reader.readexactly(int(headers.get("content-length", "0")))
+
+                self.requests += 1
+                delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+                if delay > 0:
+                    await asyncio.sleep(delay / 1000.0)
+
+                if self.error_rate and random.random() < self.error_rate:
+                    status, payload = 500, {"error": "injected failure"}
+                else:
+                    try:
+                        body = json.loads(raw) if raw else {}
+                        status, payload = self.handle(method, path, body if isinstance(body, dict) else {})
+                    except (ValueError, TypeError):
+                        status, payload = 400, {"error": "Bad Request"}
+
+                out = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(out)}\r\n\r\n".encode() + out
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self.server = await asyncio.start_server(self._serve_conn, host, port, backlog=4096)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+async def start_stubs(latency_ms: float, jitter_ms: float, error_rate: float, ports=(0, 0, 0)) -> Dict[str, Tuple[StubUpstream, int]]:
+    """Start the three stubs; returns kind -> (stub, port)."""
+    stubs = {}
+    for kind, port in zip(("stack", "linkedlist", "graph"), ports):
+        stub = StubUpstream(kind, latency_ms, jitter_ms, error_rate)
+        stubs[kind] = (stub, await stub.start(port=port))
+    return stubs
+
+
+async def _main(args: argparse.Namespace) -> None:
+    stubs = await start_stubs(
+        args.latency_ms, args.jitter_ms, args.error_rate, (args.stack_port, args.list_port, args.graph_port)
+    )
+    for kind, (_, port) in stubs.items():
+        print(f"{kind}: http://127.0.0.1:{port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run stub stack/linkedlist/graph upstreams.")
+    parser.add_argument("--stack-port", type=int, default=7001)
+    parser.add_argument("--list-port", type=int, default=7002)
+    parser.add_argument("--graph-port", type=int, default=7003)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -1,6 +1,30 @@
+import asyncio
+import itertools
 import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import TRANSACTION_STATUS_INTRANS
+from psycopg2.extras import RealDictCursor, execute_batch
+
+# --- POOL CONFIG ---
+# Connections are opened lazily up to DB_POOL_MAX_SIZE and kept warm down to DB_POOL_MIN_SIZE.
+# A caller waits at most DB_POOL_TIMEOUT_SECONDS for a free connection. Connections older than
+# DB_POOL_MAX_LIFETIME_SECONDS are replaced, and ones idle longer than
+# DB_POOL_HEALTHCHECK_IDLE_SECONDS are pinged before being handed out.
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT_SECONDS = float(os.environ.get('DB_POOL_TIMEOUT_SECONDS', '5'))
+DB_POOL_MAX_LIFETIME_SECONDS = float(os.environ.get('DB_POOL_MAX_LIFETIME_SECONDS', '1800'))
+DB_POOL_HEALTHCHECK_IDLE_SECONDS = float(os.environ.get('DB_POOL_HEALTHCHECK_IDLE_SECONDS', '30'))
+
+# Rows fetched per round trip by stream(); only one chunk is held in memory at a time.
+DB_STREAM_CHUNK_ROWS = int(os.environ.get('DB_STREAM_CHUNK_ROWS', '10000'))
+# Statements sent per round trip by execute_many().
+DB_EXECUTE_MANY_PAGE_SIZE = int(os.environ.get('DB_EXECUTE_MANY_PAGE_SIZE', '100'))
 
 
 def get_db_connection():
@@ -21,32 +45,428 @@ def get_db_connection():
         return None
 
 
-def execute_query(query, params=None, fetch=False):
+class PoolTimeout(Exception):
+    pass
+
+
+class _PooledConnection:
+    """A pooled connection plus the bookkeeping the pool needs about it."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.prepared = set()  # names of statements PREPAREd on this connection
+        self.cursors = itertools.count(1)  # suffixes for server-side cursor names
+        self.reused = False  # handed out before (vs. freshly opened)
+
+    def expired(self, now):
+        return now - self.created_at > DB_POOL_MAX_LIFETIME_SECONDS
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
     """
-    Helper to execute a query safely.
+    Thread-safe, bounded pool of autocommit connections.
+
+    Flask serves requests on threads, so checkout blocks on a condition variable until a
+    connection is free (or a new one may be opened), up to DB_POOL_TIMEOUT_SECONDS.
     """
-    conn = get_db_connection()
-    if conn is None:
-        return None
 
-    result = None
+    def __init__(self, min_size, max_size, timeout):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._size = 0  # idle + checked out + being opened
+        self._cond = threading.Condition()
+
+    def _open(self):
+        conn = get_db_connection()
+        if conn is None:
+            return None
+        # Each execute_query call is one statement, so autocommit saves the BEGIN/COMMIT
+        # round trips and never leaves a pooled connection idle in a transaction.
+        conn.autocommit = True
+        return _PooledConnection(conn)
+
+    def _healthy(self, pooled, now):
+        if pooled.conn.closed or pooled.expired(now):
+            return False
+        if now - pooled.last_used < DB_POOL_HEALTHCHECK_IDLE_SECONDS:
+            return True
+        try:
+            with pooled.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Check out a connection; returns None if one cannot be opened, raises PoolTimeout."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"no database connection free after {self.timeout}s")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    pooled = None
+                    self._size += 1
+
+            if pooled is None:
+                pooled = self._open()
+                if pooled is None:
+                    self._discard(None)
+                return pooled
+            if self._healthy(pooled, time.monotonic()):
+                pooled.reused = True
+                return pooled
+            self._discard(pooled)
+
+    def putconn(self, pooled, broken=False):
+        now = time.monotonic()
+        if broken or pooled.conn.closed or pooled.expired(now):
+            self._discard(pooled)
+            return
+        pooled.last_used = now
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def _discard(self, pooled):
+        if pooled is not None:
+            pooled.close()
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def discard_idle(self):
+        """Close every idle connection, e.g. after finding one that the server dropped."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._discard(pooled)
+
+    def warm_up(self):
+        """Open connections until min_size are idle (best effort)."""
+        opened = []
+        with self._cond:
+            want = max(0, min(self.min_size, self.max_size) - self._size)
+            self._size += want
+        for _ in range(want):
+            pooled = self._open()
+            if pooled is None:
+                self._discard(None)
+            else:
+                opened.append(pooled)
+        for pooled in opened:
+            self.putconn(pooled)
+
+    def stats(self):
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "max_size": self.max_size}
+
+
+_pool = ConnectionPool(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT_SECONDS)
+_warm = False
+
+
+@contextmanager
+def connection():
+    """
+    Borrow a pooled connection for the duration of the block. Yields None if the database
+    cannot be reached. The connection is dropped instead of returned if it broke.
+    """
+    global _warm
+    if not _warm:
+        _warm = True
+        _pool.warm_up()
     try:
-        # RealDictCursor allows accessing columns by name: row['label']
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(query, params)
+        pooled = _pool.getconn()
+    except PoolTimeout as e:
+        print(f"Database Connection Failed: {e}")
+        pooled = None
+    if pooled is None:
+        yield None
+        return
+    broken = False
+    try:
+        yield pooled
+    except (psycopg2.OperationalError, psycopg2.InterfaceError, psycopg2.NotSupportedError):
+        # NotSupportedError covers "cached plan must not change result type" after DDL.
+        broken = True
+        raise
+    finally:
+        _pool.putconn(pooled, broken=broken or pooled.conn.closed)
 
-        if fetch:
-            result = cur.fetchall()
+
+def pool_stats():
+    return _pool.stats()
+
+
+_PLACEHOLDER = re.compile(r"%s")
+_statement_names = {}  # query text -> prepared statement name, shared by all connections
+_statement_lock = threading.Lock()
+
+
+def _prepare(cur, pooled, query):
+    """
+    PREPARE `query` on this connection once and return its statement name. psycopg2 has no
+    protocol-level prepare, so this uses SQL PREPARE/EXECUTE with %s rewritten to $1..$n.
+    """
+    with _statement_lock:
+        name = _statement_names.setdefault(query, f"q{len(_statement_names) + 1}")
+    if name not in pooled.prepared:
+        counter = itertools.count(1)
+        body = _PLACEHOLDER.sub(lambda m: f"${next(counter)}", query)
+        cur.execute(f"PREPARE {name} AS {body}")
+        pooled.prepared.add(name)
+    return name
+
+
+def execute_query(query, params=None, fetch=False, prepared=False, dict_rows=False, prefix=()):
+    """
+    Helper to execute a query safely.
+    - query: SQL string
+    - params: Tuple of values (e.g. (label,))
+    - fetch: True if you expect data back (SELECT), False for INSERT/UPDATE
+    - prepared: True for fixed query text run often; it is PREPAREd once per pooled
+      connection and EXECUTEd afterwards, skipping parse/plan on every call
+    - dict_rows: True returns dicts keyed by column name (row['label']) instead of plain
+      tuples, which cost several times less on large results
+    - prefix: fixed statements (no parameters) run first, in the same round trip and implicit
+      transaction, each with its own snapshot; with `prepared` they are PREPAREd too
+    """
+    # Pooled connections can die while idle (server restart, idle timeout); the first
+    # statement on one then fails before doing anything. Its idle siblings most likely went
+    # with it, so they are dropped too and the statement is retried once on a fresh connection.
+    for attempt in (1, 2):
+        pooled = None
+        try:
+            with connection() as pooled:
+                if pooled is None:
+                    return None
+                return _run(pooled, query, params, fetch, prepared, dict_rows, prefix)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            if attempt == 1 and pooled is not None and pooled.reused and pooled.conn.closed:
+                _pool.discard_idle()
+                continue
+            print(f"Query Failed: {query} | Error: {e}")
+            return False
+        except Exception as e:
+            print(f"Query Failed: {query} | Error: {e}")
+            return False  # explicit failure
+
+
+def _cursor(pooled, dict_rows):
+    # RealDictCursor allows accessing columns by name: row['label']
+    return pooled.conn.cursor(cursor_factory=RealDictCursor if dict_rows else None)
+
+
+def _execute_prepared(cur, name, args, lead=""):
+    if args:
+        cur.execute(f"{lead}EXECUTE {name} ({', '.join(['%s'] * len(args))})", args)
+    else:
+        cur.execute(f"{lead}EXECUTE {name}")
+
+
+def _run(pooled, query, params, fetch, prepared, dict_rows=False, prefix=()):
+    with _cursor(pooled, dict_rows) as cur:
+        if prepared:
+            lead = "".join(f"EXECUTE {_prepare(cur, pooled, q)}; " for q in prefix)
+            _execute_prepared(cur, _prepare(cur, pooled, query), params or (), lead)
         else:
-            conn.commit()
-            result = True
+            cur.execute("".join(f"{q}; " for q in prefix) + query, params)
 
-        cur.close()
-    except Exception as e:
-        print(f"Query Failed: {query} | Error: {e}")
-        if conn: conn.rollback()
-        result = False
+        if fetch:
+            return cur.fetchall()
+        return True
+
+
+def _run_many(pooled, query, params_seq, prepared, page_size):
+    """Run `query` once per params tuple, sending page_size statements per round trip."""
+    with pooled.conn.cursor() as cur:
+        params_seq = list(params_seq)
+        if not params_seq:
+            return 0
+        if prepared:
+            name = _prepare(cur, pooled, query)
+            arity = len(params_seq[0])
+            query = f"EXECUTE {name} ({', '.join(['%s'] * arity)})" if arity else f"EXECUTE {name}"
+        execute_batch(cur, query, params_seq, page_size=page_size)
+        return len(params_seq)
+
+
+def _fetch_chunks(pooled, query, params, chunk_size, dict_rows):
+    """
+    Yield the rows of `query` in lists of up to chunk_size, through a server-side cursor
+    (DECLARE/FETCH; must run inside a transaction) so the full result never sits in memory.
+    """
+    name = f"stream_{next(pooled.cursors)}"
+    with pooled.conn.cursor() as cur:
+        cur.execute(f"DECLARE {name} NO SCROLL CURSOR FOR {query}", params)
+    try:
+        with _cursor(pooled, dict_rows) as cur:
+            while True:
+                cur.execute(f"FETCH FORWARD {int(chunk_size)} FROM {name}")
+                rows = cur.fetchall()
+                if rows:
+                    yield rows
+                if len(rows) < chunk_size:
+                    return
     finally:
-        if conn: conn.close()
+        # Abandoned early: free the cursor now. After an error the rollback frees it.
+        if not pooled.conn.closed and pooled.conn.info.transaction_status == TRANSACTION_STATUS_INTRANS:
+            with pooled.conn.cursor() as cur:
+                cur.execute(f"CLOSE {name}")
+
+
+def execute_many(query, params_seq, prepared=False, page_size=None):
+    """
+    Run one statement for each params tuple in `params_seq`, in one transaction, sending
+    page_size (default DB_EXECUTE_MANY_PAGE_SIZE) statements per round trip instead of one.
+    With `prepared`, each is an EXECUTE of the statement PREPAREd once per connection.
+    Returns the number of statements run, or None/False like run_transaction on failure.
+    """
+    return run_transaction(lambda tx: tx.execute_many(query, params_seq, prepared, page_size))
+
+
+def stream(query, params=None, chunk_size=None, dict_rows=False):
+    """
+    Iterate over the rows of a large SELECT without holding them all in memory: they come
+    from a server-side cursor in chunks of chunk_size (default DB_STREAM_CHUNK_ROWS), inside
+    one read-only transaction that ends when iteration does (or the generator is closed).
+    Unlike execute_query this raises on failure, since some rows may already be consumed.
+    """
+    for rows in _stream_chunks(query, params, chunk_size, dict_rows):
+        yield from rows
 
-    return result
\ No newline at end of file
+
+def _stream_chunks(query, params, chunk_size, dict_rows):
+    with connection() as pooled:
+        if pooled is None:
+            raise psycopg2.OperationalError("database unreachable")
+        with pooled.conn.cursor() as cur:
+            cur.execute("BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        try:
+            yield from _fetch_chunks(pooled, query, params, chunk_size or DB_STREAM_CHUNK_ROWS, dict_rows)
+            with pooled.conn.cursor() as cur:
+                cur.execute("COMMIT")
+        except BaseException:
+            if not pooled.conn.closed:
+                with pooled.conn.cursor() as cur:
+                    cur.execute("ROLLBACK")
+            raise
+
+
+class Transaction:
+    """Handle passed to run_transaction callbacks; statements share one connection and commit."""
+
+    def __init__(self, pooled):
+        self._pooled = pooled
+        self.executed = 0
+
+    def execute(self, query, params=None, fetch=False, prepared=False, dict_rows=False):
+        """Same arguments as execute_query, but raises on failure (rolling back the transaction)."""
+        result = _run(self._pooled, query, params, fetch, prepared, dict_rows)
+        self.executed += 1
+        return result
+
+    def execute_many(self, query, params_seq, prepared=False, page_size=None):
+        """Like the module-level execute_many, within this transaction; raises on failure."""
+        count = _run_many(self._pooled, query, params_seq, prepared, page_size or DB_EXECUTE_MANY_PAGE_SIZE)
+        self.executed += 1
+        return count
+
+    def stream(self, query, params=None, chunk_size=None, dict_rows=False):
+        """Like the module-level stream, but reading this transaction's snapshot."""
+        self.executed += 1
+        for rows in _fetch_chunks(self._pooled, query, params, chunk_size or DB_STREAM_CHUNK_ROWS, dict_rows):
+            yield from rows
+
+    def copy(self, sql, file, size=65536):
+        """COPY ... FROM STDIN (reads `file`) or TO STDOUT (writes `file`); returns the row count."""
+        with self._pooled.conn.cursor() as cur:
+            cur.copy_expert(sql, file, size)
+            self.executed += 1
+            return cur.rowcount
+
+
+def run_transaction(fn, isolation=None):
+    """
+    Run fn(tx) inside one transaction on one pooled connection and return its result.
+    - isolation: optional level for BEGIN, e.g. "REPEATABLE READ READ ONLY"
+    Returns None if the database cannot be reached, and False (after rolling back) if any
+    statement or fn itself raised; a transaction that failed on a dead idle connection before
+    running anything is retried once, like execute_query.
+    """
+    for attempt in (1, 2):
+        pooled = None
+        tx = None
+        try:
+            with connection() as pooled:
+                if pooled is None:
+                    return None
+                tx = Transaction(pooled)
+                with pooled.conn.cursor() as cur:
+                    cur.execute(f"BEGIN ISOLATION LEVEL {isolation}" if isolation else "BEGIN")
+                try:
+                    result = fn(tx)
+                    with pooled.conn.cursor() as cur:
+                        cur.execute("COMMIT")
+                    return result
+                except BaseException:
+                    if not pooled.conn.closed:
+                        with pooled.conn.cursor() as cur:
+                            cur.execute("ROLLBACK")
+                    raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            stale = pooled is not None and pooled.reused and pooled.conn.closed
+            if attempt == 1 and stale and (tx is None or tx.executed == 0):
+                _pool.discard_idle()
+                continue
+            print(f"Transaction Failed: {e}")
+            return False
+        except Exception as e:
+            print(f"Transaction Failed: {e}")
+            return False
+
+
+# --- ASYNC INTERFACE ---
+# For asyncio services: the same pooled calls, each run on a worker thread so the event loop
+# never blocks on the database. At most DB_POOL_MAX_SIZE of them hold a connection at once.
+async def execute_query_async(query, params=None, fetch=False, prepared=False, dict_rows=False):
+    return await asyncio.to_thread(execute_query, query, params, fetch, prepared, dict_rows)
+
+
+async def execute_many_async(query, params_seq, prepared=False, page_size=None):
+    return await asyncio.to_thread(execute_many, query, list(params_seq), prepared, page_size)
+
+
+async def run_transaction_async(fn, isolation=None):
+    """run_transaction on a worker thread; fn(tx) is synchronous and runs there too."""
+    return await asyncio.to_thread(run_transaction, fn, isolation)
+
+
+async def stream_async(query, params=None, chunk_size=None, dict_rows=False):
+    """Async iterator over stream(): each chunk is fetched on a worker thread."""
+    chunks = _stream_chunks(query, params, chunk_size, dict_rows)
+    try:
+        while True:
+            rows = await asyncio.to_thread(next, chunks, None)
+            if rows is None:
+                return
+            for row in rows:
+                yield row
+    finally:
+        await asyncio.to_thread(chunks.close)
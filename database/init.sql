@@ -15,13 +15,72 @@ CREATE TABLE IF NOT EXISTS linked_list (
 );
 
 -- 3. GRAPH TABLES (Nodes and Edges)
+-- Nodes are keyed by a surrogate integer id; edges store pairs of ids. Existing databases
+-- are brought to this layout by graph/migrations.py, which the graph service runs on startup.
 CREATE TABLE IF NOT EXISTS nodes (
-    label VARCHAR(255) PRIMARY KEY
+    id SERIAL PRIMARY KEY,
+    label VARCHAR(255) NOT NULL CONSTRAINT nodes_label_key UNIQUE
 );
 
 CREATE TABLE IF NOT EXISTS edges (
     id SERIAL PRIMARY KEY,
-    source VARCHAR(255) REFERENCES nodes(label) ON DELETE CASCADE,
-    target VARCHAR(255) REFERENCES nodes(label) ON DELETE CASCADE,
+    source INTEGER NOT NULL REFERENCES nodes(id) ON DELETE CASCADE,
+    target INTEGER NOT NULL REFERENCES nodes(id) ON DELETE CASCADE,
     CONSTRAINT unique_edge UNIQUE (source, target)
-);
\ No newline at end of file
+);
+-- unique_edge serves lookups by source; this one serves lookups (and cascades) by target.
+CREATE INDEX IF NOT EXISTS edges_target_idx ON edges (target);
+-- 4. GRAPH VERSION (bumped by every graph mutation; replicas LISTEN on graph_changed)
+CREATE TABLE IF NOT EXISTS graph_meta (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO graph_meta (id, version) VALUES (TRUE, 0) ON CONFLICT DO NOTHING;
+
+-- 5. STACK / LIST VERSIONS (served as the ETag of GET /stack and GET /list so unchanged polls
+-- get 304 without a scan). A version is sum(version) over its table's 16 slots; statement
+-- triggers bump the slot of the writing backend (pg_backend_pid() % 16) for every statement
+-- that changes rows, so concurrent writers rarely queue on one row lock and empty writes
+-- (e.g. a pop of an empty stack) leave the version alone. The services also create these on
+-- first use, for databases initialised before they existed.
+CREATE TABLE IF NOT EXISTS stack_versions (slot INT PRIMARY KEY, version BIGINT NOT NULL DEFAULT 0);
+INSERT INTO stack_versions (slot) SELECT generate_series(0, 15) ON CONFLICT DO NOTHING;
+CREATE OR REPLACE FUNCTION bump_stack_version() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM old_rows) THEN RETURN NULL; END IF;
+    ELSIF TG_OP <> 'TRUNCATE' THEN
+        IF NOT EXISTS (SELECT 1 FROM new_rows) THEN RETURN NULL; END IF;
+    END IF;
+    UPDATE stack_versions SET version = version + 1 WHERE slot = pg_backend_pid() % 16;
+    RETURN NULL;
+END $$;
+CREATE OR REPLACE TRIGGER stack_version_insert AFTER INSERT ON stack
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_stack_version();
+CREATE OR REPLACE TRIGGER stack_version_update AFTER UPDATE ON stack
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_stack_version();
+CREATE OR REPLACE TRIGGER stack_version_delete AFTER DELETE ON stack
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_stack_version();
+CREATE OR REPLACE TRIGGER stack_version_truncate AFTER TRUNCATE ON stack
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_stack_version();
+
+CREATE TABLE IF NOT EXISTS list_versions (slot INT PRIMARY KEY, version BIGINT NOT NULL DEFAULT 0);
+INSERT INTO list_versions (slot) SELECT generate_series(0, 15) ON CONFLICT DO NOTHING;
+CREATE OR REPLACE FUNCTION bump_list_version() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM old_rows) THEN RETURN NULL; END IF;
+    ELSIF TG_OP <> 'TRUNCATE' THEN
+        IF NOT EXISTS (SELECT 1 FROM new_rows) THEN RETURN NULL; END IF;
+    END IF;
+    UPDATE list_versions SET version = version + 1 WHERE slot = pg_backend_pid() % 16;
+    RETURN NULL;
+END $$;
+CREATE OR REPLACE TRIGGER list_version_insert AFTER INSERT ON linked_list
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_list_version();
+CREATE OR REPLACE TRIGGER list_version_update AFTER UPDATE ON linked_list
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_list_version();
+CREATE OR REPLACE TRIGGER list_version_delete AFTER DELETE ON linked_list
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_list_version();
+CREATE OR REPLACE TRIGGER list_version_truncate AFTER TRUNCATE ON linked_list
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_list_version();
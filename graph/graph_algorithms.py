@@ -0,0 +1,300 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+DIRECTIONS = ("out", "in", "both")
+
+
+class CSRGraph:
+    """
+    Immutable compressed-sparse-row form of one graph version: node i is labels[i], its
+    successors are out_indices[out_indptr[i]:out_indptr[i + 1]] and its predecessors are
+    in_indices[in_indptr[i]:in_indptr[i + 1]].
+
+    Whole-graph results (components, SCCs, degree stats) are memoized on the instance, which
+    is itself cached per graph version, so they are computed once per change.
+    """
+
+    def __init__(self, labels, src, dst):
+        n = len(labels)
+        self.labels = labels
+        self.ids = {label: i for i, label in enumerate(labels)}
+        self.src = src
+        self.dst = dst
+        self.out_indptr, self.out_indices = _csr(n, src, dst)
+        self.in_indptr, self.in_indices = _csr(n, dst, src)
+        self._memo = {}
+        self._memo_lock = threading.RLock()
+
+    @classmethod
+    def from_adjacency(cls, nodes, out):
+        """Build from a node list and a {source: {target: ...}} adjacency map (see GraphIndex)."""
+        labels = list(nodes)
+        ids = {label: i for i, label in enumerate(labels)}
+        count = sum(len(targets) for targets in out.values())
+        src = np.fromiter((ids[u] for u, targets in out.items() for _ in targets), np.int32, count)
+        dst = np.fromiter((ids[v] for targets in out.values() for v in targets), np.int32, count)
+        return cls(labels, src, dst)
+
+    @property
+    def node_count(self):
+        return len(self.labels)
+
+    @property
+    def edge_count(self):
+        return int(self.src.size)
+
+    def node_id(self, label):
+        return self.ids.get(label)
+
+    def names(self, ids):
+        return [self.labels[i] for i in ids]
+
+    def _memoized(self, key, compute):
+        with self._memo_lock:
+            if key not in self._memo:
+                self._memo[key] = compute()
+            return self._memo[key]
+
+    def _adjacency(self, direction):
+        if direction == "out":
+            return [(self.out_indptr, self.out_indices)]
+        if direction == "in":
+            return [(self.in_indptr, self.in_indices)]
+        return [(self.out_indptr, self.out_indices), (self.in_indptr, self.in_indices)]
+
+    # --- traversal ---
+    def bfs(self, source, target=None, direction="out", max_depth=None):
+        """
+        Level-synchronous BFS from node id `source`; each level expands the whole frontier
+        with array ops. Stops early once `target` is reached or after `max_depth` levels.
+        Returns (dist, parent) arrays, -1 for unreached nodes.
+        """
+        n = self.node_count
+        dist = np.full(n, -1, dtype=np.int32)
+        parent = np.full(n, -1, dtype=np.int32)
+        dist[source] = 0
+        frontier = np.array([source], dtype=np.int32)
+        adjacency = self._adjacency(direction)
+        level = 0
+        while frontier.size and (max_depth is None or level < max_depth):
+            if target is not None and dist[target] >= 0:
+                break
+            level += 1
+            parts = [_gather(indptr, indices, frontier) for indptr, indices in adjacency]
+            nbrs = np.concatenate([p[0] for p in parts])
+            froms = np.concatenate([p[1] for p in parts])
+            fresh = dist[nbrs] < 0
+            nbrs, first = np.unique(nbrs[fresh], return_index=True)
+            dist[nbrs] = level
+            parent[nbrs] = froms[fresh][first]
+            frontier = nbrs
+        return dist, parent
+
+    def shortest_path(self, source, target, direction="out"):
+        """Node ids of one fewest-hops path from source to target, or None if unreachable."""
+        dist, parent = self.bfs(source, target=target, direction=direction)
+        if dist[target] < 0:
+            return None
+        path = [target]
+        while path[-1] != source:
+            path.append(int(parent[path[-1]]))
+        return path[::-1]
+
+    # --- components ---
+    def weak_components(self):
+        """(component id per node, count); ids are the smallest node id in each component."""
+        return self._memoized("weak", self._weak_components)
+
+    def _weak_components(self):
+        n = self.node_count
+        comp = np.arange(n, dtype=np.int32)
+        if self.edge_count:
+            # Hook the larger root of every edge onto the smaller one, then pointer-jump until
+            # every node points at its root; repeat until no edge joins two roots.
+            while True:
+                ru, rv = comp[self.src], comp[self.dst]
+                cross = ru != rv
+                if not cross.any():
+                    break
+                lo = np.minimum(ru[cross], rv[cross])
+                hi = np.maximum(ru[cross], rv[cross])
+                np.minimum.at(comp, hi, lo)
+                while True:
+                    jumped = comp[comp]
+                    if np.array_equal(jumped, comp):
+                        break
+                    comp = jumped
+        return comp, int(np.unique(comp).size)
+
+    def strong_components(self):
+        """
+        (component id per node, count) via iterative Tarjan. Ids are assigned as components
+        complete, which is a reverse topological order of the condensation.
+        """
+        return self._memoized("strong", self._strong_components)
+
+    def _strong_components(self):
+        n = self.node_count
+        indptr = self.out_indptr.tolist()
+        indices = self.out_indices.tolist()
+        order = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        comp = [-1] * n
+        stack = []
+        counter = 0
+        count = 0
+        for root in range(n):
+            if order[root] != -1:
+                continue
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, indptr[root])]
+            while work:
+                v, i = work[-1]
+                end = indptr[v + 1]
+                while i < end:
+                    w = indices[i]
+                    i += 1
+                    if order[w] == -1:
+                        work[-1] = (v, i)
+                        order[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append((w, indptr[w]))
+                        break
+                    if on_stack[w] and order[w] < low[v]:
+                        low[v] = order[w]
+                else:
+                    work.pop()
+                    if low[v] == order[v]:
+                        while True:
+                            w = stack.pop()
+                            on_stack[w] = False
+                            comp[w] = count
+                            if w == v:
+                                break
+                        count += 1
+                    if work:
+                        u = work[-1][0]
+                        if low[v] < low[u]:
+                            low[u] = low[v]
+        return np.array(comp, dtype=np.int32), count
+
+    def largest_components(self, kind, k, max_members):
+        """
+        [(size, member ids up to max_members)] for the k largest weak/strong components,
+        largest first (ties by smallest component id).
+        """
+        def groups():
+            comp, _ = self.weak_components() if kind == "weak" else self.strong_components()
+            ids, sizes = np.unique(comp, return_counts=True)
+            members = np.argsort(comp, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+            by_size = np.argsort(-sizes, kind="stable")
+            return sizes[by_size], starts[by_size], members
+
+        sizes, starts, members = self._memoized(("groups", kind), groups)
+        return [
+            (int(size), members[start:start + min(size, max_members)].tolist())
+            for size, start in zip(sizes[:k].tolist(), starts[:k].tolist())
+        ]
+
+    def topological_order(self):
+        """(node ids in topological order, None) for a DAG, else (None, node ids of one cycle)."""
+        return self._memoized("topo", self._topological_order)
+
+    def _topological_order(self):
+        comp, count = self.strong_components()
+        loops = self.src[self.src == self.dst]
+        if loops.size:
+            v = int(loops[0])
+            return None, [v, v]
+        if count == self.node_count:
+            # Every SCC is a single node; reversing Tarjan's completion order sorts them.
+            return np.argsort(-comp, kind="stable"), None
+        sizes = np.bincount(comp, minlength=count)
+        return None, self._cycle_in(comp, int(np.argmax(sizes > 1)))
+
+    def _cycle_in(self, comp, c):
+        """One directed cycle through the (non-trivial) strongly connected component c."""
+        members = np.flatnonzero(comp == c)
+        start = int(members[0])
+        parent = {start: None}
+        queue = deque([start])
+        while queue:
+            v = queue.popleft()
+            for w in self.out_indices[self.out_indptr[v]:self.out_indptr[v + 1]].tolist():
+                if comp[w] != c:
+                    continue
+                if w == start:
+                    cycle = [v]
+                    while parent[cycle[-1]] is not None:
+                        cycle.append(parent[cycle[-1]])
+                    return cycle[::-1] + [start]
+                if w not in parent:
+                    parent[w] = v
+                    queue.append(w)
+        return [start]
+
+    # --- degrees ---
+    def degree_stats(self):
+        return self._memoized("degrees", self._degree_stats)
+
+    def _degree_stats(self):
+        out_deg = np.diff(self.out_indptr)
+        in_deg = np.diff(self.in_indptr)
+        return out_deg, in_deg, {
+            "nodes": self.node_count,
+            "edges": self.edge_count,
+            "isolated": int(np.count_nonzero((out_deg + in_deg) == 0)),
+            "out": _summary(out_deg),
+            "in": _summary(in_deg),
+        }
+
+    def top_degree(self, k):
+        """Node ids of the k highest total-degree nodes, highest first."""
+        out_deg, in_deg, _ = self.degree_stats()
+        total = out_deg + in_deg
+        k = min(k, total.size)
+        if k <= 0:
+            return []
+        top = np.argpartition(-total, k - 1)[:k]
+        return top[np.argsort(-total[top], kind="stable")].tolist()
+
+
+def _csr(n, src, dst):
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order]
+
+
+def _gather(indptr, indices, frontier):
+    """(neighbors, the frontier node each came from) for every node in `frontier`."""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty
+    # Position of every neighbor in `indices`: each node's start, plus 0..count-1.
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+    return indices[offsets], np.repeat(frontier, counts)
+
+
+def _summary(degrees):
+    if degrees.size == 0:
+        return {"min": 0, "max": 0, "mean": 0.0, "median": 0.0, "p99": 0.0}
+    return {
+        "min": int(degrees.min()),
+        "max": int(degrees.max()),
+        "mean": round(float(degrees.mean()), 3),
+        "median": round(float(np.median(degrees)), 3),
+        "p99": round(float(np.percentile(degrees, 99)), 3),
+    }
@@ -0,0 +1,300 @@
+import json
+import select
+import threading
+import time
+
+import db_client
+
+# Every graph mutation bumps graph_meta.version inside its own transaction and NOTIFYs this
+# channel once it commits (see graph_service.mutate). The payload is {"version": V, "delta": D}
+# when it fits in a notification, else just the version, which makes listeners reload.
+CHANNEL = "graph_changed"
+NOTIFY_MAX_BYTES = 7999  # Postgres rejects longer payloads
+
+# A delta is what one mutation changed, turning version V - 1 into V: {"cleared": bool,
+# "nodes_added": [label, ...], "nodes_removed": [...], "edges_added": [[source, target], ...],
+# "edges_removed": [...]}. Applying it clears everything first if "cleared" is set; removing
+# a node also removes any edges it still has.
+DELTA_KINDS = ("nodes_added", "nodes_removed", "edges_added", "edges_removed")
+
+
+class GraphIndex:
+    """
+    In-memory copy of the graph: node set plus out/in adjacency, tagged with the
+    graph_meta.version it reflects.
+
+    The index is trusted while the LISTEN connection is up and no newer version has been
+    announced on it; otherwise (never loaded, announced version ahead of ours, or listener
+    down and the version column moved) the next read reloads it from one snapshot.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version = None  # None until the first load
+        self.nodes = {}  # label -> None, kept in dict order
+        self.out = {}  # label -> {target: None}
+        self.inc = {}  # label -> {source: None}
+        self.edge_count = 0
+        self._derived = {}  # values computed from the current version, see derived()
+        self._announced = 0  # highest version seen on the channel
+        self._listening = False
+        self._verify = True  # compare with the version column on the next read
+        self.reloads = 0
+
+    # --- freshness ---
+    def announce(self, version):
+        with self._lock:
+            self._announced = max(self._announced, version)
+
+    def set_listening(self, listening):
+        with self._lock:
+            self._listening = listening
+            # Notifications sent while we were not listening are lost; check the column once.
+            self._verify = True
+
+    def _stale(self):
+        if self.version is None or self._announced > self.version:
+            return True
+        if self._listening and not self._verify:
+            return False
+        rows = db_client.execute_query("SELECT version FROM graph_meta", fetch=True, prepared=True)
+        if not rows or rows[0][0] != self.version:
+            return True
+        self._verify = not self._listening
+        return False
+
+    def ensure_fresh(self):
+        """Reload if out of sync. Returns False if the database could not be read."""
+        with self._lock:
+            if not self._stale():
+                return True
+            return self.reload()
+
+    def reload(self):
+        def snapshot(tx):
+            version = tx.execute("SELECT version FROM graph_meta", fetch=True, prepared=True)[0][0]
+            # Rows are streamed through server-side cursors straight into the new adjacency
+            # maps, so a graph of millions of edges is never held as a list of rows as well.
+            # Edges come back as node ids and are mapped to labels here, which is cheaper
+            # than joining nodes twice in the query.
+            labels = dict(tx.stream("SELECT id, label FROM nodes ORDER BY label"))
+            out, inc, count = {}, {}, 0
+            for source, target in tx.stream("SELECT source, target FROM edges ORDER BY id"):
+                u, v = labels[source], labels[target]
+                out.setdefault(u, {})[v] = None
+                inc.setdefault(v, {})[u] = None
+                count += 1
+            return version, dict.fromkeys(labels.values()), out, inc, count
+
+        result = db_client.run_transaction(snapshot, isolation="REPEATABLE READ READ ONLY")
+        if not result:
+            return False
+        version, nodes, out, inc, count = result
+        with self._lock:
+            self.nodes, self.out, self.inc, self.edge_count = nodes, out, inc, count
+            self.version = version
+            self._announced = max(self._announced, version)
+            self._verify = not self._listening
+            self._derived = {}
+            self.reloads += 1
+        return True
+
+    # --- incremental updates ---
+    def apply(self, version, delta):
+        """
+        Apply the delta of a committed write made as `version`, whether ours or announced by
+        another replica. Versions already applied are ignored; if the delta is missing or any
+        version in between was missed, the index reloads from the database instead.
+        """
+        with self._lock:
+            if self.version is not None and version <= self.version:
+                return
+            if delta is None or self.version != version - 1:
+                self.announce(version)
+                return
+            if delta["cleared"]:
+                self.clear()
+            for label in delta["nodes_added"]:
+                self.add_node(label)
+            for u, v in delta["edges_added"]:
+                self.add_edge(u, v)
+            for u, v in delta["edges_removed"]:
+                self.delete_edge(u, v)
+            for label in delta["nodes_removed"]:
+                self.delete_node(label)
+            self.version = version
+            self._announced = max(self._announced, version)
+            self._derived = {}
+
+    def _link(self, u, v):
+        targets = self.out.setdefault(u, {})
+        if v not in targets:
+            targets[v] = None
+            self.inc.setdefault(v, {})[u] = None
+            self.edge_count += 1
+
+    def add_node(self, label):
+        self.nodes.setdefault(label, None)
+
+    def add_edge(self, u, v):
+        self.add_node(u)
+        self.add_node(v)
+        self._link(u, v)
+
+    def delete_edge(self, u, v):
+        if v in self.out.get(u, {}):
+            del self.out[u][v]
+            del self.inc[v][u]
+            self.edge_count -= 1
+
+    def delete_node(self, label):
+        for v in list(self.out.get(label, {})):
+            self.delete_edge(label, v)
+        for u in list(self.inc.get(label, {})):
+            self.delete_edge(u, label)
+        self.out.pop(label, None)
+        self.inc.pop(label, None)
+        self.nodes.pop(label, None)
+
+    def clear(self):
+        self.nodes, self.out, self.inc, self.edge_count = {}, {}, {}, 0
+
+    # --- reads ---
+    def derived(self, key, build):
+        """build(index) for the current version, cached until the graph changes."""
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+            return self._derived[key]
+
+    def state(self):
+        """{"nodes": [...], "edges": [[u, v], ...], "version": V} for the UI."""
+        return self.derived("state", lambda g: {
+            "nodes": list(g.nodes),
+            "edges": [[u, v] for u, targets in g.out.items() for v in targets],
+            "version": g.version,
+        })
+
+    def neighborhood(self, seeds, hops, direction, max_nodes, max_edges):
+        """
+        The subgraph induced by the nodes within `hops` steps of `seeds`, following out-edges,
+        in-edges or both. Nodes are taken in BFS order until
+        max_nodes, then every edge between them until max_edges; work is bounded by what is
+        returned (plus the degree of the nodes it scans), not by the size of the graph.
+        Returns {"nodes", "edges", "distance": {label: hops}, "truncated", "version"}, or raises
+        KeyError(label) for the first seed not in the index (checked under the same lock, so a
+        reload cannot swap the graph in between).
+        """
+        with self._lock:
+            missing = [s for s in seeds if s not in self.nodes]
+            if missing:
+                raise KeyError(missing[0])
+            adjacency = {"out": (self.out,), "in": (self.inc,), "both": (self.out, self.inc)}[direction]
+            dist = {}
+            for seed in seeds:
+                if len(dist) >= max_nodes:
+                    break
+                dist.setdefault(seed, 0)
+            truncated = len(dist) < len(set(seeds))
+            frontier = list(dist)
+            level = 0
+            while frontier and level < hops and not truncated:
+                level += 1
+                nxt = []
+                for u in frontier:
+                    for links in adjacency:
+                        for v in links.get(u, ()):
+                            if v in dist:
+                                continue
+                            if len(dist) >= max_nodes:
+                                truncated = True
+                                break
+                            dist[v] = level
+                            nxt.append(v)
+                        if truncated:
+                            break
+                    if truncated:
+                        break
+                frontier = nxt
+
+            edges = []
+            capped = False
+            for u in dist:
+                targets = self.out.get(u, {})
+                # Scan whichever side is smaller: u's successors or the selected nodes.
+                candidates = targets if len(targets) <= len(dist) else (v for v in dist if v in targets)
+                for v in candidates:
+                    if v in dist:
+                        if len(edges) >= max_edges:
+                            capped = True
+                            break
+                        edges.append([u, v])
+                if capped:
+                    break
+            return {
+                "nodes": list(dist),
+                "edges": edges,
+                "distance": dist,
+                "truncated": truncated or capped,
+                "version": self.version,
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "nodes": len(self.nodes),
+                "edges": self.edge_count,
+                "listening": self._listening,
+                "reloads": self.reloads,
+            }
+
+
+def listen_forever(index, retry_seconds=1.0, max_retry_seconds=30.0):
+    """
+    Keep a dedicated LISTEN connection open and feed announced changes into `index`.
+    Reconnects with exponential backoff; runs on a daemon thread (see start_listener).
+    """
+    delay = retry_seconds
+    while True:
+        conn = db_client.get_db_connection()
+        if conn is None:
+            time.sleep(delay)
+            delay = min(delay * 2, max_retry_seconds)
+            continue
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+            index.set_listening(True)
+            delay = retry_seconds
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    try:
+                        if note.payload.startswith("{"):
+                            change = json.loads(note.payload)
+                            index.apply(int(change["version"]), change["delta"])
+                        else:
+                            index.announce(int(note.payload))
+                    except (ValueError, KeyError, TypeError):
+                        index.announce((index.version or 0) + 1)
+        except Exception as e:
+            print(f"Graph index listener lost its connection: {e}")
+        finally:
+            index.set_listening(False)
+            try:
+                conn.close()
+            except Exception:
+                pass
+        time.sleep(delay)
+        delay = min(delay * 2, max_retry_seconds)
+
+
+def start_listener(index):
+    thread = threading.Thread(target=listen_forever, args=(index,), name="graph-index-listener", daemon=True)
+    thread.start()
+    return thread
@@ -1,8 +1,17 @@
-from flask import Flask, jsonify, request
+import base64
+import json
+import os
+import numpy as np
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 # 1. ADD THIS IMPORT
 from prometheus_flask_exporter import PrometheusMetrics
 import db_client
+import graph_algorithms
+import graph_index
+import graph_snapshot
+import graph_transfer
+import migrations
 
 app = Flask(__name__)
 CORS(app)
@@ -10,22 +19,252 @@ CORS(app)
 # 2. ADD THIS LINE (Enable Monitoring)
 metrics = PrometheusMetrics(app)
 
-# --- HELPER: GET CURRENT STATE ---
-def get_current_state():
-    """Fetches full graph from DB and formats it for the UI."""
-    # ... (Rest of your code remains exactly the same) ...
-    nodes_data = db_client.execute_query("SELECT label FROM nodes", fetch=True)
-    edges_data = db_client.execute_query("SELECT source, target FROM edges", fetch=True)
+# --- SCHEMA ---
+# Bring the graph tables up to date before serving anything (see migrations.py).
+migrations.migrate()
 
-    nodes = [r['label'] for r in (nodes_data or [])]
-    edges = [[r['source'], r['target']] for r in (edges_data or [])]
+# --- IN-MEMORY INDEX ---
+# Reads are served from an adjacency index loaded once and updated by our own writes; other
+# replicas' writes reach it through LISTEN/NOTIFY on graph_meta.version (see graph_index.py).
+index = graph_index.GraphIndex()
+graph_index.start_listener(index)
 
-    return {"nodes": nodes, "edges": edges}
+# --- HELPER: GET CURRENT STATE ---
+def get_current_state():
+    """Returns the full graph formatted for the UI, from the in-memory index."""
+    index.ensure_fresh()
+    if index.version is None:
+        # Never loaded (database unreachable): same empty answer as a failed query.
+        return {"nodes": [], "edges": [], "version": None}
+    return index.state()
+
+def _delta_column(kind, rows):
+    """SQL for the JSON list of `rows`, a SELECT of labels (nodes_*) or label pairs (edges_*)."""
+    if rows is None:
+        return "'[]'::json"
+    if kind.startswith("nodes"):
+        return f"COALESCE((SELECT json_agg(label) FROM ({rows}) AS t(label)), '[]')"
+    return f"COALESCE((SELECT json_agg(json_build_array(u, v)) FROM ({rows}) AS t(u, v)), '[]')"
+
+def mutate(statements, delta=None, cleared=False, before=None, lock_first=False):
+    """
+    Run one graph mutation as a single statement, in one round trip: a data-modifying CTE
+    that bumps graph_meta.version, runs `statements`, builds the delta from what they
+    RETURNed and NOTIFYs the other replicas. The index is updated from the same delta.
+    Returns (version, delta), or False/None like execute_query on failure.
+
+    Each statement is a named CTE, (name, query, params); later ones may read earlier ones.
+    `delta` maps each of graph_index.DELTA_KINDS that the mutation can produce to a
+    parameterless SELECT over those CTEs listing what changed: labels for nodes_*, and
+    (source label, target label) for edges_*.
+    `before` is SQL that cannot go in a CTE (e.g. TRUNCATE); it runs first, in the same
+    implicit transaction, after the version row is locked.
+    `lock_first` locks the version row in a statement of its own even without `before` (sent in
+    the same round trip, and PREPAREd like the mutation), so the CTEs run on a snapshot taken
+    after the lock: they see every row committed by the
+    mutations that went before (e.g. a node another request just inserted).
+
+    `statements` may instead be a function run with a transaction; (version, its result) is
+    returned and the index reloads from the database on its next read.
+    """
+    if callable(statements):
+        return _mutate_in_transaction(statements)
+
+    delta = delta or {}
+    ctes = ["v AS (UPDATE graph_meta SET version = version + 1 RETURNING version)"]
+    ctes += [f"{name} AS ({query})" for name, query, _ in statements]
+    columns = ", ".join(
+        f"'{kind}', {_delta_column(kind, delta.get(kind))}" for kind in graph_index.DELTA_KINDS
+    )
+    # The outer query reads v before any sub-statement, so every mutation takes the version
+    # row lock first; concurrent mutations therefore commit (and notify) in version order.
+    query = (
+        f"WITH {', '.join(ctes)}"
+        " SELECT version, delta, pg_notify("
+        f"  '{graph_index.CHANNEL}',"
+        f"  CASE WHEN octet_length(payload) <= {graph_index.NOTIFY_MAX_BYTES} THEN payload ELSE version::text END)"
+        " FROM (SELECT version, delta, json_build_object('version', version, 'delta', delta)::text AS payload"
+        f"  FROM (SELECT v.version, json_build_object('cleared', {'true' if cleared else 'false'}, {columns}) AS delta"
+        "   FROM v) d) n"
+    )
+    params = tuple(p for _, _, stmt_params in statements for p in (stmt_params or ()))
+    # The prefix runs in the same round trip and implicit transaction. The lock is PREPAREd like
+    # the mutation; `before` (e.g. TRUNCATE) cannot be, so a mutation with one is not either.
+    prefix = ["SELECT 1 FROM graph_meta FOR UPDATE"] if before or lock_first else []
+    if before:
+        prefix.append(before)
+    rows = db_client.execute_query(query, params, fetch=True, prepared=not before, prefix=prefix)
+    if not rows:
+        return rows
+    version, delta, _ = rows[0]
+    index.apply(version, delta)
+    return version, delta
+
+def _mutate_in_transaction(fn):
+    def run(tx):
+        version = tx.execute(
+            "UPDATE graph_meta SET version = version + 1 RETURNING version",
+            fetch=True,
+            prepared=True
+        )[0][0]
+        result = fn(tx)
+        tx.execute(
+            f"SELECT pg_notify('{graph_index.CHANNEL}', %s)",
+            (str(version),),
+            prepared=True
+        )
+        return version, result
+
+    outcome = db_client.run_transaction(run)
+    if not outcome:
+        return outcome
+    version, result = outcome
+    index.announce(version)
+    return version, result
+
+# --- HELPER: MUTATION RESPONSES ---
+# ?response=full (default) echoes the whole graph after a write; ?response=delta returns only
+# {"version": V, "delta": {...}} (see graph_index.DELTA_KINDS), which a client holding version
+# V - 1 can apply locally. Deltas list what the database actually changed, so re-adding an
+# existing edge reports nothing.
+RESPONSE_MODES = ("full", "delta")
+
+def mutation_response(status, outcome):
+    version, delta = outcome
+    if request.args.get('response') == 'delta':
+        return jsonify({"status": status, "version": version, "delta": delta})
+    state = get_current_state()
+    response = jsonify({"status": status, "version": version, "graph": state})
+    # Carry the headers GET /data would send for the echoed graph (which may already be newer
+    # than `version`), so a gateway can cache the echo as that read and still answer
+    # If-None-Match for it.
+    if state["version"] is not None:
+        response.set_etag(f"g{state['version']}", weak=True)
+    response.vary.add("Accept")
+    return response
+
+@app.before_request
+def check_response_mode():
+    if request.method == 'POST' and request.args.get('response', 'full') not in RESPONSE_MODES:
+        return jsonify({"error": f"'response' must be one of {', '.join(RESPONSE_MODES)}"}), 400
+
+# --- HELPER: CONDITIONAL READS ---
+# Reads of the whole graph carry ETag W/"g<version>". A poller that sends it back in
+# If-None-Match gets 304 Not Modified until the graph changes: no body, and for pages no query.
+def conditional(version, build, variant=""):
+    """
+    build() (a response) tagged with the ETag of graph `version`, or 304 if the client has it.
+    `variant` tells apart representations of the same version (e.g. the binary snapshot).
+    """
+    if version is None:
+        return build()
+    etag = f"g{version}{variant}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag, weak=True)
+    return response
+
+# --- HELPER: BINARY SNAPSHOT ---
+# Full reads are JSON unless the Accept header prefers graph_snapshot.MEDIA_TYPE.
+DATA_TYPES = ("application/json", graph_snapshot.MEDIA_TYPE)
+
+def wants_snapshot():
+    return request.accept_mimetypes.best_match(DATA_TYPES) == graph_snapshot.MEDIA_TYPE
+
+def get_snapshot():
+    """(version, encoded snapshot) of the current graph, encoded once per version."""
+    get_current_state()
+    # Built under the index lock from the cached CSR arrays, so version and body always agree.
+    return index.derived(
+        "snapshot", lambda g: (g.version, graph_snapshot.encode(g.version, g.derived("csr", _build_csr))))
+
+# --- HELPER: PAGINATION ---
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+
+def encode_cursor(state):
+    """Opaque page cursor: base64url of the keyset position in nodes (label) and edges (id)."""
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token):
+    """Inverse of encode_cursor. Raises ValueError on anything it did not produce."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except Exception as e:
+        raise ValueError("bad cursor") from e
+    if not isinstance(state, dict) or set(state) != {"node", "edge", "nodes_done", "edges_done"}:
+        raise ValueError("bad cursor")
+    return state
+
+def get_page(limit, cursor):
+    """
+    One page of the graph: up to `limit` nodes (by label) and `limit` edges (by id), each
+    continuing after the position stored in `cursor`. Both are keyset range scans on the
+    primary keys, so deep pages cost the same as the first one. next_cursor is None once
+    both lists are exhausted.
+    """
+    state = decode_cursor(cursor) if cursor else {"node": None, "edge": None, "nodes_done": False, "edges_done": False}
+
+    nodes = []
+    if not state["nodes_done"]:
+        if state["node"] is None:
+            rows = db_client.execute_query(
+                "SELECT label FROM nodes ORDER BY label LIMIT %s", (limit + 1,), fetch=True, prepared=True)
+        else:
+            rows = db_client.execute_query(
+                "SELECT label FROM nodes WHERE label > %s ORDER BY label LIMIT %s",
+                (state["node"], limit + 1), fetch=True, prepared=True)
+        rows = rows or []
+        nodes = [label for label, in rows[:limit]]
+        state["nodes_done"] = len(rows) <= limit
+        if nodes:
+            state["node"] = nodes[-1]
+
+    edges = []
+    if not state["edges_done"]:
+        rows = db_client.execute_query(
+            "SELECT e.id, s.label, t.label FROM edges e"
+            " JOIN nodes s ON s.id = e.source JOIN nodes t ON t.id = e.target"
+            " WHERE e.id > %s ORDER BY e.id LIMIT %s",
+            (state["edge"] or 0, limit + 1), fetch=True, prepared=True) or []
+        edges = [[source, target] for _, source, target in rows[:limit]]
+        state["edges_done"] = len(rows) <= limit
+        if edges:
+            state["edge"] = rows[:limit][-1][0]
+
+    done = state["nodes_done"] and state["edges_done"]
+    return {"nodes": nodes, "edges": edges, "next_cursor": None if done else encode_cursor(state)}
 
 # --- ROUTES ---
 @app.route('/data', methods=['GET'])
 def get_graph():
-    return jsonify(get_current_state())
+    # /data?limit=N&cursor=C pages through the graph; plain /data returns all of it.
+    # With Accept: application/msgpack, plain /data returns the binary snapshot instead.
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        if wants_snapshot():
+            version, snapshot = get_snapshot()
+            response = conditional(
+                version, lambda: Response(snapshot, mimetype=graph_snapshot.MEDIA_TYPE), variant="-msgpack")
+        else:
+            state = get_current_state()
+            response = conditional(state["version"], lambda: jsonify(state))
+        response.vary.add("Accept")
+        return response
+
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        # Pages are read from the database; taking the version first means a write landing
+        # in between leaves the body newer than its tag, never older.
+        index.ensure_fresh()
+        return conditional(
+            index.version, lambda: jsonify(get_page(min(limit, MAX_PAGE_SIZE), request.args.get('cursor'))))
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
 
 @app.route('/add-node', methods=['POST'])
 def add_node():
@@ -37,13 +276,13 @@ def add_node():
 
     label = str(label).strip().upper()
 
-    success = db_client.execute_query(
-        "INSERT INTO nodes (label) VALUES (%s) ON CONFLICT DO NOTHING",
-        (label,)
+    outcome = mutate(
+        [("added", "INSERT INTO nodes (label) VALUES (%s) ON CONFLICT DO NOTHING RETURNING label", (label,))],
+        {"nodes_added": "SELECT label FROM added"}
     )
 
-    if success:
-        return jsonify({"status": "processed", "graph": get_current_state()})
+    if outcome:
+        return mutation_response("processed", outcome)
     else:
         return jsonify({"error": "Database error"}), 500
 
@@ -59,16 +298,36 @@ def add_edge():
     u = str(u).strip().upper()
     v = str(v).strip().upper()
 
-    db_client.execute_query("INSERT INTO nodes (label) VALUES (%s) ON CONFLICT DO NOTHING", (u,))
-    db_client.execute_query("INSERT INTO nodes (label) VALUES (%s) ON CONFLICT DO NOTHING", (v,))
-
-    success = db_client.execute_query(
-        "INSERT INTO edges (source, target) VALUES (%s, %s) ON CONFLICT DO NOTHING",
-        (u, v)
+    # Sibling CTEs cannot see each other's rows, so the endpoint ids are the new nodes from
+    # the insert's RETURNING plus the existing ones read from the table; existing rows are left
+    # untouched (no new row versions or row locks on hot nodes). The read uses the statement
+    # snapshot, which lock_first takes after the version lock, so it sees any node a
+    # concurrent mutation committed while this one waited.
+    outcome = mutate(
+        [
+            ("new",
+             "INSERT INTO nodes (label) SELECT DISTINCT label FROM (VALUES (%s), (%s)) AS t(label)"
+             " ON CONFLICT (label) DO NOTHING RETURNING id, label",
+             (u, v)),
+            ("ends",
+             "SELECT id, label, true AS inserted FROM new"
+             " UNION ALL SELECT id, label, false FROM nodes WHERE label IN (%s, %s)",
+             (u, v)),
+            ("added",
+             "INSERT INTO edges (source, target) SELECT s.id, t.id FROM ends s, ends t"
+             " WHERE s.label = %s AND t.label = %s ON CONFLICT DO NOTHING RETURNING source, target",
+             (u, v)),
+        ],
+        {
+            "nodes_added": "SELECT label FROM ends WHERE inserted",
+            "edges_added": "SELECT s.label, t.label FROM added a"
+                           " JOIN ends s ON s.id = a.source JOIN ends t ON t.id = a.target",
+        },
+        lock_first=True,
     )
 
-    if success:
-        return jsonify({"status": "processed", "graph": get_current_state()})
+    if outcome:
+        return mutation_response("processed", outcome)
     else:
         return jsonify({"error": "Database error"}), 500
 
@@ -82,18 +341,27 @@ def delete_node():
 
     label = str(label).strip().upper()
 
-    db_client.execute_query(
-        "DELETE FROM edges WHERE source = %s OR target = %s",
-        (label, label)
-    )
-
-    success = db_client.execute_query(
-        "DELETE FROM nodes WHERE label = %s",
-        (label,)
+    # ON DELETE CASCADE removes the edges (two index lookups); the delta lists them from the
+    # statement snapshot, which lock_first takes after the version lock so that it includes an
+    # edge to this node that another request just added.
+    outcome = mutate(
+        [
+            ("removed", "DELETE FROM nodes WHERE label = %s RETURNING id, label", (label,)),
+            ("cut",
+             "SELECT e.source, e.target FROM removed r JOIN edges e ON e.source = r.id"
+             " UNION SELECT e.source, e.target FROM removed r JOIN edges e ON e.target = r.id",
+             None),
+        ],
+        {
+            "nodes_removed": "SELECT label FROM removed",
+            "edges_removed": "SELECT s.label, t.label FROM cut c"
+                             " JOIN nodes s ON s.id = c.source JOIN nodes t ON t.id = c.target",
+        },
+        lock_first=True,
     )
 
-    if success:
-        return jsonify({"status": "deleted", "graph": get_current_state()})
+    if outcome:
+        return mutation_response("deleted", outcome)
     else:
         return jsonify({"error": "Database error"}), 500
 
@@ -109,30 +377,297 @@ def delete_edge():
     u = str(u).strip().upper()
     v = str(v).strip().upper()
 
-    success = db_client.execute_query(
-        "DELETE FROM edges WHERE source = %s AND target = %s",
-        (u, v)
+    outcome = mutate(
+        [("removed",
+          "DELETE FROM edges e USING nodes s, nodes t"
+          " WHERE s.label = %s AND t.label = %s AND e.source = s.id AND e.target = t.id"
+          " RETURNING s.label AS source, t.label AS target",
+          (u, v))],
+        {"edges_removed": "SELECT source, target FROM removed"}
     )
 
-    if success:
-        return jsonify({"status": "edge_deleted", "graph": get_current_state()})
+    if outcome:
+        return mutation_response("edge_deleted", outcome)
     else:
         return jsonify({"error": "Database error"}), 500
 
 @app.route('/clear', methods=['POST'])
 def clear_graph():
-    db_client.execute_query("DELETE FROM edges")
-    success = db_client.execute_query("DELETE FROM nodes")
+    # TRUNCATE skips the per-row cascade a DELETE FROM nodes would run against edges.
+    outcome = mutate([], cleared=True, before="TRUNCATE edges, nodes")
 
-    if success:
-        return jsonify({"status": "cleared", "graph": {"nodes": [], "edges": []}})
+    if outcome:
+        return mutation_response("cleared", outcome)
     else:
         return jsonify({"error": "Database error"}), 500
 
+# --- ALGORITHMS ---
+# Run server-side over a CSR array form of the in-memory index, built once per graph version.
+# List results are capped at `limit` items (default ALGO_DEFAULT_LIMIT) and flagged "truncated".
+ALGO_DEFAULT_LIMIT = 1000
+
+class AlgorithmError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def _build_csr(g):
+    return graph_algorithms.CSRGraph.from_adjacency(g.nodes, g.out)
+
+def get_csr():
+    get_current_state()
+    return index.derived("csr", _build_csr)
+
+def _arg_node(csr, name):
+    label = request.args.get(name)
+    if not label:
+        raise AlgorithmError(f"'{name}' is required")
+    node = csr.node_id(str(label).strip().upper())
+    if node is None:
+        raise AlgorithmError(f"Node {label.strip().upper()} not found", 404)
+    return node
+
+def _arg_direction(default='out'):
+    direction = request.args.get('direction', default)
+    if direction not in graph_algorithms.DIRECTIONS:
+        raise AlgorithmError(f"'direction' must be one of {', '.join(graph_algorithms.DIRECTIONS)}")
+    return direction
+
+def _arg_limit():
+    try:
+        limit = int(request.args.get('limit', ALGO_DEFAULT_LIMIT))
+    except ValueError:
+        raise AlgorithmError("Invalid limit")
+    if limit < 1:
+        raise AlgorithmError("Invalid limit")
+    return min(limit, MAX_PAGE_SIZE)
+
+def _capped(csr, ids, limit):
+    ids = ids[:limit + 1]
+    return csr.names(ids[:limit]), len(ids) > limit
+
+@app.errorhandler(AlgorithmError)
+def algorithm_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+@app.route('/algorithms/shortest-path', methods=['GET'])
+def shortest_path():
+    csr = get_csr()
+    source, target = _arg_node(csr, 'from'), _arg_node(csr, 'to')
+    path = csr.shortest_path(source, target, _arg_direction())
+    if path is None:
+        return jsonify({"reachable": False, "path": [], "length": None})
+    return jsonify({"reachable": True, "path": csr.names(path), "length": len(path) - 1})
+
+@app.route('/algorithms/reachable', methods=['GET'])
+def reachable():
+    csr = get_csr()
+    source = _arg_node(csr, 'from')
+    direction = _arg_direction()
+    if request.args.get('to'):
+        target = _arg_node(csr, 'to')
+        dist, _ = csr.bfs(source, target=target, direction=direction)
+        distance = int(dist[target])
+        return jsonify({"reachable": distance >= 0, "distance": distance if distance >= 0 else None})
+    dist, _ = csr.bfs(source, direction=direction)
+    ids = np.flatnonzero(dist > 0)
+    nodes, truncated = _capped(csr, ids.tolist(), _arg_limit())
+    return jsonify({"count": int(ids.size), "nodes": nodes, "truncated": truncated})
+
+@app.route('/algorithms/components', methods=['GET'])
+def components():
+    kind = request.args.get('kind', 'weak')
+    if kind not in ('weak', 'strong'):
+        raise AlgorithmError("'kind' must be weak or strong")
+    limit = _arg_limit()
+    csr = get_csr()
+    _, count = csr.weak_components() if kind == 'weak' else csr.strong_components()
+    listed = [
+        {"size": size, "nodes": csr.names(members), "truncated": size > len(members)}
+        for size, members in csr.largest_components(kind, limit, limit)
+    ]
+    return jsonify({
+        "kind": kind,
+        "count": count,
+        "largest": listed[0]["size"] if listed else 0,
+        "components": listed,
+        "truncated": count > len(listed),
+    })
+
+@app.route('/algorithms/topological-sort', methods=['GET'])
+def topological_sort():
+    limit = _arg_limit()
+    csr = get_csr()
+    order, cycle = csr.topological_order()
+    if cycle is not None:
+        return jsonify({"acyclic": False, "cycle": csr.names(cycle)})
+    nodes, truncated = _capped(csr, order.tolist(), limit)
+    return jsonify({"acyclic": True, "order": nodes, "truncated": truncated})
+
+@app.route('/algorithms/degrees', methods=['GET'])
+def degrees():
+    try:
+        top = max(0, min(int(request.args.get('top', 10)), MAX_PAGE_SIZE))
+    except ValueError:
+        raise AlgorithmError("Invalid top")
+    csr = get_csr()
+    out_deg, in_deg, stats = csr.degree_stats()
+    return jsonify({**stats, "top": [
+        {"node": csr.labels[i], "out": int(out_deg[i]), "in": int(in_deg[i])} for i in csr.top_degree(top)
+    ]})
+
+# --- NEIGHBORHOOD ---
+# The subgraph around one or more seed nodes, from the in-memory adjacency: the UI's focused
+# view costs as much as what it shows, however large the whole graph is.
+NEIGHBORHOOD_DEFAULT_EDGES = 5000
+NEIGHBORHOOD_MAX_EDGES = 100000
+
+def _arg_count(name, default, maximum):
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        raise AlgorithmError(f"Invalid {name}")
+    if value < 0:
+        raise AlgorithmError(f"Invalid {name}")
+    return min(value, maximum)
+
+@app.route('/neighborhood', methods=['GET'])
+def neighborhood():
+    """
+    /neighborhood?seed=A[&seed=B...]&hops=1&direction=both&max_nodes=1000&max_edges=5000
+    Nodes within `hops` steps of any seed (in BFS order, seeds first) and every edge among
+    them; "truncated" is set when a cap cut either list short.
+    """
+    seeds = [str(s).strip().upper() for s in request.args.getlist('seed') if str(s).strip()]
+    if not seeds:
+        raise AlgorithmError("'seed' is required")
+    hops = _arg_count('hops', 1, MAX_PAGE_SIZE)
+    direction = _arg_direction('both')
+    max_nodes = max(1, _arg_count('max_nodes', ALGO_DEFAULT_LIMIT, MAX_PAGE_SIZE))
+    max_edges = _arg_count('max_edges', NEIGHBORHOOD_DEFAULT_EDGES, NEIGHBORHOOD_MAX_EDGES)
+
+    get_current_state()
+    try:
+        result = index.neighborhood(list(dict.fromkeys(seeds)), hops, direction, max_nodes, max_edges)
+    except KeyError as e:
+        raise AlgorithmError(f"Node {e.args[0]} not found", 404)
+    return jsonify({"seeds": seeds, "hops": hops, "direction": direction, **result})
+
+# --- BULK IMPORT / EXPORT ---
+# Imports staging at least this many rows drop the edges foreign keys for the load and re-add
+# them afterwards (one validating join instead of two trigger lookups per inserted edge).
+IMPORT_REBUILD_FK_MIN_ROWS = int(os.environ.get('IMPORT_REBUILD_FK_MIN_ROWS', '50000'))
+
+def _count_inserted(tx, insert):
+    return tx.execute(f"WITH added AS ({insert} RETURNING 1) SELECT count(*) FROM added", fetch=True)[0][0]
+
+def _quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+@app.route('/import', methods=['POST'])
+def import_graph():
+    """
+    Bulk-load an edge list streamed in the request body (see graph_transfer for formats).
+    Rows are COPYed into a temporary staging table, then the nodes and edges not already
+    present are inserted from it in the same transaction, so an import is all-or-nothing and
+    never duplicates anything.
+    """
+    fmt = graph_transfer.detect_format(request.args.get('format'), request.content_type)
+    if fmt is None:
+        return jsonify({"error": f"'format' must be one of {', '.join(graph_transfer.FORMATS)}"}), 400
+    rows = graph_transfer.RowsAsCSV(graph_transfer.read_rows(request.stream, fmt))
+
+    def load(tx):
+        tx.execute(
+            "CREATE TEMPORARY TABLE edge_import (source VARCHAR(255) NOT NULL, target VARCHAR(255)) "
+            "ON COMMIT DROP"
+        )
+        staged = tx.copy("COPY edge_import (source, target) FROM STDIN WITH (FORMAT csv)", rows)
+        tx.execute("ANALYZE edge_import")
+        nodes_added = _count_inserted(
+            tx,
+            "INSERT INTO nodes (label)"
+            " SELECT label FROM ("
+            "  SELECT source AS label FROM edge_import"
+            "  UNION SELECT target FROM edge_import WHERE target IS NOT NULL"
+            " ) s WHERE NOT EXISTS (SELECT 1 FROM nodes n WHERE n.label = s.label)"
+            " ORDER BY label ON CONFLICT DO NOTHING"
+        )
+
+        new_edges = (
+            " SELECT DISTINCT s.id, t.id FROM edge_import i"
+            " JOIN nodes s ON s.label = i.source JOIN nodes t ON t.label = i.target"
+            " WHERE NOT EXISTS (SELECT 1 FROM edges e WHERE e.source = s.id AND e.target = t.id)"
+            " ORDER BY s.id, t.id"
+        )
+        if staged < IMPORT_REBUILD_FK_MIN_ROWS:
+            edges_added = _count_inserted(
+                tx, f"INSERT INTO edges (source, target) {new_edges} ON CONFLICT DO NOTHING"
+            )
+        else:
+            # Dropping the constraints locks edges exclusively until commit, so no other
+            # writer can race the plain INSERT.
+            fkeys = tx.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint"
+                " WHERE conrelid = 'edges'::regclass AND contype = 'f'",
+                fetch=True
+            )
+            for name, _ in fkeys:
+                tx.execute(f"ALTER TABLE edges DROP CONSTRAINT {_quote_ident(name)}")
+            edges_added = _count_inserted(tx, f"INSERT INTO edges (source, target) {new_edges}")
+            for name, definition in fkeys:
+                tx.execute(f"ALTER TABLE edges ADD CONSTRAINT {_quote_ident(name)} {definition}")
+        return {"status": "imported", "rows": staged, "nodes_added": nodes_added, "edges_added": edges_added}
+
+    outcome = mutate(load)
+    if rows.error:
+        return jsonify({"error": f"Invalid {fmt} input, {rows.error}"}), 400
+    if outcome:
+        version, result = outcome
+        return jsonify({**result, "version": version})
+    return jsonify({"error": "Database error"}), 500
+
+@app.route('/export', methods=['GET'])
+def export_graph():
+    """Stream every edge (then every isolated node) as CSV or NDJSON, from one COPY snapshot."""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in graph_transfer.FORMATS:
+        return jsonify({"error": f"'format' must be one of {', '.join(graph_transfer.FORMATS)}"}), 400
+    spooled = graph_transfer.spool()
+
+    def dump(tx):
+        tx.copy(
+            "COPY ("
+            " SELECT source, target FROM ("
+            "  SELECT e.id, s.label AS source, t.label AS target FROM edges e"
+            "  JOIN nodes s ON s.id = e.source JOIN nodes t ON t.id = e.target ORDER BY e.id"
+            " ) e"
+            " UNION ALL"
+            " SELECT label, NULL FROM nodes n WHERE NOT EXISTS (SELECT 1 FROM edges e WHERE e.source = n.id)"
+            "  AND NOT EXISTS (SELECT 1 FROM edges e WHERE e.target = n.id)"
+            ") TO STDOUT WITH (FORMAT csv)",
+            spooled
+        )
+        return True
+
+    copied = db_client.run_transaction(dump)
+    if not copied:
+        spooled.close()
+        return jsonify({"error": "Database error"}), 500
+    return Response(
+        graph_transfer.stream_export(spooled, fmt),
+        mimetype=graph_transfer.FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=graph.{fmt}"}
+    )
+
 @app.route('/', methods=['GET'])
 def health():
     return jsonify({"status": "Graph Service Active"})
 
+@app.route('/index/stats', methods=['GET'])
+def index_stats():
+    return jsonify({"index": index.stats(), "pool": db_client.pool_stats()})
+
 if __name__ == '__main__':
     # Graph Service runs on 5000 inside container (mapped to 5003 in Service)
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,21 @@
+import msgpack
+
+# GET /data with "Accept: application/msgpack" returns the whole graph as one MessagePack map
+# instead of JSON, which is several times smaller and faster to decode for large graphs:
+#   {"format": 1, "version": V, "nodes": [label, ...], "source": <bin>, "target": <bin>}
+# Each label appears once. Edge i runs from nodes[source[i]] to nodes[target[i]]; source and
+# target are packed little-endian uint32 arrays, e.g. numpy.frombuffer(snapshot["source"], "<u4").
+MEDIA_TYPE = "application/msgpack"
+FORMAT = 1
+
+
+def encode(version, csr):
+    """The snapshot of `csr` (a graph_algorithms.CSRGraph of graph `version`) as bytes."""
+    return msgpack.packb({
+        "format": FORMAT,
+        "version": version,
+        "nodes": csr.labels,
+        "source": csr.src.astype("<u4").tobytes(),
+        "target": csr.dst.astype("<u4").tobytes(),
+    })
+
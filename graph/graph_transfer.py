@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+import tempfile
+
+# Edge-list formats for /import and /export. One row per edge, or per isolated node:
+#   csv:    source,target    (optional "source,target" header; a node-only row leaves target empty)
+#   ndjson: {"from": "A", "to": "B"}   ({"source", "target"} also accepted) or {"label": "A"}
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Export spools COPY output in memory up to this size, then on disk, so the pooled connection
+# is released before the response starts streaming to a possibly slow client.
+EXPORT_SPOOL_BYTES = 8 * 1024 * 1024
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+class ImportFormatError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+def detect_format(requested, content_type):
+    """The format named by ?format=, else implied by the Content-Type; None if unknown."""
+    if requested:
+        return requested if requested in FORMATS else None
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    for name, mime in FORMATS.items():
+        if content_type == mime:
+            return name
+    if content_type in ("application/json", "application/jsonl", "application/ndjson"):
+        return "ndjson"
+    return "csv"
+
+
+def _label(value, line, field):
+    if value is None:
+        return None
+    if not isinstance(value, (str, int)):
+        raise ImportFormatError(line, f"'{field}' must be a string")
+    label = str(value).strip().upper()
+    if len(label) > 255:
+        raise ImportFormatError(line, f"'{field}' is longer than 255 characters")
+    return label or None
+
+
+def read_rows(stream, fmt):
+    """Yield normalized (source, target-or-None) pairs from a binary request stream."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "csv":
+        reader = csv.reader(text)
+        for row in reader:
+            line = reader.line_num
+            if not row or (len(row) == 1 and not row[0].strip()):
+                continue
+            if line == 1 and [c.strip().lower() for c in row[:2]] == ["source", "target"]:
+                continue
+            if len(row) > 2:
+                raise ImportFormatError(line, "expected source,target")
+            source = _label(row[0], line, "source")
+            target = _label(row[1], line, "target") if len(row) > 1 else None
+            if source is None:
+                raise ImportFormatError(line, "source is required")
+            yield source, target
+        return
+
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            raise ImportFormatError(line, "invalid JSON")
+        if not isinstance(item, dict):
+            raise ImportFormatError(line, "expected an object")
+        if "label" in item:
+            source, target = _label(item["label"], line, "label"), None
+        else:
+            source = _label(item.get("from", item.get("source")), line, "from")
+            target = _label(item.get("to", item.get("target")), line, "to")
+        if source is None:
+            raise ImportFormatError(line, "from (or label) is required")
+        yield source, target
+
+
+class RowsAsCSV(io.RawIOBase):
+    """
+    Read-only file over an iterator of rows, rendered as CSV on demand so COPY ... FROM STDIN
+    can consume an upload while it is still arriving. `rows` counts rows handed out; `error`
+    keeps the ImportFormatError that aborted the read, since psycopg2 reports it as a COPY
+    failure.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = b""
+        self._text = io.StringIO()
+        self._writer = csv.writer(self._text, lineterminator="\n")
+        self.rows = 0
+        self.error = None
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                batch = [row for _, row in zip(range(1000), self._rows)]
+            except ImportFormatError as e:
+                self.error = e
+                raise
+            if not batch:
+                break
+            self.rows += len(batch)
+            self._writer.writerows(batch)
+            self._buffer += self._text.getvalue().encode("utf-8")
+            self._text.seek(0)
+            self._text.truncate()
+        if size < 0:
+            size = len(self._buffer)
+        out, self._buffer = self._buffer[:size], self._buffer[size:]
+        return out
+
+
+def spool():
+    return tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+
+
+def stream_export(spooled, fmt):
+    """Yield the export body from the spooled COPY csv output (source,target rows)."""
+    spooled.seek(0)
+    try:
+        if fmt == "csv":
+            yield b"source,target\n"
+            while True:
+                chunk = spooled.read(EXPORT_CHUNK_BYTES)
+                if not chunk:
+                    return
+                yield chunk
+        text = io.TextIOWrapper(spooled, encoding="utf-8", newline="")
+        out = []
+        size = 0
+        for source, target in csv.reader(text):
+            item = {"from": source, "to": target} if target else {"label": source}
+            out.append(json.dumps(item, separators=(",", ":")))
+            size += len(out[-1]) + 1
+            if size >= EXPORT_CHUNK_BYTES:
+                yield ("\n".join(out) + "\n").encode()
+                out, size = [], 0
+        if out:
+            yield ("\n".join(out) + "\n").encode()
+    finally:
+        spooled.close()
@@ -0,0 +1,293 @@
+import os
+import sys
+import time
+
+import psycopg2
+from psycopg2 import errors
+
+import db_client
+
+# Versioned schema changes for the graph tables. `migrate()` runs at service startup (and as
+# `python migrations.py`): it applies, in order, every migration not yet recorded in
+# schema_migrations. An advisory lock makes concurrently starting replicas wait for the one
+# doing the work, so no replica serves queries against a schema it does not expect.
+#
+# Migrations must be safe to re-run after a crash part-way through, and must not hold locks
+# that block the running service for long: old replicas keep serving while a new one
+# migrates, so large tables are backfilled in batches and swapped in one short transaction.
+MIGRATION_BATCH_ROWS = int(os.environ.get('MIGRATION_BATCH_ROWS', '10000'))
+# How long the final swap of an online migration waits for table locks before retrying, so
+# it never queues (and stalls every other query) behind a long-running read.
+MIGRATION_LOCK_TIMEOUT = os.environ.get('MIGRATION_LOCK_TIMEOUT', '5s')
+MIGRATION_LOCK_ATTEMPTS = int(os.environ.get('MIGRATION_LOCK_ATTEMPTS', '10'))
+
+_ADVISORY_LOCK_KEY = 0x67726170  # "grap"
+
+
+class MigrationError(Exception):
+    pass
+
+
+def _transaction(cur, *statements, lock_timeout=None):
+    cur.execute("BEGIN")
+    try:
+        if lock_timeout:
+            cur.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+        for statement in statements:
+            cur.execute(statement)
+        cur.execute("COMMIT")
+    except BaseException:
+        cur.execute("ROLLBACK")
+        raise
+
+
+def _column_type(cur, table, column):
+    cur.execute(
+        "SELECT data_type FROM information_schema.columns"
+        " WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s",
+        (table, column)
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _has_constraint(cur, table, name):
+    cur.execute("SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s", (table, name))
+    return cur.fetchone() is not None
+
+
+def _create_index_concurrently(cur, name, definition):
+    """CREATE INDEX CONCURRENTLY, replacing an invalid leftover of an interrupted build."""
+    cur.execute("SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass(%s)", (name,))
+    row = cur.fetchone()
+    if row and row[0]:
+        return
+    if row:
+        cur.execute(f"DROP INDEX CONCURRENTLY {name}")
+    cur.execute(f"CREATE {definition.replace('INDEX', 'INDEX CONCURRENTLY', 1)}")
+
+
+# --- 1: graph_meta ---
+def _graph_meta(cur):
+    """Version row bumped by every graph mutation (see graph_index)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS graph_meta (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL DEFAULT 0
+        );
+        INSERT INTO graph_meta (id, version) VALUES (TRUE, 0) ON CONFLICT DO NOTHING;
+    """)
+
+
+# --- 2: integer node ids ---
+def _integer_node_ids(cur):
+    """
+    Key nodes by a surrogate integer id (label stays unique) and store edges as pairs of ids,
+    with an index on each endpoint. Online:
+      1. add nodes.id with a sequence default and backfill existing rows in batches;
+      2. build the unique id and label indexes concurrently;
+      3. create edges_new with the new layout, kept in sync with edges by triggers, copy
+         edges into it in id-range batches, then index it concurrently;
+      4. in one short transaction, drop edges, rename edges_new to edges and move the
+         primary key of nodes to id. Foreign keys are added NOT VALID and validated after.
+    Rewriting edges into a new table (rather than adding columns) is what actually frees the
+    space taken by the label strings.
+    """
+    if _column_type(cur, "edges", "source") == "integer":
+        cur.execute("CREATE INDEX IF NOT EXISTS edges_target_idx ON edges (target)")
+        _validate_edge_fkeys(cur)
+        return
+
+    _transaction(
+        cur,
+        "ALTER TABLE nodes ADD COLUMN IF NOT EXISTS id INTEGER",
+        "CREATE SEQUENCE IF NOT EXISTS nodes_id_seq OWNED BY nodes.id",
+        "ALTER TABLE nodes ALTER COLUMN id SET DEFAULT nextval('nodes_id_seq')",
+    )
+    # Rows inserted from here on get an id from the default; number the rest.
+    while True:
+        updated, last = 0, ""
+        while True:
+            cur.execute(
+                "UPDATE nodes SET id = nextval('nodes_id_seq') WHERE label IN ("
+                " SELECT label FROM nodes WHERE id IS NULL AND label > %s ORDER BY label LIMIT %s"
+                ") RETURNING label",
+                (last, MIGRATION_BATCH_ROWS)
+            )
+            labels = [label for label, in cur.fetchall()]
+            if not labels:
+                break
+            updated += len(labels)
+            last = max(labels)
+        if not updated:
+            break
+    _create_index_concurrently(cur, "nodes_id_key", "UNIQUE INDEX nodes_id_key ON nodes (id)")
+    _create_index_concurrently(cur, "nodes_label_key", "UNIQUE INDEX nodes_label_key ON nodes (label)")
+    # A validated CHECK lets the swap's SET NOT NULL skip scanning the table under its lock.
+    if not _has_constraint(cur, "nodes", "nodes_id_not_null"):
+        cur.execute("ALTER TABLE nodes ADD CONSTRAINT nodes_id_not_null CHECK (id IS NOT NULL) NOT VALID")
+    cur.execute("ALTER TABLE nodes VALIDATE CONSTRAINT nodes_id_not_null")
+
+    # Old replicas write edges by label until the swap; mirror every change into edges_new.
+    _transaction(
+        cur,
+        """
+        CREATE TABLE IF NOT EXISTS edges_new (
+            id INTEGER CONSTRAINT edges_new_pkey PRIMARY KEY,
+            source INTEGER NOT NULL,
+            target INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE OR REPLACE FUNCTION edges_new_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO edges_new (id, source, target)
+                SELECT NEW.id, s.id, t.id FROM nodes s, nodes t
+                WHERE s.label = NEW.source AND t.label = NEW.target
+                ON CONFLICT (id) DO NOTHING;
+            ELSIF TG_OP = 'DELETE' THEN
+                DELETE FROM edges_new WHERE id = OLD.id;
+            ELSE
+                TRUNCATE edges_new;
+            END IF;
+            RETURN NULL;
+        END $$
+        """,
+        "DROP TRIGGER IF EXISTS edges_new_sync ON edges",
+        "CREATE TRIGGER edges_new_sync AFTER INSERT OR DELETE ON edges"
+        " FOR EACH ROW EXECUTE FUNCTION edges_new_sync()",
+        "DROP TRIGGER IF EXISTS edges_new_sync_truncate ON edges",
+        "CREATE TRIGGER edges_new_sync_truncate AFTER TRUNCATE ON edges"
+        " FOR EACH STATEMENT EXECUTE FUNCTION edges_new_sync()",
+    )
+    cur.execute("SELECT COALESCE(max(id), 0) FROM edges")
+    high = cur.fetchone()[0]
+    for low in range(0, high, MIGRATION_BATCH_ROWS):
+        # FOR SHARE holds off concurrent deletes of the copied rows until the batch commits, so
+        # the delete trigger always finds (and removes) what the batch copied.
+        cur.execute(
+            "INSERT INTO edges_new (id, source, target) ("
+            " SELECT e.id, s.id, t.id FROM edges e"
+            " JOIN nodes s ON s.label = e.source JOIN nodes t ON t.label = e.target"
+            " WHERE e.id > %s AND e.id <= %s FOR SHARE OF e"
+            ") ON CONFLICT (id) DO NOTHING",
+            (low, low + MIGRATION_BATCH_ROWS)
+        )
+    # Built after the copy: filling them row by row in id order would leave them much larger.
+    _create_index_concurrently(
+        cur, "edges_new_unique_edge", "UNIQUE INDEX edges_new_unique_edge ON edges_new (source, target)")
+    _create_index_concurrently(cur, "edges_new_target_idx", "INDEX edges_new_target_idx ON edges_new (target)")
+
+    cur.execute("SELECT pg_get_serial_sequence('edges', 'id')")
+    edge_ids = cur.fetchone()[0]
+    swap = [
+        "LOCK TABLE nodes, edges, edges_new IN ACCESS EXCLUSIVE MODE",
+        f"ALTER SEQUENCE {edge_ids} OWNED BY edges_new.id",
+        f"ALTER TABLE edges_new ALTER COLUMN id SET DEFAULT nextval('{edge_ids}')",
+        "DROP TABLE edges",
+        "DROP FUNCTION edges_new_sync()",
+        "ALTER TABLE edges_new RENAME TO edges",
+        "ALTER TABLE edges RENAME CONSTRAINT edges_new_pkey TO edges_pkey",
+        "ALTER TABLE edges ADD CONSTRAINT unique_edge UNIQUE USING INDEX edges_new_unique_edge",
+        "ALTER INDEX edges_new_target_idx RENAME TO edges_target_idx",
+        "ALTER TABLE nodes ALTER COLUMN id SET NOT NULL",
+        "ALTER TABLE nodes DROP CONSTRAINT nodes_id_not_null",
+        "ALTER TABLE nodes DROP CONSTRAINT nodes_pkey",
+        "ALTER TABLE nodes ADD CONSTRAINT nodes_pkey PRIMARY KEY USING INDEX nodes_id_key",
+        "ALTER TABLE nodes ADD CONSTRAINT nodes_label_key UNIQUE USING INDEX nodes_label_key",
+        "ALTER TABLE edges ADD CONSTRAINT edges_source_fkey"
+        " FOREIGN KEY (source) REFERENCES nodes(id) ON DELETE CASCADE NOT VALID",
+        "ALTER TABLE edges ADD CONSTRAINT edges_target_fkey"
+        " FOREIGN KEY (target) REFERENCES nodes(id) ON DELETE CASCADE NOT VALID",
+    ]
+    for attempt in range(1, MIGRATION_LOCK_ATTEMPTS + 1):
+        try:
+            _transaction(cur, *swap, lock_timeout=MIGRATION_LOCK_TIMEOUT)
+            break
+        except errors.LockNotAvailable:
+            if attempt == MIGRATION_LOCK_ATTEMPTS:
+                raise
+            print(f"Migration: tables busy, retrying the swap ({attempt}/{MIGRATION_LOCK_ATTEMPTS})")
+            time.sleep(1)
+    _validate_edge_fkeys(cur)
+    # Replicas inserting new (higher) ids during the copy made the primary key split pages
+    # half-full; rebuild it compactly.
+    cur.execute("REINDEX INDEX CONCURRENTLY edges_pkey")
+    cur.execute("ANALYZE nodes")
+    cur.execute("ANALYZE edges")
+
+
+def _validate_edge_fkeys(cur):
+    # VALIDATE takes a lock that still allows reads and writes; a no-op once validated.
+    for name in ("edges_source_fkey", "edges_target_fkey"):
+        if _has_constraint(cur, "edges", name):
+            cur.execute(f"ALTER TABLE edges VALIDATE CONSTRAINT {name}")
+
+
+# (version, name, function run with an autocommit cursor), in order. Append only.
+MIGRATIONS = [
+    (1, "graph_meta", _graph_meta),
+    (2, "integer_node_ids", _integer_node_ids),
+]
+
+
+def applied_versions(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {version for version, in cur.fetchall()}
+
+
+def migrate():
+    """
+    Apply pending migrations on a dedicated connection. Returns the versions applied, or
+    None if the database cannot be reached; raises MigrationError if a migration fails.
+    """
+    conn = db_client.get_db_connection()
+    if conn is None:
+        return None
+    conn.autocommit = True
+    applied = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (_ADVISORY_LOCK_KEY,))
+            done = applied_versions(cur)
+            for version, name, run in MIGRATIONS:
+                if version in done:
+                    continue
+                print(f"Migration {version} ({name}): applying")
+                started = time.monotonic()
+                try:
+                    run(cur)
+                except psycopg2.Error as e:
+                    raise MigrationError(f"migration {version} ({name}) failed: {e}") from e
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                    (version, name)
+                )
+                print(f"Migration {version} ({name}): done in {time.monotonic() - started:.1f}s")
+                applied.append(version)
+    finally:
+        conn.close()
+    return applied
+
+
+if __name__ == '__main__':
+    if '--status' in sys.argv[1:]:
+        conn = db_client.get_db_connection()
+        if conn is None:
+            sys.exit(1)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            done = applied_versions(cur)
+        conn.close()
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:4d} {name:30s} {'applied' if version in done else 'pending'}")
+        sys.exit(0)
+    sys.exit(0 if migrate() is not None else 1)
@@ -8,11 +8,15 @@ import java.io.OutputStream;
 import java.io.OutputStreamWriter;
 import java.io.InputStream;
 import java.net.InetSocketAddress;
+import java.net.URLDecoder;
 import java.sql.Connection;
 import java.sql.PreparedStatement;
 import java.sql.ResultSet;
+import java.sql.SQLException;
 import java.sql.Statement;
 import java.nio.charset.StandardCharsets;
+import java.util.HashMap;
+import java.util.Map;
 
 // --- PROMETHEUS IMPORTS ---
 import io.prometheus.client.CollectorRegistry;
@@ -26,6 +30,36 @@ import io.prometheus.client.hotspot.DefaultExports;
  */
 public class LinkedListService {
 
+    // Page size bounds for GET /list?limit=N&cursor=C
+    private static final int DEFAULT_PAGE_SIZE = 100;
+    private static final int MAX_PAGE_SIZE = 10000;
+
+    // The list's version is sum(version) over list_versions' 16 slots. A statement trigger bumps
+    // the writing backend's slot (pg_backend_pid() % 16) on every write that changes rows in
+    // linked_list, from any replica, so concurrent writers rarely queue on one row lock, empty
+    // writes leave the version alone, and GET /list can answer If-None-Match without reading the
+    // list. The bump commits with the write, so a tag never names data a reader cannot see yet.
+    private static final String VERSION_SCHEMA =
+        "CREATE TABLE IF NOT EXISTS list_versions (slot INT PRIMARY KEY, version BIGINT NOT NULL DEFAULT 0);"
+        + "INSERT INTO list_versions (slot) SELECT generate_series(0, 15) ON CONFLICT DO NOTHING;"
+        + "CREATE OR REPLACE FUNCTION bump_list_version() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN"
+        + " IF TG_OP = 'DELETE' THEN"
+        + "  IF NOT EXISTS (SELECT 1 FROM old_rows) THEN RETURN NULL; END IF;"
+        + " ELSIF TG_OP <> 'TRUNCATE' THEN"
+        + "  IF NOT EXISTS (SELECT 1 FROM new_rows) THEN RETURN NULL; END IF;"
+        + " END IF;"
+        + " UPDATE list_versions SET version = version + 1 WHERE slot = pg_backend_pid() % 16;"
+        + " RETURN NULL; END $$;"
+        + "CREATE OR REPLACE TRIGGER list_version_insert AFTER INSERT ON linked_list"
+        + " REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_list_version();"
+        + "CREATE OR REPLACE TRIGGER list_version_update AFTER UPDATE ON linked_list"
+        + " REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_list_version();"
+        + "CREATE OR REPLACE TRIGGER list_version_delete AFTER DELETE ON linked_list"
+        + " REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_list_version();"
+        + "CREATE OR REPLACE TRIGGER list_version_truncate AFTER TRUNCATE ON linked_list"
+        + " FOR EACH STATEMENT EXECUTE FUNCTION bump_list_version();";
+    private static volatile boolean schemaReady = false;
+
     public static void main(String[] args) throws IOException {
         // 1. Initialize Default Metrics (CPU, Memory, GC)
         // NOTE: This increases RAM usage; ensure K8s limit is at least 512Mi
@@ -63,12 +97,46 @@ public class LinkedListService {
     }
 
     // --- API HANDLERS ---
+    /**
+     * GET /list                      -> ["a","b",...] (every item, head first)
+     * GET /list?limit=N[&cursor=C]   -> {"items":[...],"next_cursor":"C"|null}
+     *
+     * Pages are keyset-paginated on id, so each one is an index range scan however deep it is.
+     * The cursor is opaque to clients: pass next_cursor back unchanged to get the next page.
+     *
+     * Responses carry ETag W/"l<version>"; a request whose If-None-Match names the current one
+     * gets 304 Not Modified without the list being read.
+     */
     static class ListHandler implements HttpHandler {
         @Override
         public void handle(HttpExchange t) throws IOException {
+            Map<String, String> query = parseQuery(t.getRequestURI().getRawQuery());
+            try (Connection conn = DBHelper.getConnection()) {
+                // Read the version before the data: if a write lands in between, the body is
+                // newer than its tag, which only costs the next poll a full response.
+                String etag = listEtag(conn);
+                if (etag != null) {
+                    t.getResponseHeaders().set("ETag", etag);
+                    if (etagMatches(t.getRequestHeaders().getFirst("If-None-Match"), etag)) {
+                        t.sendResponseHeaders(304, -1);
+                        t.close();
+                        return;
+                    }
+                }
+                if (query.containsKey("limit") || query.containsKey("cursor")) {
+                    handlePage(t, conn, query);
+                } else {
+                    handleAll(t, conn);
+                }
+            } catch (SQLException e) {
+                // Closing the connection failed after the response went out; nothing to report.
+                e.printStackTrace();
+            }
+        }
+
+        private void handleAll(HttpExchange t, Connection conn) throws IOException {
             StringBuilder json = new StringBuilder("[");
-            try (Connection conn = DBHelper.getConnection();
-                 Statement stmt = conn.createStatement();
+            try (Statement stmt = conn.createStatement();
                  ResultSet rs = stmt.executeQuery("SELECT value FROM linked_list ORDER BY id ASC")) {
                 boolean first = true;
                 while (rs.next()) {
@@ -82,6 +150,54 @@ public class LinkedListService {
             json.append("]");
             sendResponse(t, 200, json.toString());
         }
+
+        private void handlePage(HttpExchange t, Connection conn, Map<String, String> query) throws IOException {
+            int limit;
+            long cursor;
+            try {
+                limit = query.containsKey("limit") ? Integer.parseInt(query.get("limit")) : DEFAULT_PAGE_SIZE;
+                cursor = query.containsKey("cursor") ? Long.parseLong(query.get("cursor")) : 0L;
+            } catch (NumberFormatException e) {
+                sendResponse(t, 400, "{\"error\": \"Invalid limit or cursor\"}");
+                return;
+            }
+            if (limit < 1 || cursor < 0) {
+                sendResponse(t, 400, "{\"error\": \"Invalid limit or cursor\"}");
+                return;
+            }
+            limit = Math.min(limit, MAX_PAGE_SIZE);
+
+            StringBuilder json = new StringBuilder("{\"items\":[");
+            String nextCursor = null;
+            // Fetch one extra row to learn whether another page follows.
+            try (PreparedStatement pstmt = conn.prepareStatement(
+                     "SELECT id, value FROM linked_list WHERE id > ? ORDER BY id ASC LIMIT ?")) {
+                pstmt.setLong(1, cursor);
+                pstmt.setInt(2, limit + 1);
+                try (ResultSet rs = pstmt.executeQuery()) {
+                    int count = 0;
+                    long lastId = cursor;
+                    while (rs.next()) {
+                        if (count == limit) {
+                            nextCursor = Long.toString(lastId);
+                            break;
+                        }
+                        if (count > 0) json.append(",");
+                        json.append("\"").append(rs.getString("value")).append("\"");
+                        lastId = rs.getLong("id");
+                        count++;
+                    }
+                }
+            } catch (Exception e) {
+                e.printStackTrace();
+                sendResponse(t, 500, "{\"error\": \"DB Error\"}");
+                return;
+            }
+            json.append("],\"next_cursor\":");
+            json.append(nextCursor == null ? "null" : "\"" + nextCursor + "\"");
+            json.append("}");
+            sendResponse(t, 200, json.toString());
+        }
     }
 
     static class AddHandler implements HttpHandler {
@@ -152,6 +268,51 @@ public class LinkedListService {
         }
     }
 
+    /** The list's current ETag, or null if the version cannot be read (then none is sent). */
+    private static String listEtag(Connection conn) {
+        if (conn == null) return null;
+        try (Statement stmt = conn.createStatement()) {
+            if (!schemaReady) {
+                // Once per process; retried on the next request if it failed.
+                stmt.execute(VERSION_SCHEMA);
+                schemaReady = true;
+            }
+            try (ResultSet rs = stmt.executeQuery("SELECT sum(version) FROM list_versions")) {
+                if (!rs.next()) return null;
+                long version = rs.getLong(1);
+                return rs.wasNull() ? null : "W/\"l" + version + "\"";
+            }
+        } catch (SQLException e) {
+            e.printStackTrace();
+            return null;
+        }
+    }
+
+    /** Weak If-None-Match comparison: does the header list `etag` (with or without W/) or "*"? */
+    private static boolean etagMatches(String ifNoneMatch, String etag) {
+        if (ifNoneMatch == null) return false;
+        String opaque = etag.substring(etag.indexOf('"'));
+        for (String candidate : ifNoneMatch.split(",")) {
+            String tag = candidate.trim();
+            if (tag.equals("*")) return true;
+            if (tag.startsWith("W/")) tag = tag.substring(2);
+            if (tag.equals(opaque)) return true;
+        }
+        return false;
+    }
+
+    private static Map<String, String> parseQuery(String rawQuery) {
+        Map<String, String> params = new HashMap<>();
+        if (rawQuery == null || rawQuery.isEmpty()) return params;
+        for (String pair : rawQuery.split("&")) {
+            int eq = pair.indexOf('=');
+            if (eq <= 0) continue;
+            params.put(URLDecoder.decode(pair.substring(0, eq), StandardCharsets.UTF_8),
+                       URLDecoder.decode(pair.substring(eq + 1), StandardCharsets.UTF_8));
+        }
+        return params;
+    }
+
     private static void sendResponse(HttpExchange t, int statusCode, String response) throws IOException {
         t.getResponseHeaders().set("Content-Type", "application/json");
         byte[] bytes = response.getBytes(StandardCharsets.UTF_8);
@@ -1,51 +1,232 @@
+import atexit
+import http.client
 import os
+import signal
+import socket
 import sys
+import threading
 import time
 import subprocess
-import requests
 from flask import Flask, request, Response
+from prometheus_client import Counter, Gauge
 from prometheus_flask_exporter import PrometheusMetrics
 
 C_SERVER_PORT = 5050
 WRAPPER_PORT = 5001
 C_BINARY_PATH = "./stack-service"
+# The C server listens here instead of on C_SERVER_PORT (set STACK_SOCKET= to use TCP).
+C_SOCKET_PATH = os.environ.get("STACK_SOCKET", "/tmp/stack-service.sock")
+C_TIMEOUT_SECONDS = float(os.environ.get("STACK_TIMEOUT_SECONDS", "10"))
+
+# Only what the C server reads is forwarded, and only what it means is relayed back.
+FORWARD_HEADERS = ("Content-Type", "If-None-Match")
+RELAY_HEADERS = (
+    "Content-Type", "Content-Length", "ETag",
+    "Access-Control-Allow-Origin", "Access-Control-Allow-Methods",
+    "Access-Control-Allow-Headers", "Access-Control-Expose-Headers",
+)
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Supervision: the C server counts as ready once GET /health answers 200, polled every
+# C_READY_POLL_SECONDS for up to C_READY_TIMEOUT_SECONDS after each start. If it exits (or
+# never becomes ready) it is restarted after a backoff that doubles from
+# C_RESTART_BACKOFF_SECONDS up to C_RESTART_BACKOFF_MAX_SECONDS, and resets once a run has
+# lasted C_STABLE_SECONDS.
+C_READY_TIMEOUT_SECONDS = float(os.environ.get("STACK_READY_TIMEOUT_SECONDS", "30"))
+C_READY_POLL_SECONDS = float(os.environ.get("STACK_READY_POLL_SECONDS", "0.02"))
+C_RESTART_BACKOFF_SECONDS = float(os.environ.get("STACK_RESTART_BACKOFF_SECONDS", "0.5"))
+C_RESTART_BACKOFF_MAX_SECONDS = float(os.environ.get("STACK_RESTART_BACKOFF_MAX_SECONDS", "30"))
+C_STABLE_SECONDS = float(os.environ.get("STACK_STABLE_SECONDS", "60"))
 
 app = Flask(__name__)
-metrics = PrometheusMetrics(app)
+# /metrics is served below so that it can include the C server's own metrics.
+metrics = PrometheusMetrics(app, path=None)
+
+C_UP = Gauge(
+    "stack_c_server_up", "1 while the supervised C server is running and has passed its health check.",
+    registry=metrics.registry)
+C_RESTARTS = Counter(
+    "stack_c_server_restarts_total", "Times the C server exited or failed to become ready and was restarted.",
+    registry=metrics.registry)
+C_READY_SECONDS = Gauge(
+    "stack_c_server_ready_seconds", "Time from the latest C server start until its health check passed.",
+    registry=metrics.registry)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket: no TCP handshake or loopback stack per call."""
+
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
 
-def start_c_server():
-    print(f"Starting C Server on port {C_SERVER_PORT}...")
-    env = os.environ.copy()
-    env["PORT"] = str(C_SERVER_PORT)
 
-    process = subprocess.Popen(
-        [C_BINARY_PATH],
-        env=env,
-        stdout=sys.stdout,
-        stderr=sys.stderr
-    )
-    time.sleep(2)
-    return process
+def c_connection():
+    # The C server answers one request per connection (Connection: close), so there is
+    # nothing to keep alive; over a Unix socket a fresh connection costs microseconds.
+    if C_SOCKET_PATH:
+        return UnixHTTPConnection(C_SOCKET_PATH, C_TIMEOUT_SECONDS)
+    return http.client.HTTPConnection("localhost", C_SERVER_PORT, timeout=C_TIMEOUT_SECONDS)
+
+
+def c_healthy():
+    conn = c_connection()
+    try:
+        conn.request("GET", "/health")
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status == 200
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        conn.close()
+
+
+def c_metrics():
+    """The C server's /metrics exposition, or "" if it cannot be fetched (stack_c_server_up says why)."""
+    conn = c_connection()
+    try:
+        conn.request("GET", "/metrics")
+        resp = conn.getresponse()
+        text = resp.read().decode("utf-8")
+        return text if resp.status == 200 else ""
+    except (OSError, http.client.HTTPException, UnicodeDecodeError):
+        return ""
+    finally:
+        conn.close()
+
+
+class CServerSupervisor:
+    """
+    Runs ./stack-service on a background thread: starts it, waits for its health check,
+    then waits for it to exit and starts it again after a backoff. `ready` is set while the
+    current process has passed its health check and not yet exited.
+    """
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.process = None
+        self.restarts = 0
+        self._stopping = False
+
+    def start(self):
+        threading.Thread(target=self._run, name="c-server-supervisor", daemon=True).start()
+
+    def stop(self):
+        self._stopping = True
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+
+    def _spawn(self):
+        print(f"Starting C Server on {C_SOCKET_PATH or f'port {C_SERVER_PORT}'}...")
+        env = os.environ.copy()
+        env["PORT"] = str(C_SERVER_PORT)
+        env["STACK_SOCKET"] = C_SOCKET_PATH
+        return subprocess.Popen([C_BINARY_PATH], env=env, stdout=sys.stdout, stderr=sys.stderr)
+
+    def _await_ready(self, process, started):
+        deadline = started + C_READY_TIMEOUT_SECONDS
+        while time.monotonic() < deadline and process.poll() is None:
+            if c_healthy():
+                return True
+            time.sleep(C_READY_POLL_SECONDS)
+        return False
+
+    def _run(self):
+        backoff = C_RESTART_BACKOFF_SECONDS
+        while not self._stopping:
+            started = time.monotonic()
+            try:
+                self.process = process = self._spawn()
+            except OSError as e:
+                print(f"C Server failed to start: {e}")
+                process = None
+            if process is not None:
+                if self._await_ready(process, started):
+                    C_READY_SECONDS.set(time.monotonic() - started)
+                    C_UP.set(1)
+                    self.ready.set()
+                    print(f"C Server ready after {time.monotonic() - started:.2f}s")
+                elif process.poll() is None:
+                    print(f"C Server not ready after {C_READY_TIMEOUT_SECONDS}s; killing it")
+                    process.kill()
+                code = process.wait()
+                self.ready.clear()
+                C_UP.set(0)
+                if self._stopping:
+                    return
+                print(f"C Server exited with code {code}")
+            if time.monotonic() - started >= C_STABLE_SECONDS:
+                backoff = C_RESTART_BACKOFF_SECONDS
+            print(f"Restarting C Server in {backoff:.1f}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, C_RESTART_BACKOFF_MAX_SECONDS)
+            self.restarts += 1
+            C_RESTARTS.inc()
+
+
+supervisor = CServerSupervisor()
+supervisor.start()
+atexit.register(supervisor.stop)
+# Serve as soon as the binary is ready rather than after a fixed delay; if it is not ready by
+# the deadline, requests get 503 until the supervisor brings it up.
+if not supervisor.ready.wait(C_READY_TIMEOUT_SECONDS):
+    print(f"C Server not ready after {C_READY_TIMEOUT_SECONDS}s; answering 503 until it is")
+
+
+@app.route('/metrics')
+@metrics.do_not_track()
+def prometheus_metrics():
+    # Always the text format: the C server's exposition is appended as is, and OpenMetrics
+    # would end the wrapper's part with "# EOF".
+    content, content_type = metrics.generate_metrics()
+    if supervisor.ready.is_set():
+        content += c_metrics()
+    return Response(content, 200, {"Content-Type": content_type})
 
-c_process = start_c_server()
 
 @app.route('/', defaults={'path': ''}, methods=["GET", "POST", "PUT", "DELETE"])
 @app.route('/<path:path>', methods=["GET", "POST", "PUT", "DELETE"])
 def proxy(path):
-    url = f"http://localhost:{C_SERVER_PORT}/{path}"
+    if not supervisor.ready.is_set():
+        return Response("Error: C Server is starting", status=503, headers={"Retry-After": "1"})
+    target = f"/{path}"
+    if request.query_string:
+        target += "?" + request.query_string.decode("latin-1")
+    headers = {name: request.headers[name] for name in FORWARD_HEADERS if name in request.headers}
+    conn = c_connection()
     try:
-        resp = requests.request(
-            method=request.method,
-            url=url,
-            headers={key: value for (key, value) in request.headers if key != 'Host'},
-            data=request.get_data(),
-            cookies=request.cookies,
-            allow_redirects=False
-        )
-        headers = [(name, value) for (name, value) in resp.headers.items()]
-        return Response(resp.content, resp.status_code, headers)
-    except requests.exceptions.ConnectionError:
+        conn.request(request.method, target, body=request.get_data() or None, headers=headers)
+        resp = conn.getresponse()
+    except (OSError, http.client.HTTPException):
+        conn.close()
         return Response("Error: C Server is not responding", status=502)
 
+    def body():
+        # Relay the body as it arrives rather than buffering it (GET /stack can be large).
+        try:
+            while True:
+                chunk = resp.read(STREAM_CHUNK_BYTES)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            conn.close()
+
+    relayed = [(name, resp.getheader(name)) for name in RELAY_HEADERS if resp.getheader(name) is not None]
+    return Response(body(), resp.status, relayed)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=WRAPPER_PORT)
\ No newline at end of file
+    # Exit normally on SIGTERM so atexit stops the C server with us.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    app.run(host='0.0.0.0', port=WRAPPER_PORT)
@@ -3,42 +3,116 @@
 #include <string.h>
 #include <unistd.h>
 #include <ctype.h>
+#include <errno.h>
+#include <poll.h>
+#include <signal.h>
+#include <time.h>
+#include <strings.h>
 #include <sys/socket.h>
+#include <sys/un.h>
 #include <netinet/in.h>
 #include <libpq-fe.h>
 #include "db_client.h"
 
-#define PORT 80
+#define PORT 80  // default; override with the PORT env var, or set STACK_SOCKET to listen on a Unix socket
 #define BUFFER_SIZE 65536
+#define DEFAULT_PAGE_SIZE 100
+#define MAX_PAGE_SIZE 10000
+#define MAX_BULK_SIZE 10000  // most values one /push-many or /pop-n call may move
+// Largest request body accepted (413 beyond it): room for a /push-many of MAX_BULK_SIZE values
+// at up to 16 bytes each ("-2147483648" plus a separator and some whitespace) and the JSON
+// around them. BUFFER_SIZE bounds the request line and headers only.
+#define MAX_BODY_SIZE (MAX_BULK_SIZE * 16 + 4096)
+#define DEFAULT_WRITE_BEHIND_MAX 1000
+#define PROMETHEUS_TYPE "text/plain; version=0.0.4"
+
+// Growable string buffer for response bodies, so large results are never truncated.
+typedef struct {
+    char *data;
+    size_t len;
+    size_t cap;
+} strbuf;
+
+static int sb_append(strbuf *sb, const char *s) {
+    size_t n = strlen(s);
+    if (sb->len + n + 1 > sb->cap) {
+        size_t cap = sb->cap ? sb->cap : 1024;
+        while (sb->len + n + 1 > cap) cap *= 2;
+        char *p = realloc(sb->data, cap);
+        if (!p) return 0;
+        sb->data = p;
+        sb->cap = cap;
+    }
+    memcpy(sb->data + sb->len, s, n + 1);
+    sb->len += n;
+    return 1;
+}
 
-static void send_response(int sock, int status, const char *body) {
+static void sb_free(strbuf *sb) {
+    free(sb->data);
+    sb->data = NULL;
+    sb->len = sb->cap = 0;
+}
+
+static void write_all(int sock, const char *buf, size_t len) {
+    while (len > 0) {
+        ssize_t n = write(sock, buf, len);
+        if (n <= 0) return;
+        buf += n;
+        len -= (size_t)n;
+    }
+}
+
+// Send a response; `etag` (may be NULL) becomes the ETag header. A NULL body sends headers only,
+// as for 304 Not Modified.
+static void send_response_type(int sock, int status, const char *content_type, const char *body, const char *etag) {
     const char *status_text =
         (status == 200) ? "200 OK" :
+        (status == 304) ? "304 Not Modified" :
         (status == 400) ? "400 Bad Request" :
         (status == 404) ? "404 Not Found" :
+        (status == 413) ? "413 Payload Too Large" :
+        (status == 503) ? "503 Service Unavailable" :
         "500 Internal Server Error";
 
-    char resp[BUFFER_SIZE];
-    size_t body_len = strlen(body);
+    char head[640];
+    char etag_line[96] = "";
+    char length_lines[128] = "";
+    size_t body_len = body ? strlen(body) : 0;
 
-    int len = snprintf(resp, sizeof(resp),
+    if (etag) snprintf(etag_line, sizeof(etag_line), "ETag: %s\r\n", etag);
+    if (body) {
+        snprintf(length_lines, sizeof(length_lines),
+            "Content-Type: %s\r\nContent-Length: %zu\r\n", content_type, body_len);
+    }
+
+    int len = snprintf(head, sizeof(head),
         "HTTP/1.1 %s\r\n"
-        "Content-Type: application/json\r\n"
+        "%s"
+        "%s"
         "Access-Control-Allow-Origin: *\r\n"
         "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
-        "Access-Control-Allow-Headers: Content-Type\r\n"
+        "Access-Control-Allow-Headers: Content-Type, If-None-Match\r\n"
+        "Access-Control-Expose-Headers: ETag\r\n"
         "Connection: close\r\n"
-        "Content-Length: %zu\r\n"
-        "\r\n"
-        "%s",
-        status_text, body_len, body
+        "\r\n",
+        status_text, etag_line, length_lines
     );
 
-    if (len > 0) {
-        (void)write(sock, resp, (size_t)len);
+    if (len > 0 && (size_t)len < sizeof(head)) {
+        write_all(sock, head, (size_t)len);
+        if (body_len) write_all(sock, body, body_len);
     }
 }
 
+static void send_response_etag(int sock, int status, const char *body, const char *etag) {
+    send_response_type(sock, status, "application/json", body, etag);
+}
+
+static void send_response(int sock, int status, const char *body) {
+    send_response_etag(sock, status, body, NULL);
+}
+
 static int parse_request_line(const char *req, char *method, size_t msz, char *path, size_t psz) {
     // Expect: METHOD SP PATH SP HTTP/...
     const char *sp1 = strchr(req, ' ');
@@ -60,33 +134,78 @@ static int parse_request_line(const char *req, char *method, size_t msz, char *p
     return 1;
 }
 
+// Split "/path?query" in place: `path` keeps the path, the returned pointer is the query ("" if none).
+static const char *split_query(char *path) {
+    char *q = strchr(path, '?');
+    if (!q) return "";
+    *q = '\0';
+    return q + 1;
+}
+
+// Copy the value of `key` from a query string ("a=1&b=2") into out. Returns 1 if present.
+static int query_param(const char *query, const char *key, char *out, size_t out_sz) {
+    size_t kl = strlen(key);
+    const char *p = query;
+    while (p && *p) {
+        if (strncmp(p, key, kl) == 0 && p[kl] == '=') {
+            const char *v = p + kl + 1;
+            size_t vl = strcspn(v, "&");
+            if (vl >= out_sz) return 0;
+            memcpy(out, v, vl);
+            out[vl] = '\0';
+            return 1;
+        }
+        p = strchr(p, '&');
+        if (p) p++;
+    }
+    return 0;
+}
+
+// Parse a non-negative decimal integer; returns 1 on success.
+static int parse_long(const char *s, long *out) {
+    if (!*s) return 0;
+    long v = 0;
+    for (; *s; s++) {
+        if (!isdigit((unsigned char)*s)) return 0;
+        v = v * 10 + (*s - '0');
+        if (v > 2000000000L) return 0;
+    }
+    *out = v;
+    return 1;
+}
+
+// Return a pointer to the value of header `name` (case-insensitive, leading spaces skipped)
+// within the request head, or NULL. The value runs up to the next "\r\n".
+static const char *find_header(const char *headers, const char *name) {
+    size_t nl_len = strlen(name);
+    const char *end = strstr(headers, "\r\n\r\n");
+    const char *p = strstr(headers, "\r\n");  // skip the request line
+    while (p && (!end || p < end)) {
+        p += 2;
+        if (strncasecmp(p, name, nl_len) == 0 && p[nl_len] == ':') {
+            const char *v = p + nl_len + 1;
+            while (*v == ' ' || *v == '\t') v++;
+            return v;
+        }
+        p = strstr(p, "\r\n");
+    }
+    return NULL;
+}
+
 static int header_content_length(const char *headers) {
-    // simple case-insensitive search for "Content-Length:"
-    const char *p = headers;
-    while (*p) {
-        if ((p[0] == 'C' || p[0] == 'c') &&
-            (p[1] == 'o' || p[1] == 'O') &&
-            (p[2] == 'n' || p[2] == 'N') &&
-            (p[3] == 't' || p[3] == 'T') &&
-            (p[4] == 'e' || p[4] == 'E') &&
-            (p[5] == 'n' || p[5] == 'N') &&
-            (p[6] == 't' || p[6] == 'T') &&
-            p[7] == '-' &&
-            (p[8] == 'L' || p[8] == 'l') &&
-            (p[9] == 'e' || p[9] == 'E') &&
-            (p[10] == 'n' || p[10] == 'N') &&
-            (p[11] == 'g' || p[11] == 'G') &&
-            (p[12] == 't' || p[12] == 'T') &&
-            (p[13] == 'h' || p[13] == 'H') &&
-            p[14] == ':')
-        {
-            const char *q = p + 15;
-            while (*q && isspace((unsigned char)*q)) q++;
-            return atoi(q);
-        }
-        const char *nl = strstr(p, "\r\n");
-        if (!nl) break;
-        p = nl + 2;
+    const char *v = find_header(headers, "Content-Length");
+    return v ? atoi(v) : 0;
+}
+
+// Weak If-None-Match comparison: does the header list `etag` (W/"..." or "...") or "*"?
+static int etag_matches(const char *if_none_match, const char *etag) {
+    if (!if_none_match) return 0;
+    const char *opaque = strchr(etag, '"');  // compare the quoted part, ignoring any W/
+    size_t ol = strlen(opaque);
+    size_t vl = strcspn(if_none_match, "\r\n");
+    if (vl == 1 && if_none_match[0] == '*') return 1;
+    for (const char *p = if_none_match; p + ol <= if_none_match + vl; p++) {
+        if (strncmp(p, opaque, ol) == 0) return 1;
     }
     return 0;
 }
@@ -121,43 +240,212 @@ static int extract_json_int_value(const char *json, const char *key, int *out) {
     return 1;
 }
 
-static int read_full_http_request(int sock, char *out_buf, size_t out_sz) {
-    // Read until headers complete, then read body based on Content-Length.
-    size_t total = 0;
+// Parse "key": [<int>, ...] into a Postgres array literal ("{1,2,3}") appended to `out`, and
+// count the elements. Every value must fit in an INT column. Returns 1 on success.
+static int extract_json_int_array(const char *json, const char *key, strbuf *out, int *count) {
+    char needle[64];
+    snprintf(needle, sizeof(needle), "\"%s\"", key);
+
+    const char *p = strstr(json, needle);
+    if (!p) return 0;
+    p += strlen(needle);
 
-    while (total < out_sz - 1) {
-        ssize_t n = read(sock, out_buf + total, out_sz - 1 - total);
+    while (*p && isspace((unsigned char)*p)) p++;
+    if (*p != ':') return 0;
+    p++;
+    while (*p && isspace((unsigned char)*p)) p++;
+    if (*p != '[') return 0;
+    p++;
+    while (*p && isspace((unsigned char)*p)) p++;
+
+    *count = 0;
+    if (!sb_append(out, "{")) return 0;
+    if (*p == ']') return sb_append(out, "}");
+    for (;;) {
+        int neg = (*p == '-');
+        if (neg) p++;
+        if (!isdigit((unsigned char)*p)) return 0;
+        long long v = 0;
+        while (isdigit((unsigned char)*p)) {
+            v = v * 10 + (*p - '0');
+            if (v > 2147483648LL) return 0;
+            p++;
+        }
+        if (!neg && v > 2147483647LL) return 0;
+
+        char num[24];
+        snprintf(num, sizeof(num), "%s%lld", neg ? "-" : "", v);
+        if ((*count && !sb_append(out, ",")) || !sb_append(out, num)) return 0;
+        (*count)++;
+
+        while (*p && isspace((unsigned char)*p)) p++;
+        if (*p == ']') break;
+        if (*p != ',') return 0;
+        p++;
+        while (*p && isspace((unsigned char)*p)) p++;
+    }
+    return sb_append(out, "}");
+}
+
+// Grow sb so it can hold `need` bytes plus a terminating NUL.
+static int sb_reserve(strbuf *sb, size_t need) {
+    if (need + 1 <= sb->cap) return 1;
+    size_t cap = sb->cap ? sb->cap : 1024;
+    while (need + 1 > cap) cap *= 2;
+    char *p = realloc(sb->data, cap);
+    if (!p) return 0;
+    sb->data = p;
+    sb->cap = cap;
+    return 1;
+}
+
+// Read one request into `out`: headers (at most BUFFER_SIZE bytes), then a body of up to
+// MAX_BODY_SIZE bytes as given by Content-Length. Returns 1 once it is complete (or the client
+// stopped sending after some bytes), 0 if nothing was read, -1 if the headers or the declared
+// body are over their limits.
+static int read_full_http_request(int sock, strbuf *out) {
+    size_t need = 0;  // whole request length, known once the headers are in
+
+    for (;;) {
+        size_t want = need ? need : BUFFER_SIZE;
+        if (!sb_reserve(out, want)) return -1;
+        ssize_t n = read(sock, out->data + out->len, want - out->len);
         if (n <= 0) break;
-        total += (size_t)n;
-        out_buf[total] = '\0';
-
-        // stop when we have headers and body (if any)
-        char *hdr_end = strstr(out_buf, "\r\n\r\n");
-        if (hdr_end) {
-            size_t header_len = (size_t)(hdr_end - out_buf) + 4;
-            int cl = header_content_length(out_buf);
-            size_t need = header_len + (cl > 0 ? (size_t)cl : 0);
-            if (total >= need) {
-                return 1;
+        out->len += (size_t)n;
+        out->data[out->len] = '\0';
+
+        if (!need) {
+            char *hdr_end = strstr(out->data, "\r\n\r\n");
+            if (!hdr_end) {
+                if (out->len >= BUFFER_SIZE) return -1;
+                continue;
             }
+            int cl = header_content_length(out->data);
+            if (cl < 0 || cl > MAX_BODY_SIZE) return -1;
+            need = (size_t)(hdr_end - out->data) + 4 + (size_t)cl;
         }
+        if (out->len >= need) return 1;
     }
-    return (total > 0);
+    return (out->len > 0);
 }
 
-static void handle_client(int client_sock) {
-    char req[BUFFER_SIZE];
-    memset(req, 0, sizeof(req));
+// The stack's version is sum(version) over stack_versions. A statement trigger bumps it on every
+// write to stack that changes rows, from any replica, so GET /stack can answer If-None-Match
+// without scanning the stack. Each write bumps the slot of its own backend (pg_backend_pid() %
+// 16) rather than one shared row, so concurrent writers on different connections rarely wait
+// for each other's row lock until commit. The sum still moves with every committing write, and
+// only once it commits, so a tag never runs ahead of the data it stands for. Statements that
+// change nothing (e.g. a pop of an empty stack) leave it alone.
+static const char *SCHEMA_SQL =
+    "CREATE TABLE IF NOT EXISTS stack (id SERIAL PRIMARY KEY, value INT NOT NULL);"
+    "CREATE TABLE IF NOT EXISTS stack_versions (slot INT PRIMARY KEY, version BIGINT NOT NULL DEFAULT 0);"
+    "INSERT INTO stack_versions (slot) SELECT generate_series(0, 15) ON CONFLICT DO NOTHING;"
+    "CREATE OR REPLACE FUNCTION bump_stack_version() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN"
+    " IF TG_OP = 'DELETE' THEN"
+    "  IF NOT EXISTS (SELECT 1 FROM old_rows) THEN RETURN NULL; END IF;"
+    " ELSIF TG_OP <> 'TRUNCATE' THEN"
+    "  IF NOT EXISTS (SELECT 1 FROM new_rows) THEN RETURN NULL; END IF;"
+    " END IF;"
+    " UPDATE stack_versions SET version = version + 1 WHERE slot = pg_backend_pid() % 16;"
+    " RETURN NULL;"
+    " END $$;"
+    "CREATE OR REPLACE TRIGGER stack_version_insert AFTER INSERT ON stack"
+    " REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_stack_version();"
+    "CREATE OR REPLACE TRIGGER stack_version_update AFTER UPDATE ON stack"
+    " REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_stack_version();"
+    "CREATE OR REPLACE TRIGGER stack_version_delete AFTER DELETE ON stack"
+    " REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_stack_version();"
+    "CREATE OR REPLACE TRIGGER stack_version_truncate AFTER TRUNCATE ON stack"
+    " FOR EACH STATEMENT EXECUTE FUNCTION bump_stack_version();";
+
+static int schema_ready = 0;
+
+// Ensure the tables exist (once per process; retried on the next call if it failed).
+static void ensure_schema(PGconn *conn) {
+    if (schema_ready) return;
+    PGresult *r0 = PQexec(conn, SCHEMA_SQL);
+    schema_ready = PQresultStatus(r0) == PGRES_COMMAND_OK;
+    PQclear(r0);
+}
 
-    if (!read_full_http_request(client_sock, req, sizeof(req))) {
-        return;
+// Insert an array of values as one statement; WITH ORDINALITY + ORDER BY keeps ids (and so
+// stack order) in array order.
+static const char *PUSH_MANY_SQL =
+    "INSERT INTO stack (value) "
+    "SELECT v FROM unnest($1::int[]) WITH ORDINALITY AS t(v, n) ORDER BY n";
+
+// Write-behind (opt in with STACK_WRITE_BEHIND_MS > 0): POST /push appends to an in-memory
+// buffer and answers without touching the database. The buffer is written with one INSERT,
+// i.e. one transaction and one commit for the whole group, once it holds
+// STACK_WRITE_BEHIND_MAX values, once its oldest value has waited STACK_WRITE_BEHIND_MS, and
+// on SIGTERM/SIGINT. Pops take buffered values first (they are the newest) and every other
+// route flushes before touching the table, so clients of this process see the same LIFO
+// order as without buffering. Other replicas only see the values once flushed, and if the
+// process dies without a clean shutdown the buffer is lost: at most the last
+// STACK_WRITE_BEHIND_MS (and STACK_WRITE_BEHIND_MAX values) of acknowledged pushes.
+static long wb_window_ms = 0;  // 0: off
+static long wb_max = DEFAULT_WRITE_BEHIND_MAX;
+static int *wb_values = NULL;
+static long wb_len = 0;
+static long long wb_deadline_ms = 0;  // when the oldest buffered value is due to be flushed
+static unsigned long long wb_flushes = 0, wb_flushed_values = 0, wb_flush_failures = 0;
+
+static long long now_ms(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (long long)ts.tv_sec * 1000 + ts.tv_nsec / 1000000;
+}
+
+// Write every buffered value with one INSERT on `conn`, or on a connection of its own when
+// conn is NULL. Returns 1 once the buffer is empty; on failure the values stay buffered.
+static int wb_flush(PGconn *conn) {
+    if (wb_len == 0) return 1;
+
+    PGconn *own = NULL;
+    if (!conn) {
+        conn = own = get_db_connection();
+        if (!conn) {
+            wb_flush_failures++;
+            return 0;
+        }
+        ensure_schema(conn);
     }
 
+    strbuf arr = {0};
+    int ok = sb_append(&arr, "{");
+    for (long i = 0; ok && i < wb_len; i++) {
+        char num[24];
+        snprintf(num, sizeof(num), i ? ",%d" : "%d", wb_values[i]);
+        ok = sb_append(&arr, num);
+    }
+    ok = ok && sb_append(&arr, "}");
+    if (ok) {
+        const char *params[1] = { arr.data };
+        PGresult *res = PQexecParams(conn, PUSH_MANY_SQL, 1, NULL, params, NULL, NULL, 0);
+        ok = PQresultStatus(res) == PGRES_COMMAND_OK;
+        if (!ok) fprintf(stderr, "Write-behind flush of %ld values failed: %s", wb_len, PQerrorMessage(conn));
+        PQclear(res);
+    }
+    sb_free(&arr);
+    if (own) PQfinish(own);
+
+    if (!ok) {
+        wb_flush_failures++;
+        return 0;
+    }
+    wb_flushes++;
+    wb_flushed_values += (unsigned long long)wb_len;
+    wb_len = 0;
+    return 1;
+}
+
+static void handle_request(int client_sock, const char *req) {
     char method[16], path[256];
     if (!parse_request_line(req, method, sizeof(method), path, sizeof(path))) {
         send_response(client_sock, 400, "{\"error\":\"Bad Request\"}");
         return;
     }
+    const char *query = split_query(path);
 
     // CORS preflight
     if (strcmp(method, "OPTIONS") == 0) {
@@ -166,7 +454,7 @@ static void handle_client(int client_sock) {
     }
 
     // Locate body (if present)
-    char *hdr_end = strstr(req, "\r\n\r\n");
+    const char *hdr_end = strstr(req, "\r\n\r\n");
     const char *body = (hdr_end) ? (hdr_end + 4) : "";
 
     // Health
@@ -175,6 +463,54 @@ static void handle_client(int client_sock) {
         return;
     }
 
+    // Metrics (Prometheus text format)
+    if (strcmp(method, "GET") == 0 && strcmp(path, "/metrics") == 0) {
+        char msg[1024];
+        snprintf(msg, sizeof(msg),
+            "# HELP stack_write_behind_depth Pushes acknowledged but not yet written to the database.\n"
+            "# TYPE stack_write_behind_depth gauge\n"
+            "stack_write_behind_depth %ld\n"
+            "# HELP stack_write_behind_flushes_total Group commits of buffered pushes.\n"
+            "# TYPE stack_write_behind_flushes_total counter\n"
+            "stack_write_behind_flushes_total %llu\n"
+            "# HELP stack_write_behind_flushed_values_total Buffered pushes written to the database.\n"
+            "# TYPE stack_write_behind_flushed_values_total counter\n"
+            "stack_write_behind_flushed_values_total %llu\n"
+            "# HELP stack_write_behind_flush_failures_total Group commits that failed (values stay buffered).\n"
+            "# TYPE stack_write_behind_flush_failures_total counter\n"
+            "stack_write_behind_flush_failures_total %llu\n",
+            wb_len, wb_flushes, wb_flushed_values, wb_flush_failures);
+        send_response_type(client_sock, 200, PROMETHEUS_TYPE, msg, NULL);
+        return;
+    }
+
+    // POST /push with write-behind on: buffer the value, no database round trip.
+    if (wb_window_ms > 0 && strcmp(method, "POST") == 0 && strcmp(path, "/push") == 0) {
+        int val = 0;
+        if (!extract_json_int_value(body, "value", &val)) {
+            send_response(client_sock, 400, "{\"error\":\"Invalid JSON: expected {\\\"value\\\": <int>}\"}");
+            return;
+        }
+        // A full buffer that cannot be flushed refuses pushes rather than growing.
+        if (wb_len >= wb_max && !wb_flush(NULL)) {
+            send_response(client_sock, 503, "{\"error\":\"Write-behind buffer full and flush failed\"}");
+            return;
+        }
+        if (wb_len == 0) wb_deadline_ms = now_ms() + wb_window_ms;
+        wb_values[wb_len++] = val;
+        if (wb_len >= wb_max) wb_flush(NULL);
+        send_response(client_sock, 200, "{\"status\":\"pushed\"}");
+        return;
+    }
+
+    // POST /pop while pushes are buffered: the newest value is the last one buffered.
+    if (wb_len > 0 && strcmp(method, "POST") == 0 && strcmp(path, "/pop") == 0) {
+        char msg[128];
+        snprintf(msg, sizeof(msg), "{\"status\":\"popped\",\"value\":%d}", wb_values[--wb_len]);
+        send_response(client_sock, 200, msg);
+        return;
+    }
+
     // Open a DB connection per request (simple + reliable under replicas).
     PGconn *conn = get_db_connection();
     if (!conn) {
@@ -182,9 +518,16 @@ static void handle_client(int client_sock) {
         return;
     }
 
-    // Ensure table exists
-    PGresult *r0 = PQexec(conn, "CREATE TABLE IF NOT EXISTS stack (id SERIAL PRIMARY KEY, value INT NOT NULL);");
-    PQclear(r0);
+    ensure_schema(conn);
+
+    // Buffered pushes are newer than anything in the table: write them before the routes
+    // below read or change it (POST /pop-n takes them from the buffer instead).
+    int is_pop_n = strcmp(method, "POST") == 0 && strcmp(path, "/pop-n") == 0;
+    if (!is_pop_n && !wb_flush(conn)) {
+        PQfinish(conn);
+        send_response(client_sock, 503, "{\"error\":\"Write-behind flush failed\"}");
+        return;
+    }
 
     // POST /push
     if (strcmp(method, "POST") == 0 && strcmp(path, "/push") == 0) {
@@ -223,10 +566,12 @@ static void handle_client(int client_sock) {
     }
 
     // POST /pop
+    // The top row a concurrent pop has locked is skipped, so neither comes back "stack empty"
+    // while values remain.
     if (strcmp(method, "POST") == 0 && strcmp(path, "/pop") == 0) {
         PGresult *res = PQexec(conn,
             "DELETE FROM stack "
-            "WHERE id = (SELECT id FROM stack ORDER BY id DESC LIMIT 1) "
+            "WHERE id = (SELECT id FROM stack ORDER BY id DESC LIMIT 1 FOR UPDATE SKIP LOCKED) "
             "RETURNING value"
         );
 
@@ -247,9 +592,174 @@ static void handle_client(int client_sock) {
         return;
     }
 
-    // GET /stack
+    // POST /push-many  {"values": [v1, v2, ...]}
+    // Pushes the values in order (v1 first, so the last one ends up on top) with one INSERT,
+    // i.e. one round trip and one transaction however many there are.
+    if (strcmp(method, "POST") == 0 && strcmp(path, "/push-many") == 0) {
+        strbuf arr = {0};
+        int count = 0;
+        if (!extract_json_int_array(body, "values", &arr, &count)) {
+            sb_free(&arr);
+            PQfinish(conn);
+            send_response(client_sock, 400, "{\"error\":\"Invalid JSON: expected {\\\"values\\\": [<int>, ...]}\"}");
+            return;
+        }
+        if (count > MAX_BULK_SIZE) {
+            sb_free(&arr);
+            PQfinish(conn);
+            send_response(client_sock, 400, "{\"error\":\"Too many values\"}");
+            return;
+        }
+
+        if (count > 0) {
+            const char *params[1] = { arr.data };
+            PGresult *res = PQexecParams(conn, PUSH_MANY_SQL, 1, NULL, params, NULL, NULL, 0);
+
+            if (PQresultStatus(res) != PGRES_COMMAND_OK) {
+                const char *err = PQerrorMessage(conn);
+                char msg[512];
+                snprintf(msg, sizeof(msg), "{\"error\":\"DB insert failed\",\"details\":\"%s\"}", err ? err : "unknown");
+                PQclear(res);
+                PQfinish(conn);
+                sb_free(&arr);
+                send_response(client_sock, 500, msg);
+                return;
+            }
+            PQclear(res);
+        }
+
+        sb_free(&arr);
+        PQfinish(conn);
+        char msg[64];
+        snprintf(msg, sizeof(msg), "{\"status\":\"pushed\",\"count\":%d}", count);
+        send_response(client_sock, 200, msg);
+        return;
+    }
+
+    // POST /pop-n  {"count": N}
+    // Removes up to N values from the top in one statement and returns them top first, so a
+    // concurrent pop or push never interleaves with the ones taken here. Rows another pop (on
+    // any replica) has already locked are skipped rather than waited for, so concurrent pops
+    // take disjoint values and each gets N while the stack holds enough. Buffered pushes
+    // (write-behind) are the top of the stack and are taken first; the table is only touched
+    // for the rest, and the buffer only once that has succeeded.
+    if (is_pop_n) {
+        int count = 0;
+        if (!extract_json_int_value(body, "count", &count) || count < 1 || count > MAX_BULK_SIZE) {
+            PQfinish(conn);
+            send_response(client_sock, 400, "{\"error\":\"Invalid JSON: expected {\\\"count\\\": <int 1..10000>}\"}");
+            return;
+        }
+
+        int buffered = wb_len < count ? (int)wb_len : count;
+        PGresult *res = NULL;
+        int rows = 0;
+        if (buffered < count) {
+            char count_str[16];
+            snprintf(count_str, sizeof(count_str), "%d", count - buffered);
+            const char *params[1] = { count_str };
+            res = PQexecParams(conn,
+                "WITH popped AS ("
+                " DELETE FROM stack WHERE id IN ("
+                "  SELECT id FROM stack ORDER BY id DESC LIMIT $1 FOR UPDATE SKIP LOCKED)"
+                " RETURNING id, value) "
+                "SELECT value FROM popped ORDER BY id DESC",
+                1, NULL, params, NULL, NULL, 0
+            );
+
+            if (PQresultStatus(res) != PGRES_TUPLES_OK) {
+                const char *err = PQerrorMessage(conn);
+                char msg[512];
+                snprintf(msg, sizeof(msg), "{\"error\":\"DB delete failed\",\"details\":\"%s\"}", err ? err : "unknown");
+                PQclear(res);
+                PQfinish(conn);
+                send_response(client_sock, 500, msg);
+                return;
+            }
+            rows = PQntuples(res);
+        }
+
+        strbuf out = {0};
+        int ok = sb_append(&out, buffered + rows ? "{\"status\":\"popped\",\"values\":[" : "{\"status\":\"stack empty\",\"values\":[");
+        for (int i = 0; ok && i < buffered; i++) {
+            char num[24];
+            snprintf(num, sizeof(num), i ? ",%d" : "%d", wb_values[--wb_len]);
+            ok = sb_append(&out, num);
+        }
+        for (int i = 0; ok && i < rows; i++) {
+            ok = (i + buffered == 0 || sb_append(&out, ",")) && sb_append(&out, PQgetvalue(res, i, 0));
+        }
+        ok = ok && sb_append(&out, "]}");
+
+        PQclear(res);
+        PQfinish(conn);
+        if (ok) {
+            send_response(client_sock, 200, out.data);
+        } else {
+            send_response(client_sock, 500, "{\"error\":\"Out of memory\"}");
+        }
+        sb_free(&out);
+        return;
+    }
+
+    // GET /stack[?limit=N][&cursor=C]
+    // Without limit/cursor: JSON array of every value, [top, ..., bottom].
+    // With either: {"items":[...],"next_cursor":"C"|null}, keyset-paginated on id (default
+    // DEFAULT_PAGE_SIZE per page), so each page is an index range scan. The cursor is opaque to
+    // clients: pass next_cursor back unchanged to get the page below.
+    // Responses carry ETag W/"s<version>"; a request whose If-None-Match names the current one
+    // gets 304 Not Modified without the stack being read.
     if (strcmp(method, "GET") == 0 && strcmp(path, "/stack") == 0) {
-        PGresult *res = PQexec(conn, "SELECT value FROM stack ORDER BY id DESC");
+        char limit_s[16], cursor_s[32];
+        long limit = DEFAULT_PAGE_SIZE, cursor = 0;
+        int has_limit = query_param(query, "limit", limit_s, sizeof(limit_s));
+        int has_cursor = query_param(query, "cursor", cursor_s, sizeof(cursor_s));
+        int paged = has_limit || has_cursor;
+
+        if ((has_limit && (!parse_long(limit_s, &limit) || limit < 1)) ||
+            (has_cursor && !parse_long(cursor_s, &cursor))) {
+            PQfinish(conn);
+            send_response(client_sock, 400, "{\"error\":\"Invalid limit or cursor\"}");
+            return;
+        }
+        if (limit > MAX_PAGE_SIZE) limit = MAX_PAGE_SIZE;
+
+        // Read the version before the data: if a write lands in between, the body is newer
+        // than its tag, which only costs the next poll a full response.
+        char etag_buf[48];
+        const char *etag = NULL;
+        PGresult *vres = PQexec(conn, "SELECT sum(version) FROM stack_versions");
+        if (PQresultStatus(vres) == PGRES_TUPLES_OK && PQntuples(vres) == 1 && !PQgetisnull(vres, 0, 0)) {
+            snprintf(etag_buf, sizeof(etag_buf), "W/\"s%s\"", PQgetvalue(vres, 0, 0));
+            etag = etag_buf;
+        }
+        PQclear(vres);
+        if (etag && etag_matches(find_header(req, "If-None-Match"), etag)) {
+            PQfinish(conn);
+            send_response_etag(client_sock, 304, NULL, etag);
+            return;
+        }
+
+        PGresult *res;
+        if (paged) {
+            // Fetch one extra row to learn whether another page follows.
+            char lim_str[32], cur_str[32];
+            snprintf(lim_str, sizeof(lim_str), "%ld", limit + 1);
+            snprintf(cur_str, sizeof(cur_str), "%ld", cursor);
+            if (has_cursor) {
+                const char *params[2] = { cur_str, lim_str };
+                res = PQexecParams(conn,
+                    "SELECT id, value FROM stack WHERE id < $1 ORDER BY id DESC LIMIT $2",
+                    2, NULL, params, NULL, NULL, 0);
+            } else {
+                const char *params[1] = { lim_str };
+                res = PQexecParams(conn,
+                    "SELECT id, value FROM stack ORDER BY id DESC LIMIT $1",
+                    1, NULL, params, NULL, NULL, 0);
+            }
+        } else {
+            res = PQexec(conn, "SELECT id, value FROM stack ORDER BY id DESC");
+        }
 
         if (PQresultStatus(res) != PGRES_TUPLES_OK) {
             const char *err = PQerrorMessage(conn);
@@ -262,26 +772,36 @@ static void handle_client(int client_sock) {
             return;
         }
 
-        // Return JSON array: [top, ..., bottom]
-        char out[BUFFER_SIZE];
-        size_t used = 0;
-        used += snprintf(out + used, sizeof(out) - used, "[");
-
         int rows = PQntuples(res);
-        for (int i = 0; i < rows; i++) {
-            const char *v = PQgetvalue(res, i, 0);
-            if (!v) v = "0";
-
-            // keep buffer safe
-            if (used + strlen(v) + 4 >= sizeof(out)) break;
-
-            used += snprintf(out + used, sizeof(out) - used, "%s%s", v, (i < rows - 1) ? "," : "");
+        int more = paged && rows > limit;
+        int n = more ? (int)limit : rows;
+
+        strbuf out = {0};
+        int ok = sb_append(&out, paged ? "{\"items\":[" : "[");
+        for (int i = 0; ok && i < n; i++) {
+            const char *v = PQgetvalue(res, i, 1);
+            if (!v || !*v) v = "0";
+            ok = sb_append(&out, v) && (i == n - 1 || sb_append(&out, ","));
+        }
+        if (ok && paged) {
+            ok = sb_append(&out, "],\"next_cursor\":");
+            if (ok && more) {
+                ok = sb_append(&out, "\"") && sb_append(&out, PQgetvalue(res, n - 1, 0)) && sb_append(&out, "\"}");
+            } else if (ok) {
+                ok = sb_append(&out, "null}");
+            }
+        } else if (ok) {
+            ok = sb_append(&out, "]");
         }
-        used += snprintf(out + used, sizeof(out) - used, "]");
 
         PQclear(res);
         PQfinish(conn);
-        send_response(client_sock, 200, out);
+        if (ok) {
+            send_response_etag(client_sock, 200, out.data, etag);
+        } else {
+            send_response(client_sock, 500, "{\"error\":\"Out of memory\"}");
+        }
+        sb_free(&out);
         return;
     }
 
@@ -289,44 +809,162 @@ static void handle_client(int client_sock) {
     send_response(client_sock, 404, "{\"error\":\"Route Not Found\"}");
 }
 
-int main() {
-    int server_fd = socket(AF_INET, SOCK_STREAM, 0);
-    if (server_fd < 0) {
-        perror("socket");
-        return 1;
+static void handle_client(int client_sock) {
+    strbuf req = {0};
+    int got = read_full_http_request(client_sock, &req);
+    if (got < 0) {
+        // Refuse a request over the limits rather than act on part of it.
+        send_response(client_sock, 413, "{\"error\":\"Request too large\"}");
+    } else if (got > 0) {
+        handle_request(client_sock, req.data);
     }
+    sb_free(&req);
+}
 
-    int opt = 1;
-    setsockopt(server_fd, SOL_SOCKET, SO_REUSEADDR, &opt, sizeof(opt));
+// Listen on the Unix domain socket at `path` (for a co-located proxy such as app.py: no TCP
+// handshake or loopback stack per request), or on TCP `port` when path is NULL.
+static int open_listener(const char *path, int port) {
+    int server_fd;
+    if (path) {
+        struct sockaddr_un addr;
+        memset(&addr, 0, sizeof(addr));
+        addr.sun_family = AF_UNIX;
+        if (strlen(path) >= sizeof(addr.sun_path)) {
+            fprintf(stderr, "STACK_SOCKET path too long: %s\n", path);
+            return -1;
+        }
+        strcpy(addr.sun_path, path);
+        server_fd = socket(AF_UNIX, SOCK_STREAM, 0);
+        if (server_fd < 0) {
+            perror("socket");
+            return -1;
+        }
+        unlink(path);  // left behind by a previous run
+        if (bind(server_fd, (struct sockaddr *)&addr, sizeof(addr)) < 0) {
+            perror("bind");
+            close(server_fd);
+            return -1;
+        }
+    } else {
+        server_fd = socket(AF_INET, SOCK_STREAM, 0);
+        if (server_fd < 0) {
+            perror("socket");
+            return -1;
+        }
 
-    struct sockaddr_in addr;
-    memset(&addr, 0, sizeof(addr));
-    addr.sin_family = AF_INET;
-    addr.sin_addr.s_addr = INADDR_ANY;
-    addr.sin_port = htons(PORT);
+        int opt = 1;
+        setsockopt(server_fd, SOL_SOCKET, SO_REUSEADDR, &opt, sizeof(opt));
 
-    if (bind(server_fd, (struct sockaddr *)&addr, sizeof(addr)) < 0) {
-        perror("bind");
-        close(server_fd);
-        return 1;
+        struct sockaddr_in addr;
+        memset(&addr, 0, sizeof(addr));
+        addr.sin_family = AF_INET;
+        addr.sin_addr.s_addr = INADDR_ANY;
+        addr.sin_port = htons(port);
+
+        if (bind(server_fd, (struct sockaddr *)&addr, sizeof(addr)) < 0) {
+            perror("bind");
+            close(server_fd);
+            return -1;
+        }
     }
 
     if (listen(server_fd, 128) < 0) {
         perror("listen");
         close(server_fd);
+        return -1;
+    }
+    return server_fd;
+}
+
+static volatile sig_atomic_t stopping = 0;
+
+static void on_stop_signal(int sig) {
+    (void)sig;
+    stopping = 1;
+}
+
+int main() {
+    // A client that hangs up mid-response must not kill the server.
+    signal(SIGPIPE, SIG_IGN);
+
+    // SIGTERM/SIGINT end the accept loop (poll returns EINTR) so buffered pushes are flushed.
+    struct sigaction sa;
+    memset(&sa, 0, sizeof(sa));
+    sa.sa_handler = on_stop_signal;
+    sa.sa_flags = SA_RESTART;
+    sigemptyset(&sa.sa_mask);
+    sigaction(SIGTERM, &sa, NULL);
+    sigaction(SIGINT, &sa, NULL);
+
+    const char *socket_path = getenv("STACK_SOCKET");
+    if (socket_path && !*socket_path) socket_path = NULL;
+    const char *port_env = getenv("PORT");
+    long port = PORT;
+    if (port_env && (!parse_long(port_env, &port) || port < 1 || port > 65535)) {
+        fprintf(stderr, "Invalid PORT: %s\n", port_env);
+        return 1;
+    }
+
+    const char *wb_env = getenv("STACK_WRITE_BEHIND_MS");
+    if (wb_env && *wb_env && !parse_long(wb_env, &wb_window_ms)) {
+        fprintf(stderr, "Invalid STACK_WRITE_BEHIND_MS: %s\n", wb_env);
         return 1;
     }
+    const char *wb_max_env = getenv("STACK_WRITE_BEHIND_MAX");
+    if (wb_max_env && *wb_max_env && (!parse_long(wb_max_env, &wb_max) || wb_max < 1 || wb_max > MAX_BULK_SIZE)) {
+        fprintf(stderr, "Invalid STACK_WRITE_BEHIND_MAX: %s\n", wb_max_env);
+        return 1;
+    }
+    if (wb_window_ms > 0) {
+        wb_values = malloc((size_t)wb_max * sizeof(int));
+        if (!wb_values) {
+            fprintf(stderr, "Out of memory for the write-behind buffer\n");
+            return 1;
+        }
+    }
 
-    printf("C Stack Service: Ready on Port %d\n", PORT);
+    int server_fd = open_listener(socket_path, (int)port);
+    if (server_fd < 0) return 1;
 
-    while (1) {
-        int client = accept(server_fd, NULL, NULL);
-        if (client < 0) continue;
+    if (socket_path) {
+        printf("C Stack Service: Ready on %s\n", socket_path);
+    } else {
+        printf("C Stack Service: Ready on Port %ld\n", port);
+    }
+    if (wb_window_ms > 0) {
+        printf("C Stack Service: Write-behind on, flushing every %ldms or %ld pushes\n", wb_window_ms, wb_max);
+    }
+    fflush(stdout);
+
+    while (!stopping) {
+        // Wake up when the oldest buffered push is due, even if no request arrives.
+        int timeout = -1;
+        if (wb_len > 0) {
+            long long left = wb_deadline_ms - now_ms();
+            timeout = left > 0 ? (int)left : 0;
+        }
+        struct pollfd pfd = { .fd = server_fd, .events = POLLIN };
+        int ready = poll(&pfd, 1, timeout);
+        if (ready < 0 && errno != EINTR) perror("poll");
+
+        if (ready > 0) {
+            int client = accept(server_fd, NULL, NULL);
+            if (client >= 0) {
+                handle_client(client);
+                close(client);
+            }
+        }
 
-        handle_client(client);
-        close(client);
+        // On failure keep the values and try again one window later.
+        if (wb_len > 0 && now_ms() >= wb_deadline_ms && !wb_flush(NULL)) {
+            wb_deadline_ms = now_ms() + wb_window_ms;
+        }
     }
 
+    if (!wb_flush(NULL)) {
+        fprintf(stderr, "C Stack Service: %ld buffered pushes could not be flushed on shutdown\n", wb_len);
+    }
     close(server_fd);
+    if (socket_path) unlink(socket_path);
     return 0;
 }
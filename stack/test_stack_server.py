@@ -0,0 +1,59 @@
+"""
+Checks against a running stack service (./stack-service or app.py in front of it):
+
+    STACK_TEST_URL=http://127.0.0.1:5001 python -m pytest test_stack_server.py
+
+Set STACK_TEST_URL_2 to a second replica on the same database for the concurrency tests to
+race two servers (one C server handles one request at a time). The tests push and pop on the
+stack they are pointed at, so use a scratch database. Skipped when STACK_TEST_URL is not set.
+"""
+import json
+import os
+import threading
+import urllib.request
+
+import pytest
+
+STACK_TEST_URL = os.environ.get("STACK_TEST_URL")
+STACK_TEST_URL_2 = os.environ.get("STACK_TEST_URL_2") or STACK_TEST_URL
+
+pytestmark = pytest.mark.skipif(not STACK_TEST_URL, reason="STACK_TEST_URL not set")
+
+
+def post(path, body=None, base=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        (base or STACK_TEST_URL) + path, data=data, method="POST", headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def drain():
+    while post("/pop-n", {"count": 10000})["values"]:
+        pass
+
+
+def test_concurrent_pop_n_take_disjoint_full_batches():
+    drain()
+    values = list(range(1, 2001))
+    for _ in range(20):
+        post("/push-many", {"values": values})
+        results = [None, None]
+        start = threading.Barrier(2)
+
+        def pop(i):
+            start.wait()
+            results[i] = post("/pop-n", {"count": 1000}, base=(STACK_TEST_URL, STACK_TEST_URL_2)[i])
+
+        threads = [threading.Thread(target=pop, args=(i,)) for i in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        popped = [r["values"] for r in results]
+        assert [len(p) for p in popped] == [1000, 1000]
+        assert sorted(popped[0] + popped[1]) == values
+        for p in popped:
+            assert p == sorted(p, reverse=True)  # top first